@@ -18,6 +18,8 @@ class Config(object):
         self.PIXIV = self.get_config('pixiv')
         self.TELEGRAM = self.get_config('telegram')
         self.SAUCENAO = self.get_config('saucenao')
+        self.HTTP = self.get_config('http') or {}
+        self.BLOB_STORE = self.get_config('blob_store')
 
     def get_config(self, name: str):
         # value = os.environ[name] if os.environ.get(name) else self.config_json.get(name, '')
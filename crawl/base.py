@@ -1,4 +1,5 @@
-from typing import Set, Callable, Any, List, Iterable
+from enum import Enum
+from typing import Set, Callable, Any, List, Iterable, Optional
 from model.artist import ArtistCrawlInfo
 
 """
@@ -36,20 +37,26 @@ class SearchResult:
         self.popular_recent = popular_recent
         self.illust_manga = illust_manga
 
-    def get_all_popular_permanent_id(self) -> Set[int]:
+    def get_all_popular_permanent_id(self, fn: Callable[[Any], bool] = None) -> Set[int]:
         if not self.popular_permanent:
             return set()
-        return set(info["id"] for info in self.popular_permanent if info.get("id"))
+        if not fn:
+            fn = lambda _: True
+        return set(info["id"] for info in self.popular_permanent if info.get("id") and fn(info))
 
-    def get_all_popular_recent_id(self) -> Set[int]:
+    def get_all_popular_recent_id(self, fn: Callable[[Any], bool] = None) -> Set[int]:
         if not self.popular_recent:
             return set()
-        return set(info["id"] for info in self.popular_recent if info.get("id"))
+        if not fn:
+            fn = lambda _: True
+        return set(info["id"] for info in self.popular_recent if info.get("id") and fn(info))
 
-    def get_all_illust_manga_id(self) -> Set[int]:
+    def get_all_illust_manga_id(self, fn: Callable[[Any], bool] = None) -> Set[int]:
         if not self.illust_manga:
             return set()
-        return set(info["id"] for info in self.illust_manga if info.get("isAdContainer") is None)
+        if not fn:
+            fn = lambda _: True
+        return set(info["id"] for info in self.illust_manga if info.get("isAdContainer") is None and fn(info))
 
     def get_illust_manga_count(self) -> int:
         if not self.illust_manga:
@@ -80,12 +87,25 @@ class RecommendResult:
                    and fn(info))
 
 
+class FrontierState(Enum):
+    """
+    爬虫队列中作品id的状态
+    State of an artwork id in the crawl frontier
+    """
+    QUEUED = 0
+    IN_FLIGHT = 1
+    DONE = 2
+    FAILED = 3
+    # 被过滤规则丢弃，不写入作品表，新任务开始时保留，用于跳过最近已经爬取过的作品
+    REJECTED = 4
+
+
 class ArtistCrawlUpdate:
     """
     Most recent crawled art_id on an artist
     """
 
-    def __init__(self, user_id: int, art_id: int):
+    def __init__(self, user_id: int, art_id: Optional[int]):
         self.user_id = user_id
         self.art_id = art_id
 
@@ -149,7 +169,7 @@ def CreateRecommendResultFromAPIResponse(data: dict) -> RecommendResult:
     if data.get("error"):
         return None
     illusts = data["body"]["illusts"]
-    next_ids = data["body"]["nextIds"]
+    next_ids = data["body"].get("nextIds")
     return RecommendResult(illusts=illusts, next_ids=next_ids)
 
 
@@ -1,17 +1,35 @@
+import argparse
 import asyncio
+import math
 import re
 import time
-from typing import Iterable, Set
+from typing import Iterable, List, Optional, Set, Tuple
 
-from crawl.base import SearchResult, ArtworkInfo
+from crawl.base import SearchResult, ArtworkInfo, FrontierState, ArtistCrawlUpdate
 from crawl.repository import Repository
 from crawl.request import BasicRequest
+from crawl.searchplan import SearchPlanner, SearchShard
 from logger import Log
+from model.artist import ArtistCrawlInfo
+from utils.artworkfilter import ArtworkFilter
 from utils.httprequests import TooManyRequest
+from utils.ratelimit import AsyncTokenBucket
 
 
 class Pixiv:
     GENSHIN_REGEX = re.compile(r"(Genshin(Impact)?)|(原神)", re.I)
+    # ai_type: 0 未知, 1 非AI, 2 AI生成
+    AI_FILTER_RULE = {"name": "ai", "max_ai_type": 1}
+    # 搜索和推荐的作品：R18要求提升2倍，3天内的新作品要求随时间降低
+    DEFAULT_FILTER_RULES = [
+        {"name": "r18", "tag": r"R.?18", "min_love": 2000},
+        {"name": "popularity", "min_love": 1000, "love_decay_per_day": 100, "decay_window_days": [0.1, 3]},
+    ]
+    # 画师以前的作品
+    DEFAULT_ARTIST_FILTER_RULES = [
+        {"name": "genshin", "require_tag": r"(Genshin(Impact)?)|(原神)"},
+        {"name": "popularity", "min_love": 300},
+    ]
 
     def __init__(
             self,
@@ -22,8 +40,36 @@ class Pixiv:
             mysql_database: str = "",
             pixiv_cookie: str = "",
             loop=None,
+            crawl_config: dict = None,
+            http_config: dict = None,
             *args,
     ):
+        """
+        :param crawl_config: 爬虫配置，对应配置文件中的 pixiv.crawl
+            workers: 获取作品信息的线程数
+            requests_per_second: 所有线程共享的每秒请求数
+            burst: 允许的突发请求数
+            skip_fresh_hours: 跳过该小时数内已经爬取过的作品，为0时不跳过
+            checkpoint_size: 每获取多少个作品过滤并写入一次数据库
+            checkpoint_interval: 距离上次写入超过多少秒时写入一次数据库
+            search_keywords: 搜索关键词
+            search_characters: 是否同时搜索 data/namemap.json 中的角色名
+            search_days: 搜索最近多少天的作品
+            search_shard_days: 搜索时每个分片包含的天数
+            recommend_depth: 推荐图广度优先搜索的深度
+            recommend_fanout: 每个作品最多采用多少个新发现的推荐作品
+            recommend_next_pages: 每个作品额外获取多少页 nextIds 推荐
+            recommend_max_nodes: 每次任务最多获取多少个作品的推荐
+            artist_crawl: 是否在每次任务后爬取画师以前的作品
+            artist_min_approved: 画师至少有多少个通过审核的作品才会被爬取
+            artist_recrawl_days: 同一个画师至少间隔多少天再爬取
+            artist_max_per_task: 每次任务最多爬取多少个画师
+            filter_rules: 搜索和推荐作品的过滤规则，见 utils/artworkfilter.FilterRule
+            artist_filter_rules: 画师作品的过滤规则
+            filter_dry_run: 为True时只统计每条规则丢弃的作品数量，不写入作品
+            exclude_ai: 是否丢弃AI生成的作品
+        :param http_config: 连接池配置，对应配置文件中的 http
+        """
         self.repository = Repository(
             sql_config={
                 "host": mysql_host,
@@ -34,26 +80,75 @@ class Pixiv:
                 "loop": loop,
             },
         )
+        if crawl_config is None:
+            crawl_config = {}
         self.cookie = pixiv_cookie
+        self.workers = int(crawl_config.get("workers", 4))
+        self.skip_fresh_hours = int(crawl_config.get("skip_fresh_hours", 24))
+        self.skipped_count = 0
+        self.checkpoint_size = int(crawl_config.get("checkpoint_size", 200))
+        self.checkpoint_interval = float(crawl_config.get("checkpoint_interval", 10))
+        ai_rules = [self.AI_FILTER_RULE] if crawl_config.get("exclude_ai", True) else []
+        self.search_filter = ArtworkFilter.from_config(
+            ai_rules + list(crawl_config.get("filter_rules", self.DEFAULT_FILTER_RULES))
+        )
+        self.artist_filter = ArtworkFilter.from_config(
+            ai_rules + list(crawl_config.get("artist_filter_rules", self.DEFAULT_ARTIST_FILTER_RULES))
+        )
+        self.filter_dry_run = bool(crawl_config.get("filter_dry_run", False))
+        self.artwork_filter = self.search_filter
+        self.in_flight_ids = set()
+        # 本次任务已经获取并写入的作品id，用于计算画师的爬虫进度
+        self.resolved_ids = set()
+        self.seen_ids = set()
+        character_keywords = None
+        if crawl_config.get("search_characters", False):
+            from model.artwork import name_map
+            character_keywords = name_map.get_all_character_names()
+        self.search_planner = SearchPlanner(
+            keywords=crawl_config.get("search_keywords", ["原神", "GenshinImpact"]),
+            character_keywords=character_keywords,
+            days=int(crawl_config.get("search_days", 7)),
+            shard_days=int(crawl_config.get("search_shard_days", 1)),
+        )
+        self.recommend_depth = int(crawl_config.get("recommend_depth", 1))
+        self.recommend_fanout = int(crawl_config.get("recommend_fanout", 18))
+        self.recommend_next_pages = int(crawl_config.get("recommend_next_pages", 1))
+        self.recommend_max_nodes = int(crawl_config.get("recommend_max_nodes", 500))
+        self.artist_crawl = bool(crawl_config.get("artist_crawl", True))
+        self.artist_min_approved = int(crawl_config.get("artist_min_approved", 3))
+        self.artist_recrawl_days = int(crawl_config.get("artist_recrawl_days", 3))
+        self.artist_max_per_task = int(crawl_config.get("artist_max_per_task", 2000))
+        self.rate_limiter = AsyncTokenBucket(
+            rate=float(crawl_config.get("requests_per_second", 1.0)),
+            burst=int(crawl_config.get("burst", 4)),
+        )
         self.GetIllustInformationTasks = []
         self.art_id_queue = None
-        self.artwork_list = []
-        self.BasicRequest = BasicRequest(cookie=self.cookie)
+        self.sink_queue = None
+        self.sink_task = None
+        self.BasicRequest = BasicRequest(cookie=self.cookie, rate_limiter=self.rate_limiter,
+                                         http_config=http_config)
 
     async def close(self):
         await self.repository.close()
         await self.BasicRequest.close()
 
-    async def work(self, sleep_time: int = 6):
+    async def work(self, sleep_time: int = 6, resume: bool = False):
+        """
+        :param resume: 为True时第一次任务从上次中断的地方继续
+        """
         while True:
             if not await self.BasicRequest.is_logged_in():
                 return
             self.GetIllustInformationTasks = []
-            self.artwork_list = []
             self.art_id_queue = asyncio.Queue()
             Log.info("正在执行Pixiv爬虫任务")
-            await self.task()
-            # await self.task1()
+            await self.task(resume=resume)
+            resume = False
+            if self.artist_crawl:
+                self.art_id_queue = asyncio.Queue()
+                await self.task1()
             # await self.repository.close()
             Log.info("执行Pixiv爬虫任务完成")
             if sleep_time == -1:
@@ -67,15 +162,7 @@ class Pixiv:
     async def get_illust_information(self, TaskId):
         Log.info("获取作品信息线程%s号：创建完成" % TaskId)
         Log.debug("获取作品信息线程%s号：等待下载任务" % TaskId)
-        index = 0
         while True:
-            index += 1
-            if index % (20 * 10) == 0:
-                Log.info("已经爬取到第 %s 个作品，休息15分钟" % index)
-                await asyncio.sleep(15 * 60)
-            if index % 20 == 0:
-                Log.info("已经爬取到第 %s 个作品，休息6秒" % index)
-                await asyncio.sleep(3 * 2)
             remaining_count = self.art_id_queue.qsize()
             if remaining_count > 0 and remaining_count % 100 == 0:
                 Log.info("Pixiv爬虫进度：还剩下%s张作品" % remaining_count)
@@ -83,211 +170,409 @@ class Pixiv:
             if id_data.get("status") == "close":
                 self.art_id_queue.put_nowait({"status": "close"})
                 return
+            art_id = id_data["id"]
+            self.in_flight_ids.add(art_id)
             try:
-                art_id = id_data["id"]
                 artwork_info = await self.BasicRequest.download_artwork_info(art_id)
+                self.in_flight_ids.discard(art_id)
                 if artwork_info is None:
+                    # 作品已删除或无法访问，重新获取也不会成功
+                    await self.sink_queue.put({"status": "failed", "id": art_id, "terminal": True})
                     continue
-                if artwork_info.ai_type >= 2:
-                    Log.info("移除该AI作品，作品id：%s" % art_id)
                 Log.info(f"{artwork_info.art_id} {artwork_info.title}")
-                self.artwork_list.append(artwork_info)
+                await self.sink_queue.put({"status": "done", "id": art_id, "artwork": artwork_info})
                 Log.debug("获取作品信息线程%s号，收到任务，作品id：%s，获取完成" % (TaskId, art_id))
-                await asyncio.sleep(3)
             except TooManyRequest:
-                Log.error("撞墙，线程退出任务")
-                self.art_id_queue.task_done()
-                return
+                # 重试次数用完，保留 in-flight 状态，--resume 时重新获取
+                Log.error("撞墙，线程%s号跳过作品%s" % (TaskId, art_id))
             except Exception as TError:
+                self.in_flight_ids.discard(art_id)
+                await self.sink_queue.put({"status": "failed", "id": art_id})
                 Log.error("", TError)
             finally:
                 self.art_id_queue.task_done()
 
-    async def task(self):
+    async def sink(self):
+        """
+        写入数据库的线程：每获取 checkpoint_size 个作品或每 checkpoint_interval 秒，
+        整批过滤后写入一次，并更新爬虫队列中作品id的状态
+        """
+        artwork_list = []
+        done_ids = set()
+        failed_ids = set()
+        terminal_ids = set()
+        closing = False
+        deadline = time.monotonic() + self.checkpoint_interval
+        while True:
+            try:
+                data = await asyncio.wait_for(self.sink_queue.get(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                data = None
+            if data is not None:
+                status = data.get("status")
+                if status == "close":
+                    closing = True
+                elif status == "failed":
+                    failed_ids.add(data["id"])
+                    if data.get("terminal"):
+                        terminal_ids.add(data["id"])
+                else:
+                    done_ids.add(data["id"])
+                    artwork_list.append(data["artwork"])
+            if closing or len(artwork_list) >= self.checkpoint_size or time.monotonic() >= deadline:
+                # 写入失败时保留当前批次，下一次重试
+                if await self.flush(artwork_list, done_ids, failed_ids, terminal_ids):
+                    artwork_list = []
+                    done_ids = set()
+                    failed_ids = set()
+                    terminal_ids = set()
+                deadline = time.monotonic() + self.checkpoint_interval
+            if closing:
+                return
+
+    async def flush(self, artwork_list: List[ArtworkInfo], done_ids: Set[int], failed_ids: Set[int],
+                    terminal_ids: Set[int] = frozenset()) -> bool:
+        """
+        检查点：过滤并写入一批作品，并更新爬虫队列中作品id的状态
+        :param terminal_ids: failed_ids 中重新获取也不会成功的作品，和写入的作品一样计入画师的爬虫进度
+        :return: 是否写入成功
+        """
+        if len(artwork_list) == 0 and len(done_ids) == 0 and len(failed_ids) == 0:
+            return True
+        in_flight_ids = set(self.in_flight_ids)
+        try:
+            finalized_artworks, report = self.artwork_filter.filter(artwork_list)
+            report_str = "，".join("%s丢弃%s个" % (name, count) for name, count in report.items())
+            if self.filter_dry_run:
+                Log.info("过滤试运行：%s个作品中保留%s个，%s" % (len(artwork_list), len(finalized_artworks), report_str))
+                finalized_artworks = []
+                rejected_ids = set()
+            else:
+                Log.debug("过滤：%s个作品中保留%s个，%s" % (len(artwork_list), len(finalized_artworks), report_str))
+                # 被丢弃的作品不写入作品表，记录在爬虫队列中，下一次任务跳过
+                rejected_ids = set(a.art_id for a in artwork_list).difference(a.art_id for a in finalized_artworks)
+            rowcount = await self.repository.save_artwork_many(finalized_artworks)
+            await self.repository.update_frontier_state_many(done_ids.difference(rejected_ids), FrontierState.DONE)
+            await self.repository.update_frontier_state_many(rejected_ids, FrontierState.REJECTED)
+            await self.repository.update_frontier_state_many(failed_ids, FrontierState.FAILED)
+            await self.repository.update_frontier_state_many(in_flight_ids, FrontierState.IN_FLIGHT)
+            Log.info("检查点：写入%s个作品，%s个作品获取失败，rows affected=%s"
+                     % (len(finalized_artworks), len(failed_ids), rowcount))
+            if not self.filter_dry_run:
+                self.resolved_ids.update(done_ids, terminal_ids)
+            return True
+        except Exception as TError:
+            Log.warning("写入检查点发生错误，留到下一次检查点重试")
+            Log.error(TError)
+            return False
+
+    def start_workers(self):
+        """
+        创建获取作品信息的线程池和写入数据库的线程，所有线程共享同一个限流器
+        """
+        self.in_flight_ids = set()
+        self.resolved_ids = set()
+        self.sink_queue = asyncio.Queue(maxsize=self.checkpoint_size * 2)
+        self.sink_task = asyncio.ensure_future(self.sink())
+        for i in range(self.workers):
+            task_main = asyncio.ensure_future(self.get_illust_information(i))
+            self.GetIllustInformationTasks.append(task_main)
+
+    async def stop_workers(self):
+        """
+        等待获取作品信息的线程退出，再写入剩下的作品
+        """
+        self.art_id_queue.put_nowait({"status": "close"})
+        await asyncio.wait(self.GetIllustInformationTasks)
+        await self.sink_queue.put({"status": "close"})
+        await self.sink_task
+
+    async def enqueue_art_ids(self, art_ids: Iterable[int], check_fresh: bool = True) -> int:
+        """
+        预过滤：跳过本次任务已经放入队列的作品和最近已经爬取过的作品，把剩余的作品id放入队列
+        最近已经爬取过的作品包括数据库中最近更新的作品和最近被过滤规则丢弃的作品
+        :param check_fresh: 为False时不查询数据库，调用者已经做过过滤
+        :return: 放入队列的作品数量
+        """
+        art_ids = set(int(art_id) for art_id in art_ids).difference(self.seen_ids)
+        if len(art_ids) == 0:
+            return 0
+        self.seen_ids.update(art_ids)
+        if check_fresh and self.skip_fresh_hours > 0:
+            try:
+                fresh_ids = await self.repository.get_stored_art_ids(art_ids, self.skip_fresh_hours)
+                fresh_ids.update(await self.repository.get_rejected_art_ids(art_ids, self.skip_fresh_hours))
+            except Exception as TError:
+                Log.warning("查询已爬取作品失败，不进行预过滤")
+                Log.error(TError)
+                fresh_ids = set()
+            self.skipped_count += len(fresh_ids)
+            art_ids = art_ids.difference(fresh_ids)
+        try:
+            await self.repository.add_frontier_many(art_ids)
+        except Exception as TError:
+            Log.warning("写入爬虫队列失败，本次任务无法恢复")
+            Log.error(TError)
+        for art_id in art_ids:
+            self.art_id_queue.put_nowait({"id": art_id})
+        return len(art_ids)
+
+    def is_genshin_search_item(self, info: dict) -> bool:
+        return self.GENSHIN_REGEX.search("#".join(info.get("tags") or [])) is not None
+
+    async def enqueue_search_result(self, search_result: SearchResult, shard: SearchShard,
+                                    popular_ids: Set[int]) -> int:
+        """
+        把一页搜索结果放入队列，热门作品先收集到 popular_ids 中
+        :return: 该页的作品数量
+        """
+        fn = self.is_genshin_search_item if shard.genshin_only else None
+        popular_ids.update(
+            search_result.get_all_popular_permanent_id(fn),
+            search_result.get_all_popular_recent_id(fn),
+        )
+        await self.enqueue_art_ids(search_result.get_all_illust_manga_id(fn))
+        return search_result.get_illust_manga_count()
+
+    async def search_shard(self, shard: SearchShard, popular_ids: Set[int]) -> int:
+        """
+        搜索一个分片，第一页决定页数，剩余的页并发获取，由共享的限流器控制速率
+        :return: 该分片的作品数量
+        """
+        try:
+            search_result = await self.BasicRequest.search_artwork(shard.keyword, 1, shard.from_date, shard.to_date)
+        except TooManyRequest:
+            Log.error("撞墙，跳过搜索分片 %s" % shard)
+            return 0
+        if search_result is None:
+            Log.error("获取搜索信息失败 %s" % shard)
+            return 0
+        page_count = math.ceil(search_result.total / BasicRequest.SEARCH_PAGE_SIZE)
+        if page_count > BasicRequest.SEARCH_MAX_PAGE:
+            Log.warning("搜索分片 %s 有%s页，超过最大页数%s，请减小 search_shard_days"
+                        % (shard, page_count, BasicRequest.SEARCH_MAX_PAGE))
+            page_count = BasicRequest.SEARCH_MAX_PAGE
+        total = await self.enqueue_search_result(search_result, shard, popular_ids)
+
+        pages = [
+            self.BasicRequest.search_artwork(shard.keyword, page, shard.from_date, shard.to_date)
+            for page in range(2, page_count + 1)
+        ]
+        for future in asyncio.as_completed(pages):
+            try:
+                search_result = await future
+            except TooManyRequest:
+                Log.error("撞墙，跳过该搜索页 %s" % shard)
+                continue
+            if search_result is None:
+                continue
+            total += await self.enqueue_search_result(search_result, shard, popular_ids)
+        Log.info("搜索分片 %s 完成，一共%s页，%s个作品" % (shard, page_count, total))
+        return total
+
+    async def task(self, resume: bool = False):
         """
         获取基础爬虫数据
         爬取的数据包括7天前的数据，推荐的数据
+        :param resume: 为True时不重新搜索，继续获取爬虫队列中未完成的作品
         :return:
         """
         Log.info("准备开始基础爬虫任务")
         Log.info("正在创建爬虫线程")
         self.GetIllustInformationTasks = []
-        self.artwork_list = []
+        self.artwork_filter = self.search_filter
+        self.skipped_count = 0
+        self.seen_ids = set()
 
-        # 1. Search artworks by keyword
-        search_keyword = "原神"
-        page = 1
-        total = 0
+        # 1. Start workers first, artwork ids are fetched as soon as they are found
+        self.start_workers()
+
+        try:
+            # 2. Collect artwork ids
+            if resume:
+                art_ids = await self.repository.get_frontier_art_ids(
+                    (FrontierState.QUEUED, FrontierState.IN_FLIGHT)
+                )
+                Log.info("继续上次中断的爬虫任务，还剩下%s个作品" % len(art_ids))
+                for art_id in art_ids:
+                    self.art_id_queue.put_nowait({"id": art_id})
+            else:
+                await self.repository.clear_frontier(keep_rejected_hours=self.skip_fresh_hours)
+                await self.discover()
+
+            # 3. Wait for artwork details, the sink writes them to database while fetching
+            Log.info("等待作业完成")
+            await self.art_id_queue.join()
+        finally:
+            await self.stop_workers()
+        Log.info("作业完成")
+
+    async def discover(self):
+        """
+        通过搜索和推荐获取作品id并放入爬虫队列
+        """
+        # 1. Search artworks by keyword, one shard per keyword and day
         all_popular_id = set()
-        Log.info("正在获取搜索信息")
-        while True:
-            try:
-                search_result = await self.BasicRequest.search_artwork(search_keyword, page)
-            except TooManyRequest:
-                Log.error("撞墙，线程退出任务")
-                self.art_id_queue.task_done()
-                return
-            all_popular_id = all_popular_id.union(
-                search_result.get_all_popular_permanent_id(),
-                search_result.get_all_popular_recent_id(),
-            )
-            for art_id in search_result.get_all_illust_manga_id():
-                self.art_id_queue.put_nowait({"id": art_id})
-            total += search_result.get_illust_manga_count()
-            if total >= search_result.total:
-                break
-            page += 1
-            Log.info("正在进行搜索，当前搜索页数为 %s，当前已经获取到 %s，还剩下 %s" % (page, total, search_result.total))
-            await asyncio.sleep(3)
+        shards = self.search_planner.plan()
+        Log.info("正在获取搜索信息，一共%s个搜索分片" % len(shards))
+        totals = await asyncio.gather(*[self.search_shard(shard, all_popular_id) for shard in shards])
+        total = sum(totals)
 
-        for art_id in all_popular_id:
-            self.art_id_queue.put_nowait({"id": art_id})
+        await self.enqueue_art_ids(all_popular_id)
 
-        # 2. Search artwork by recommendation
+        # 2. Search artwork by recommendation, starting from the popular artworks
         Log.info("正在获取推荐信息")
-        all_recommend_id = set()
-        for count in range(1):
-            for art_id in all_popular_id:
-                recommend_result = await self.BasicRequest.get_recommendation(art_id)
-                recommend_id = recommend_result.get_all_illust_id(
-                    lambda x: self.GENSHIN_REGEX.search(x.get("tags", "")) is not None
-                )
-                all_recommend_id = all_recommend_id.union(recommend_id)
-                all_popular_id = all_recommend_id.difference(all_popular_id)
-            Log.info("正在进行搜索，当前搜索深度为 %s " % (count + 1))
-            await asyncio.sleep(3)
+        recommend_count = await self.expand_recommendation(all_popular_id)
 
-        for art_id in all_recommend_id:
-            self.art_id_queue.put_nowait({"id": art_id})
-
-        # 3. Wait for artwork details
         Log.info(
-            "7天一共有%s个普通作品，%s个热门作品，%s个推荐作品"
-            % (total, len(all_popular_id), len(all_recommend_id))
+            "%s天一共有%s个普通作品，%s个热门作品，%s个推荐作品，去重后放入队列%s个作品，跳过%s个最近已爬取的作品"
+            % (self.search_planner.days, total, len(all_popular_id), recommend_count,
+               len(self.seen_ids) - self.skipped_count, self.skipped_count)
         )
 
-        for i in range(1):
-            task_main = asyncio.ensure_future(self.get_illust_information(i))
-            self.GetIllustInformationTasks.append(task_main)
-
-        Log.info("等待作业完成")
-        await self.art_id_queue.join()
-        self.art_id_queue.put_nowait({"status": "close"})
-        await asyncio.wait(self.GetIllustInformationTasks)
-        Log.info("作业完成")
-
-        # 4. Filter artwork based on stats
-        artwork_list = sorted(
-            self.artwork_list, key=lambda i: i.love_count, reverse=True
-        )  # 排序
-        finalized_artworks = self.filter_artwork(artwork_list)
+    def is_genshin_recommend_item(self, info: dict) -> bool:
+        return self.GENSHIN_REGEX.search(info.get("tags", "")) is not None
 
-        # 5. Write to database
+    async def get_recommend_ids(self, art_id: int) -> Set[int]:
+        """
+        获取一个作品的推荐作品id，包括 nextIds 的前 recommend_next_pages 页
+        """
         try:
-            Log.info("写入数据库...")
-            rowcount = await self.repository.save_artwork_many(finalized_artworks)
-            Log.info("写入完成, rows affected=%s" % rowcount)
+            recommend_result = await self.BasicRequest.get_recommendation(art_id)
+            if recommend_result is None:
+                return set()
+            recommend_ids = recommend_result.get_all_illust_id(self.is_genshin_recommend_item)
+            next_ids = recommend_result.next_ids
+            page_size = BasicRequest.RECOMMEND_PAGE_SIZE
+            for page in range(self.recommend_next_pages):
+                page_ids = next_ids[page * page_size:(page + 1) * page_size]
+                if len(page_ids) == 0:
+                    break
+                next_result = await self.BasicRequest.get_recommendation_next(page_ids)
+                if next_result is None:
+                    break
+                recommend_ids.update(next_result.get_all_illust_id(self.is_genshin_recommend_item))
+        except TooManyRequest:
+            Log.error("撞墙，跳过作品%s的推荐" % art_id)
+            return set()
         except Exception as TError:
-            Log.warning("写入数据库发生错误")
+            Log.warning("获取作品%s的推荐发生错误，跳过" % art_id)
             Log.error(TError)
+            return set()
+        return set(int(i) for i in recommend_ids)
+
+    async def expand_recommendation(self, seeds: Iterable[int]) -> int:
+        """
+        广度优先搜索推荐图：每一层并发获取推荐，新发现的作品立即放入队列并作为下一层
+        与搜索共用 seen_ids 去重，深度、每个作品采用的数量和获取推荐的作品总数都有上限
+        :return: 新发现的作品数量
+        """
+        level = set(int(art_id) for art_id in seeds)
+        expanded = set()
+        discovered = 0
+        for depth in range(self.recommend_depth):
+            budget = self.recommend_max_nodes - len(expanded)
+            nodes = list(level.difference(expanded))[:max(0, budget)]
+            if len(nodes) == 0:
+                break
+            expanded.update(nodes)
+            next_level = set()
+            for future in asyncio.as_completed([self.get_recommend_ids(art_id) for art_id in nodes]):
+                recommend_ids = await future
+                new_ids = list(recommend_ids.difference(self.seen_ids))[:self.recommend_fanout]
+                await self.enqueue_art_ids(new_ids)
+                next_level.update(new_ids)
+            discovered += len(next_level)
+            Log.info("推荐搜索深度 %s：获取%s个作品的推荐，新发现%s个作品" % (depth + 1, len(nodes), len(next_level)))
+            level = next_level
+        return discovered
 
     async def task1(self):
         """
         获取画师推荐
         因为爬虫只获取当前前7天的数据，为了弥补没有获取以前的数据的不足
         根据画师在数据库通过的作品爬取画师以前的作品。
+        通过作品多的画师优先，多个画师并发爬取，由共享的限流器控制速率
         :return:
         """
-        Log.info("准备开始推荐爬虫任务")
+        Log.info("准备开始画师爬虫任务")
         # 初始化，清空之前的数据
         self.GetIllustInformationTasks = []
-        self.artwork_list = []
-
-        for i in range(1):
-            task_main = asyncio.ensure_future(self.get_illust_information(i))
-            self.GetIllustInformationTasks.append(task_main)
+        self.artwork_filter = self.artist_filter
+        self.seen_ids = set()
 
-        popular_artists_all = (
-            await self.repository.get_artists_with_multiple_approved_arts(
-                num=3, days_ago=3
-            )
+        popular_artists_all = await self.repository.get_artists_with_multiple_approved_arts(
+            num=self.artist_min_approved, days_ago=self.artist_recrawl_days, limit=self.artist_max_per_task
         )
+        if len(popular_artists_all) == 0:
+            return
+        Log.info("一共有%s个画师需要爬取" % len(popular_artists_all))
 
-        for popular_artists in popular_artists_all:
-            all_illusts = await self.BasicRequest.get_user_all_illusts(
-                popular_artists.user_id
-            )
-            if popular_artists.last_art_id is not None:
-                all_illusts_f = [
-                    i for i in all_illusts if i > popular_artists.last_art_id
-                ]
-            else:
-                all_illusts_f = all_illusts
-            for art_id in all_illusts_f:
-                temp_artwork_info = await self.repository.get_art_by_art_id(art_id)
-                if temp_artwork_info is None:
-                    self.art_id_queue.put_nowait({"id": art_id})
-            if len(all_illusts_f) != 0 and all_illusts_f is not None:
-                await self.repository.save_artist_last_crawl(
-                    user_id=popular_artists.user_id, last_art_id=max(all_illusts_f)
-                )
-            await asyncio.sleep(3)
+        self.start_workers()
 
-        self.art_id_queue.put_nowait({"status": "close"})
-        await asyncio.wait(self.GetIllustInformationTasks)
+        semaphore = asyncio.Semaphore(self.workers)
 
-        if len(popular_artists_all) == 0:
-            return
+        async def crawl(artist: ArtistCrawlInfo):
+            async with semaphore:
+                return await self.crawl_artist(artist)
 
-        finalized_artworks = self.filter_tags(self.artwork_list)
+        try:
+            results = await asyncio.gather(*[crawl(artist) for artist in popular_artists_all])
+            Log.info("等待作业完成")
+            await self.art_id_queue.join()
+        finally:
+            await self.stop_workers()
+        Log.info("作业完成")
 
+        # 作品获取完成后再记录画师的爬虫进度，进度只推进到已经写入的作品
+        last_crawl_list = [self.get_artist_progress(artist, new_illusts)
+                           for artist, new_illusts in filter(None, results)]
         try:
-            Log.info("写入数据库...")
-            rowcount = await self.repository.save_artwork_many(finalized_artworks)
-            Log.info("写入完成, rows affected=%s" % rowcount)
+            rowcount = await self.repository.save_artist_last_crawl_many(last_crawl_list)
+            Log.info("更新%s个画师的爬虫数据, rows affected=%s" % (len(last_crawl_list), rowcount))
         except Exception as TError:
-            Log.warning("写入数据库发生错误")
+            Log.warning("更新画师爬虫数据发生错误")
             Log.error(TError)
 
-    def filter_tags(self, artwork_list: Iterable[ArtworkInfo]) -> Iterable[ArtworkInfo]:
-        result = []
-        for artwork_info in artwork_list:
-            if self.GENSHIN_REGEX.search(artwork_info.tags) is None:
-                continue
-            if artwork_info.love_count < 300:
-                continue
-            result.append(artwork_info)
-        return result
-
-    def extract_id_from_search_result(self, search_result: SearchResult) -> Set[int]:
-        res = search_result
-        return set().union(
-            res.get_all_popular_permanent_id(),
-            res.get_all_popular_recent_id(),
-            res.get_all_illust_manga_id(),
-        )
-
-    def filter_artwork(
-            self, artwork_list: Iterable[ArtworkInfo]
-    ) -> Iterable[ArtworkInfo]:
-        r18_regex = re.compile(r"R.?18", re.I)
-        result = []
-        for artwork_info in artwork_list:
-            tags = artwork_info.tags
-            if r18_regex.search(tags) is not None:  # 要求提升2倍
-                if artwork_info.love_count < 2000:
-                    continue
-            days_hundred_fold = (
-                    (time.time() - artwork_info.upload_timestamp) / 24 / 60 / 60 * 100
-            )
-            if 10 <= days_hundred_fold <= 300 and artwork_info.love_count >= 700:
-                if artwork_info.love_count < 1000 - days_hundred_fold:
-                    continue
+    async def crawl_artist(self, artist: ArtistCrawlInfo) -> Optional[Tuple[ArtistCrawlInfo, List[int]]]:
+        """
+        把画师上次爬取之后的新作品中数据库里没有的放入队列
+        :return: (画师, 上次爬取之后的新作品id)，获取失败时返回None
+        """
+        try:
+            all_illusts = await self.BasicRequest.get_user_all_illusts(artist.user_id)
+            if all_illusts is None:
+                return None
+            if artist.last_art_id is not None:
+                new_illusts = [i for i in all_illusts if i > artist.last_art_id]
             else:
-                if artwork_info.love_count < 1000:
-                    continue
-            result.append(artwork_info)
-        return result
+                new_illusts = list(all_illusts)
+            if len(new_illusts) > 0:
+                stored_ids = await self.repository.get_stored_art_ids(new_illusts)
+                self.resolved_ids.update(stored_ids)
+                await self.enqueue_art_ids(set(new_illusts).difference(stored_ids), check_fresh=False)
+            return artist, new_illusts
+        except TooManyRequest:
+            Log.error("撞墙，跳过画师%s" % artist.user_id)
+        except Exception as TError:
+            Log.warning("爬取画师%s发生错误，跳过" % artist.user_id)
+            Log.error(TError)
+        return None
+
+    def get_artist_progress(self, artist: ArtistCrawlInfo, new_illusts: List[int]) -> ArtistCrawlUpdate:
+        """
+        画师的爬虫进度推进到第一个没有写入的新作品之前，没有写入的作品下一次任务重新获取
+        已删除或无法访问的作品视为已经写入
+        :return: 画师的爬虫进度，没有进度时保留原来的作品id，只更新爬取时间
+        """
+        unresolved_ids = [i for i in new_illusts if i not in self.resolved_ids]
+        if len(unresolved_ids) == 0:
+            resolved_ids = new_illusts
+        else:
+            first_unresolved_id = min(unresolved_ids)
+            resolved_ids = [i for i in new_illusts if i < first_unresolved_id]
+        last_art_id = max(resolved_ids) if len(resolved_ids) > 0 else artist.last_art_id
+        return ArtistCrawlUpdate(user_id=artist.user_id, art_id=last_art_id)
 
 
 # 作为计划任务单独运行
@@ -299,8 +584,17 @@ class Pixiv:
 if __name__ == "__main__":
     from config import config
 
+    parser = argparse.ArgumentParser(description="Pixiv爬虫")
+    parser.add_argument("--resume", action="store_true", help="继续上次中断的爬虫任务")
+    parser.add_argument("--dry-run", action="store_true", help="只统计过滤规则丢弃的作品数量，不写入作品")
+    args = parser.parse_args()
+
     loop = asyncio.get_event_loop()
 
+    crawl_config = dict(config.PIXIV.get("crawl") or {})
+    if args.dry_run:
+        crawl_config["filter_dry_run"] = True
+
     pixiv = Pixiv(
         mysql_host=config.MYSQL["host"],
         mysql_port=config.MYSQL["port"],
@@ -309,9 +603,11 @@ if __name__ == "__main__":
         mysql_database=config.MYSQL["database"],
         pixiv_cookie=config.PIXIV["cookie"],
         loop=loop,
+        crawl_config=crawl_config,
+        http_config=config.HTTP,
     )
 
-    run = [pixiv.work(sleep_time=-1)]
+    run = [pixiv.work(sleep_time=-1, resume=args.resume)]
     close = [pixiv.close()]
 
     loop.run_until_complete(asyncio.wait(run))
@@ -1,4 +1,4 @@
-from typing import Iterable
+from typing import Iterable, Set
 
 import aiomysql
 
@@ -7,6 +7,7 @@ from crawl.base import (
     ArtistCrawlUpdate,
     CreateArtistCrawlInfoFromSQLResult,
     ArtworkInfo,
+    FrontierState,
 )
 
 
@@ -49,20 +50,24 @@ class Repository:
         return result
 
     async def get_artists_with_multiple_approved_arts(
-        self, num: int, days_ago: int
+        self, num: int, days_ago: int, limit: int = None
     ) -> Iterable[ArtistCrawlInfo]:
         """
-        Get user_id of artists with multiple approved art
-        获取具有多个已通过插画的画师的用户id
+        Get user_id of artists with multiple approved art, artists with more approved art come first
+        获取具有多个已通过插画的画师的用户id，通过插画多的画师优先
         :returns: [ArtistCrawlInfo(user_id=1713, last_art_id=18324, ...), ...]
         """
         query = f"""
             SELECT user_id, last_art_id, last_crawled_at, approved_art_count
             FROM pixiv_approved_artist
             WHERE approved_art_count >= %s
-            AND (last_crawled_at IS NULL OR DATEDIFF(NOW(), last_crawled_at) >= %s);
+            AND (last_crawled_at IS NULL OR DATEDIFF(NOW(), last_crawled_at) >= %s)
+            ORDER BY approved_art_count DESC
         """
         query_args = (num, days_ago)
+        if limit is not None:
+            query += " LIMIT %s"
+            query_args = (num, days_ago, limit)
         result = await self._execute_and_fetchall(query, query_args)
         return CreateArtistCrawlInfoFromSQLResult(
             result
@@ -89,7 +94,8 @@ class Repository:
         self, last_crawl_list: Iterable[ArtistCrawlUpdate]
     ) -> int:
         """
-        Update artist crawled data. Returns affected rows (not the number of inserted rows)
+        Update artist crawled data, a None art_id keeps the stored last_art_id.
+        Returns affected rows (not the number of inserted rows)
         更新画师的爬虫数据。
         """
         if len(last_crawl_list) == 0:
@@ -100,7 +106,7 @@ class Repository:
             ) VALUES (
                 %s, %s
             ) ON DUPLICATE KEY UPDATE
-                last_art_id=VALUES(last_art_id),
+                last_art_id=COALESCE(VALUES(last_art_id), last_art_id),
                 last_crawled_at=NOW();
         """
         query_args = tuple((a.user_id, a.art_id) for a in last_crawl_list)
@@ -115,9 +121,9 @@ class Repository:
         query = f"""
             INSERT INTO pixiv (
                 illusts_id, title, tags, view_count, like_count, love_count,
-                user_id, upload_timestamp
+                user_id, upload_timestamp, ai_type
             ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s
+                %s, %s, %s, %s, %s, %s, %s, %s, %s
             ) ON DUPLICATE KEY UPDATE
                 title=VALUES(title),
                 tags=VALUES(tags),
@@ -125,7 +131,9 @@ class Repository:
                 like_count=VALUES(like_count),
                 love_count=VALUES(love_count),
                 user_id=VALUES(user_id),
-                upload_timestamp=VALUES(upload_timestamp);
+                upload_timestamp=VALUES(upload_timestamp),
+                ai_type=VALUES(ai_type),
+                updated_at=NOW();
         """
         query_args = tuple(
             (
@@ -137,11 +145,129 @@ class Repository:
                 a.love_count,
                 a.author_id,
                 a.upload_timestamp,
+                a.ai_type,
             )
             for a in artwork_list
         )
         return await self._executemany(query, query_args)
 
+    async def get_stored_art_ids(self, art_ids: Iterable[int], updated_within_hours: int = None) -> Set[int]:
+        """
+        Returns the ids in art_ids that already exist in table, optionally only those
+        updated within the last `updated_within_hours` hours
+        返回已经存在数据库的作品id
+        """
+        art_ids = tuple(art_ids)
+        stored_ids = set()
+        chunk_size = 1000
+        for i in range(0, len(art_ids), chunk_size):
+            chunk = art_ids[i:i + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            query = f"""
+                SELECT illusts_id
+                FROM `pixiv`
+                WHERE illusts_id IN ({placeholders})
+            """
+            query_args = chunk
+            if updated_within_hours is not None:
+                query += " AND updated_at >= NOW() - INTERVAL %s HOUR"
+                query_args = chunk + (updated_within_hours,)
+            data = await self._execute_and_fetchall(query, query_args)
+            stored_ids.update(row[0] for row in data)
+        return stored_ids
+
+    async def get_rejected_art_ids(self, art_ids: Iterable[int], updated_within_hours: int = None) -> Set[int]:
+        """
+        Returns the ids in art_ids that were rejected by the filter, optionally only those
+        rejected within the last `updated_within_hours` hours
+        返回最近被过滤规则丢弃的作品id
+        """
+        art_ids = tuple(art_ids)
+        rejected_ids = set()
+        chunk_size = 1000
+        for i in range(0, len(art_ids), chunk_size):
+            chunk = art_ids[i:i + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            query = f"""
+                SELECT illusts_id
+                FROM `pixiv_crawl_frontier`
+                WHERE illusts_id IN ({placeholders})
+                AND state = %s
+            """
+            query_args = chunk + (FrontierState.REJECTED.value,)
+            if updated_within_hours is not None:
+                query += " AND updated_at >= NOW() - INTERVAL %s HOUR"
+                query_args = query_args + (updated_within_hours,)
+            data = await self._execute_and_fetchall(query, query_args)
+            rejected_ids.update(row[0] for row in data)
+        return rejected_ids
+
+    async def clear_frontier(self, keep_rejected_hours: int = 0):
+        """
+        Clear the crawl frontier before a new crawl, ids rejected within the last
+        `keep_rejected_hours` hours are kept so that the next crawl can skip them
+        开始新的爬虫任务前清空爬虫队列，保留最近被过滤规则丢弃的作品id
+        """
+        query = f"""
+            DELETE FROM `pixiv_crawl_frontier`
+            WHERE state <> %s
+            OR updated_at < NOW() - INTERVAL %s HOUR;
+        """
+        query_args = (FrontierState.REJECTED.value, keep_rejected_hours)
+        return await self._execute_and_fetchall(query, query_args)
+
+    async def add_frontier_many(self, art_ids: Iterable[int]) -> int:
+        """
+        Add artwork ids to the crawl frontier as queued, existing ids keep their state
+        except rejected ids, which are queued again
+        把作品id加入爬虫队列
+        """
+        query_args = tuple((art_id, FrontierState.QUEUED.value) for art_id in art_ids)
+        if len(query_args) == 0:
+            return 0
+        query = f"""
+            INSERT INTO `pixiv_crawl_frontier` (
+                illusts_id, state
+            ) VALUES (
+                %s, %s
+            ) ON DUPLICATE KEY UPDATE
+                state=IF(state={FrontierState.REJECTED.value}, VALUES(state), state);
+        """
+        return await self._executemany(query, query_args)
+
+    async def update_frontier_state_many(self, art_ids: Iterable[int], state: FrontierState) -> int:
+        """
+        Set the state of artwork ids in the crawl frontier
+        更新爬虫队列中作品id的状态
+        """
+        query_args = tuple((art_id, state.value) for art_id in art_ids)
+        if len(query_args) == 0:
+            return 0
+        query = f"""
+            INSERT INTO `pixiv_crawl_frontier` (
+                illusts_id, state
+            ) VALUES (
+                %s, %s
+            ) ON DUPLICATE KEY UPDATE
+                state=VALUES(state);
+        """
+        return await self._executemany(query, query_args)
+
+    async def get_frontier_art_ids(self, states: Iterable[FrontierState]) -> Set[int]:
+        """
+        Returns the artwork ids in the crawl frontier with one of the given states
+        获取爬虫队列中指定状态的作品id
+        """
+        states = tuple(state.value for state in states)
+        placeholders = ", ".join(["%s"] * len(states))
+        query = f"""
+            SELECT illusts_id
+            FROM `pixiv_crawl_frontier`
+            WHERE state IN ({placeholders});
+        """
+        data = await self._execute_and_fetchall(query, states)
+        return set(row[0] for row in data)
+
     async def get_art_by_art_id(self, art_id):
         query = f"""
             SELECT id, illusts_id, title, tags, view_count,
@@ -5,23 +5,28 @@ from urllib import parse
 from crawl.base import SearchResult, CreateSearchResultFromAPIResponse, RecommendResult, \
     CreateRecommendResultFromAPIResponse, ArtworkInfo, CreateArtworkInfoFromAPIResponse, \
     CreateUserAllIllustsResultFromAPIResponse
-from utils.httprequests import HttpRequests
+from utils.httprequests import HttpRequests, TooManyRequest
+from utils.ratelimit import AsyncTokenBucket
 from logger import Log
 
 
 class BasicRequest:
     SEARCH_API = "https://www.pixiv.net/ajax/search/artworks/%s?word=%s&p=%s&order=date_d&mode=all&s_mode" \
                  "=s_tag_full"
+    SEARCH_PAGE_SIZE = 60
+    SEARCH_MAX_PAGE = 1000
     DETAILS_API = "https://www.pixiv.net/touch/ajax/illust/details?illust_id=%s"
 
     COMMENTS_API = "https://www.pixiv.net/ajax/illusts/comments/roots?illust_id=%s&offset=3&limit=50&lang=zh"
 
     RECOMMEND_API = "https://www.pixiv.net/ajax/illust/%s/recommend/init?limit=18&lang=zh"
+    RECOMMEND_NEXT_API = "https://www.pixiv.net/ajax/illust/recommend/illusts?%s&lang=zh"
+    RECOMMEND_PAGE_SIZE = 18
 
     USER_ALL_API = "https://www.pixiv.net/ajax/user/%s/profile/all?lang=zh"
 
-    def __init__(self, cookie: str = ""):
-        self.client = HttpRequests()
+    def __init__(self, cookie: str = "", rate_limiter: AsyncTokenBucket = None, http_config: dict = None):
+        self.client = HttpRequests(rate_limiter=rate_limiter, http_config=http_config)
         self.cookie = cookie
 
     async def close(self):
@@ -29,8 +34,12 @@ class BasicRequest:
 
     async def is_logged_in(self):  # 注意，如果Cookie失效是无法爬虫，而且会一直卡住
         UserStatus_url = "https://www.pixiv.net/touch/ajax/user/self/status?lang=zh"
-        UserStatus_data = await self.client.ARequest_json("GET", UserStatus_url,
-                                                          headers=self._get_headers())
+        try:
+            UserStatus_data = await self.client.ARequest_json("GET", UserStatus_url,
+                                                              headers=self._get_headers())
+        except TooManyRequest:
+            Log.error("获取Pixiv用户状态失败，请求频繁")
+            return False
         if UserStatus_data.code != 0:
             Log.error("获取Pixiv用户状态失败")
             return False
@@ -59,7 +68,7 @@ class BasicRequest:
         s = parse.quote(search_str)
         date_range = ""
         if from_date and to_date:
-            date_range = "&scd=%s&ecd=%s" % (to_date, from_date)
+            date_range = "&scd=%s&ecd=%s" % (from_date, to_date)
         return self.SEARCH_API % (s, s, search_page) + date_range
 
     def _get_recommend_url(self, art_id: int) -> str:
@@ -71,10 +80,13 @@ class BasicRequest:
     def _get_user_all_url(self, user_id: int) -> str:
         return self.USER_ALL_API % user_id
 
-    async def search_artwork(self, keyword, page) -> SearchResult:
-        today = datetime.date.today()
-        seven_days_ago = datetime.date.today() + datetime.timedelta(-7)
-        search_url = self._get_search_url(keyword, page, from_date=seven_days_ago, to_date=today)
+    async def search_artwork(self, keyword, page,
+                             from_date: datetime.date = None,
+                             to_date: datetime.date = None) -> SearchResult:
+        if from_date is None or to_date is None:
+            to_date = datetime.date.today()
+            from_date = to_date + datetime.timedelta(-7)
+        search_url = self._get_search_url(keyword, page, from_date=from_date, to_date=to_date)
         search_res = await self.client.ARequest_json("GET", search_url, headers=self._get_headers())
         if search_res.code != 0:
             return
@@ -89,9 +101,26 @@ class BasicRequest:
         recommend_result = CreateRecommendResultFromAPIResponse(recommend_res.data)
         return recommend_result
 
+    async def get_recommendation_next(self, next_ids: Iterable[int]) -> RecommendResult:
+        """
+        获取推荐结果中 nextIds 对应的下一页推荐
+        """
+        query = "&".join("illust_ids[]=%s" % art_id for art_id in next_ids)
+        recommend_url = self.RECOMMEND_NEXT_API % query
+        recommend_res = await self.client.ARequest_json("GET", recommend_url, headers=self._get_headers())
+        if recommend_res.code != 0:
+            return
+        return CreateRecommendResultFromAPIResponse(recommend_res.data)
+
     async def download_artwork_info(self, art_id: int) -> ArtworkInfo:
+        """
+        :return: 作品信息，作品不存在或无法获取时返回None
+        :raise ConnectionError: 网络错误，可以稍后重试
+        """
         details_url = self._get_details_url(art_id)
         details_res = await self.client.ARequest_json("GET", details_url, headers=self._get_headers())
+        if details_res.code == 3:
+            raise ConnectionError("获取作品%s信息失败 %s" % (art_id, details_res.message))
         if details_res.code != 0:
             return None
         artwork_info = CreateArtworkInfoFromAPIResponse(details_res.data)
@@ -0,0 +1,65 @@
+import datetime
+from typing import Iterable, List
+
+
+class SearchShard:
+    """
+    一次搜索任务：一个关键词在一段日期内的搜索结果
+    One search job: a keyword within a date range
+    """
+
+    def __init__(self, keyword: str, from_date: datetime.date, to_date: datetime.date, genshin_only: bool = False):
+        """
+        :param genshin_only: 为True时只保留标签包含原神的作品，用于角色名等可能有歧义的关键词
+        """
+        self.keyword = keyword
+        self.from_date = from_date
+        self.to_date = to_date
+        self.genshin_only = genshin_only
+
+    def __repr__(self):
+        return "SearchShard(%s, %s ~ %s)" % (self.keyword, self.from_date, self.to_date)
+
+
+class SearchPlanner:
+    """
+    把搜索时间范围按天切分，避免单次搜索结果超过Pixiv的最大页数
+    Splits the search window into day-sized shards for every keyword, so no search hits Pixiv's page limit
+    """
+
+    def __init__(self, keywords: Iterable[str], character_keywords: Iterable[str] = None,
+                 days: int = 7, shard_days: int = 1):
+        """
+        :param keywords: 搜索关键词
+        :param character_keywords: 角色名关键词，搜索结果只保留标签包含原神的作品
+        :param days: 搜索最近多少天的作品
+        :param shard_days: 每个分片包含的天数
+        """
+        self.keywords = tuple(keywords)
+        self.character_keywords = tuple(character_keywords) if character_keywords is not None else tuple()
+        self.days = max(1, days)
+        self.shard_days = max(1, shard_days)
+
+    def date_ranges(self, today: datetime.date = None):
+        """
+        Returns [(from_date, to_date), ...], newest first. Both ends are inclusive.
+        """
+        if today is None:
+            today = datetime.date.today()
+        first_day = today - datetime.timedelta(days=self.days - 1)
+        ranges = []
+        to_date = today
+        while to_date >= first_day:
+            from_date = max(first_day, to_date - datetime.timedelta(days=self.shard_days - 1))
+            ranges.append((from_date, to_date))
+            to_date = from_date - datetime.timedelta(days=1)
+        return ranges
+
+    def plan(self, today: datetime.date = None) -> List[SearchShard]:
+        shards = []
+        for from_date, to_date in self.date_ranges(today):
+            for keyword in self.keywords:
+                shards.append(SearchShard(keyword, from_date, to_date))
+            for keyword in self.character_keywords:
+                shards.append(SearchShard(keyword, from_date, to_date, genshin_only=True))
+        return shards
@@ -0,0 +1,4 @@
+-- 记录作品最后一次被爬虫更新的时间，爬虫会跳过最近已经更新过的作品
+-- Last time the crawler refreshed an artwork, used to skip recently crawled artworks
+ALTER TABLE `pixiv`
+    ADD COLUMN `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
@@ -0,0 +1,10 @@
+-- Pixiv爬虫队列，记录每个作品id的状态，中断后可以使用 --resume 继续上次的任务
+-- Pixiv crawl frontier with per-artwork state, lets an interrupted crawl continue with --resume
+-- state: 0 queued, 1 in-flight, 2 done, 3 failed, 4 rejected by the filter
+CREATE TABLE IF NOT EXISTS `pixiv_crawl_frontier` (
+    `illusts_id` BIGINT UNSIGNED NOT NULL,
+    `state` TINYINT NOT NULL DEFAULT 0,
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (`illusts_id`),
+    KEY `idx_state` (`state`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,5 @@
+-- 保存Pixiv作品的AI生成类型，审核时可以排除AI作品
+-- Pixiv AI-generated flag of an artwork, lets the audit queue exclude AI works
+-- ai_type: 0 未知 unknown, 1 非AI not AI, 2 AI生成 AI-generated
+ALTER TABLE `pixiv`
+    ADD COLUMN `ai_type` TINYINT NOT NULL DEFAULT 0;
@@ -15,7 +15,9 @@ from config import config
 from logger import Log
 from sites import SiteManager
 from utils.base import Utils
+from utils.blobstore import BlobStore, set_default_store
 from service import SiteService, AuditService
+from service.pusher import PushScheduler
 
 utils = Utils(config)
 
@@ -29,6 +31,9 @@ def cancel(update: Update, _: CallbackContext) -> int:
 
 def main() -> None:
     Log.info("——————————————————————————————————————")
+    if config.BLOB_STORE:
+        Log.info("正在初始化图片存储")
+        set_default_store(BlobStore(**config.BLOB_STORE))
     Log.info("正在初始化网站管理器")
     manager = SiteManager()
     manager.load()
@@ -48,10 +53,19 @@ def main() -> None:
             "host": config.REDIS["host"],
             "port": config.REDIS["port"],
             "db": config.REDIS["database"],
+            "image_cache_ttl": config.REDIS.get("image_cache_ttl", 86400),
+            "image_cache_max_bytes": config.REDIS.get("image_cache_max_bytes", 512 * 1024 * 1024),
+            "pending_lease": config.REDIS.get("pending_lease", 600),
+            "audit_full_reload": config.REDIS.get("audit_full_reload", 3600),
         },
-        pixiv_cookie=config.PIXIV["cookie"]
+        pixiv_cookie=config.PIXIV["cookie"],
+        http_config=config.HTTP,
+        exclude_ai=(config.PIXIV.get("crawl") or {}).get("exclude_ai", True),
     )
     service.load()
+    migrated = service.cache.migrate_queue_members()
+    if migrated > 0:
+        Log.info("已转换 %s 个旧格式的队列成员" % migrated)
     Log.info("网站服务加载成功")
     Log.info("正在初始化审核服务")
     audit_service = AuditService(service=service)
@@ -97,7 +111,8 @@ def main() -> None:
         },
         fallbacks=[CommandHandler('cancel', cancel, run_async=True)],
     )
-    push = PushHandler(site_service=service, audit_service=audit_service)
+    push_scheduler = PushScheduler(updater.bot, audit_service, service.sender, config.TELEGRAM["channel"])
+    push = PushHandler(site_service=service, audit_service=audit_service, push_scheduler=push_scheduler)
     push_handler = ConversationHandler(
         entry_points=[CommandHandler('push', push.command_handler, run_async=True)],
         states={
@@ -172,6 +187,7 @@ def main() -> None:
     dispatcher.add_handler(CommandHandler("test", test, run_async=True))
     dispatcher.add_handler(examine_handler)
     dispatcher.add_handler(push_handler)
+    dispatcher.add_handler(CallbackQueryHandler(push.stop_handler, pattern="^push_stop:", run_async=True))
     dispatcher.add_handler(contribute_handler)
     dispatcher.add_handler(download_handler)
     dispatcher.add_handler(set_audit_handler)
@@ -180,9 +196,13 @@ def main() -> None:
     dispatcher.add_handler(MessageHandler((Filters.command & Filters.private), unknown_command, run_async=True))
     dispatcher.add_error_handler(error_handler)
 
+    updater.job_queue.run_repeating(lambda _: audit_service.reap_pending(),
+                                    interval=config.REDIS.get("pending_reap_interval", 60))
     updater.start_polling()
+    push_scheduler.resume()
 
     updater.idle()
+    push_scheduler.stop_all(timeout=10)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,10 @@
 # 参考了miHoYoBBS、Twitter、Pixiv以及现有的数据结构
+import io
 import os
+import weakref
 from enum import Enum
 import imghdr
+from utils.blobstore import BlobStore, get_default_store
 from utils.namemap import NameMap
 
 cur_path = os.path.realpath(os.getcwd())
@@ -129,15 +132,76 @@ class ArtworkInfo:
 
 
 class ArtworkImage:
+    """
+    设置了图片存储时，图片内容保存在磁盘上，对象只保存内容的sha256
+    对象存在期间内容在存储中被固定，不会被淘汰
+    """
 
     def __init__(self, art_id: int, page: int = 0, is_error: bool = False, data: bytes = b""):
         self.art_id = art_id
+        self.digest: str = ""
+        self.store: BlobStore = None
+        self._data = b""
+        self._unpin = None
         self.data = data
         self.is_error = is_error
         if not is_error:
-            self.format: str = imghdr.what(None, self.data)
+            self.format: str = imghdr.what(None, data)
         self.page = page
 
+    @property
+    def data(self) -> bytes:
+        """
+        :raise KeyError: 磁盘上的内容已经丢失
+        """
+        if self.store is None:
+            return self._data
+        return self.store.read(self.digest)
+
+    @data.setter
+    def data(self, data: bytes):
+        if self._unpin is not None:
+            self._unpin()
+            self._unpin = None
+        store = get_default_store()
+        if store is not None and 0 < len(data) <= store.max_bytes:
+            self._use_store(store, store.put(data, pin=True))
+        else:
+            self.digest = ""
+            self.store = None
+            self._data = data
+
+    def _use_store(self, store: BlobStore, digest: str):
+        """
+        使用存储中已经固定的内容，对象被回收时取消固定
+        """
+        self.digest = digest
+        self.store = store
+        self._data = b""
+        self._unpin = weakref.finalize(self, store.unpin, digest)
+
+    @classmethod
+    def from_store(cls, art_id: int, page: int, store: BlobStore, digest: str) -> "ArtworkImage":
+        """
+        使用存储中已有的内容创建，只读取文件头判断格式，不读取整个图片
+        :raise KeyError: 内容不存在或已被淘汰
+        """
+        image = cls(art_id, page)
+        store.pin(digest)
+        image._use_store(store, digest)
+        with store.open(digest) as buffer:
+            image.format = imghdr.what(None, buffer[:32])
+        return image
+
+    def open(self):
+        """
+        返回可以直接发送的文件对象，图片在磁盘上时返回内存映射
+        :raise KeyError: 磁盘上的内容已经丢失
+        """
+        if self.store is not None:
+            return self.store.open(self.digest)
+        return io.BytesIO(self._data)
+
 
 class AuditCount:
     def __init__(self, user_id: int = 0, total_count: int = 0, pass_count: int = 0, reject_count: int = 0):
@@ -1,5 +1,5 @@
 import re
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputMediaPhoto, ParseMode
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.error import BadRequest
 from telegram.ext import CallbackContext, ConversationHandler
 from telegram.utils.helpers import escape_markdown
@@ -57,18 +57,8 @@ class ContributeHandler:
                       artwork_info.origin_url
                   )
         try:
-            if len(images) > 1:
-                media = [InputMediaPhoto(media=img_info.data) for img_info in images]
-                media = media[:10]
-                media[0] = InputMediaPhoto(media=images[0].data, caption=caption,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
-                update.message.reply_media_group(media, timeout=30)
-            elif len(images) == 1:
-                photo = images[0].data
-                update.message.reply_photo(photo=photo,
-                                           caption=caption,
-                                           timeout=30,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
+            if len(images) > 0:
+                self.site_service.sender.reply(update.message, artwork_info, images, caption, gif_as="photo")
             else:
                 Log.error("图片获取失败")
                 update.message.reply_text("图片获取错误，找开发者背锅吧~", reply_markup=ReplyKeyboardRemove())  # excuse?
@@ -23,7 +23,9 @@ class Download:
             mysql_password=config.MYSQL["pass"],
             mysql_database=config.MYSQL["database"],
             pixiv_cookie=config.PIXIV["cookie"],
-            loop=self.loop
+            loop=self.loop,
+            crawl_config=config.PIXIV.get("crawl"),
+            http_config=config.HTTP,
         )
 
     def __del__(self):
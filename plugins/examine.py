@@ -1,6 +1,6 @@
 from typing import Optional, Iterable
 
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputMediaPhoto, ParseMode
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.error import BadRequest
 from telegram.ext import CallbackContext, ConversationHandler
 from telegram.utils.helpers import escape_markdown
@@ -10,6 +10,7 @@ from model.artwork import ArtworkInfo, ArtworkImage, AuditInfo, AuditType
 from utils.base import Utils
 from logger import Log
 from service import AuditService, SiteService
+from service.prefetch import AuditPrefetcher
 
 class ExamineCount:
     def __init__(self):
@@ -36,12 +37,40 @@ class ExamineHandlerData:
 
 class ExamineHandler:
     EXAMINE, EXAMINE_START, EXAMINE_RESULT, EXAMINE_REASON = range(10200, 10204)
+    PREFETCH_DEPTH = 3  # 预先下载的作品数量
 
     def __init__(self, site_service: SiteService = None, audit_service: AuditService = None):
         self.utils = Utils(config)
         self.site_service = site_service
         self.audit_service = audit_service
 
+    def get_prefetcher(self, context: CallbackContext) -> AuditPrefetcher:
+        examine_handler_data: ExamineHandlerData = context.chat_data["examine_handler_data"]
+        prefetcher: AuditPrefetcher = context.chat_data.get("examine_prefetcher")
+        if prefetcher is None or prefetcher.audit_type != examine_handler_data.audit_type:
+            self.close_prefetcher(context)
+            prefetcher = AuditPrefetcher(self.audit_service, examine_handler_data.audit_type, self.PREFETCH_DEPTH)
+            context.chat_data["examine_prefetcher"] = prefetcher
+        return prefetcher
+
+    @staticmethod
+    def close_prefetcher(context: CallbackContext):
+        """
+        退出审核时把预先取出的作品放回审核队列
+        """
+        prefetcher: AuditPrefetcher = context.chat_data.pop("examine_prefetcher", None)
+        if prefetcher is not None:
+            prefetcher.close()
+
+    def remaining(self, context: CallbackContext) -> int:
+        """
+        剩余作品数量，包括已经预先取出的作品
+        """
+        examine_handler_data: ExamineHandlerData = context.chat_data["examine_handler_data"]
+        prefetcher: AuditPrefetcher = context.chat_data.get("examine_prefetcher")
+        pending = prefetcher.pending if prefetcher is not None else 0
+        return self.audit_service.cache_size(examine_handler_data.audit_type) + pending
+
     def command_handler(self, update: Update, context: CallbackContext) -> int:
         user = update.effective_user
         Log.info("examine命令请求 user %s id %s" % (user["username"], user["id"]))
@@ -54,6 +83,7 @@ class ExamineHandler:
             message,
             reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True),
         )
+        self.close_prefetcher(context)
         if context.chat_data.get("examine_handler_data") is None:
             examine_handler_data = ExamineHandlerData()
             context.chat_data["examine_handler_data"] = examine_handler_data
@@ -86,13 +116,15 @@ class ExamineHandler:
         update.message.reply_text(message, reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True))
         return self.EXAMINE_START
 
-    def skip_handler(self, update: Update, _: CallbackContext) -> int:
+    def skip_handler(self, update: Update, context: CallbackContext) -> int:
+        self.close_prefetcher(context)
         user = update.message.from_user
         Log.info("User %s canceled the conversation.", user.username)
         update.message.reply_text('命令取消', reply_markup=ReplyKeyboardRemove())
         return ConversationHandler.END
 
-    def cancel_handler(self, update: Update, _: CallbackContext) -> int:
+    def cancel_handler(self, update: Update, context: CallbackContext) -> int:
+        self.close_prefetcher(context)
         user = update.message.from_user
         Log.info("User %s canceled the conversation.", user.username)
         update.message.reply_text('命令取消', reply_markup=ReplyKeyboardRemove())
@@ -101,14 +133,15 @@ class ExamineHandler:
     def start_handler(self, update: Update, context: CallbackContext) -> int:
         examine_count: ExamineCount = context.chat_data["examine_count"]
         examine_handler_data: ExamineHandlerData = context.chat_data["examine_handler_data"]
-        if self.audit_service.cache_size(examine_handler_data.audit_type) == 0:
+        if self.remaining(context) == 0:
+            self.close_prefetcher(context)
             update.message.reply_text('已经完成了当前的全部审核，退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
         reply_keyboard = [['通过', '撤销'], ['退出']]
         auto_status: str = ""
         if update.message.text == "下一个" or update.message.text == "OK":
             try:
-                result = self.audit_service.audit_next(examine_handler_data.audit_type)
+                result = self.get_prefetcher(context).next()
                 if result.is_error:
                     reply_keyboard = [['OK', '退出']]
                     update.message.reply_text(f"图片获取错误，返回错误信息为 {result.message}。"
@@ -127,14 +160,14 @@ class ExamineHandler:
                             auto_status = "通过"
                             examine_count.is_pass()
                             self.audit_service.audit_approve(audit_info, examine_handler_data.audit_type)
-                            remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+                            remaining = self.remaining(context)
                             reply_keyboard = []
                         elif audit_count.reject_count / audit_count.total_count >= 0.6:
                             auto_status = "拒绝"
                             examine_count.is_cancel()
                             self.audit_service.audit_reject(examine_handler_data.audit_info,
                                                             examine_handler_data.audit_type, "自动拒绝")
-                            remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+                            remaining = self.remaining(context)
                             reply_keyboard = []
                     elif examine_handler_data.audit_type == AuditType.NSFW:
                         if audit_count.reject_count / audit_count.total_count >= 0.6:
@@ -142,7 +175,7 @@ class ExamineHandler:
                             examine_count.is_cancel()
                             self.audit_service.audit_reject(examine_handler_data.audit_info,
                                                             examine_handler_data.audit_type, "自动拒绝")
-                            remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+                            remaining = self.remaining(context)
                             reply_keyboard = []
                     elif examine_handler_data.audit_type == AuditType.R18:
                         if audit_count.reject_count / audit_count.total_count >= 0.6:
@@ -150,7 +183,7 @@ class ExamineHandler:
                             examine_count.is_cancel()
                             self.audit_service.audit_reject(examine_handler_data.audit_info,
                                                             examine_handler_data.audit_type, "自动拒绝")
-                            remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+                            remaining = self.remaining(context)
                             reply_keyboard = []
                 caption = "Title %s   \n" \
                           "%s \n" \
@@ -163,28 +196,13 @@ class ExamineHandler:
                               artwork_info.origin_url
                           )
                 if len(artwork_images) > 1:
-                    media = [InputMediaPhoto(media=img_info.data) for img_info in artwork_images]
-                    media = media[:10]
-                    media[0] = InputMediaPhoto(media=artwork_images[0].data, caption=caption,
-                                               parse_mode=ParseMode.MARKDOWN_V2)
-                    update.message.reply_media_group(media, timeout=30)
+                    self.site_service.sender.reply(update.message, artwork_info, artwork_images, caption)
                     update.message.reply_text("是多张图片的作品呢，要看仔细了哦 ~ ",
                                               reply_markup=ReplyKeyboardMarkup(reply_keyboard,
                                                                                one_time_keyboard=True))
                 elif len(artwork_images) == 1:
-                    image = artwork_images[0]
-                    if image.format == "gif":
-                        update.message.reply_animation(animation=image.data,
-                                                       caption=caption,
-                                                       timeout=30,
-                                                       parse_mode=ParseMode.MARKDOWN_V2,
-                                                       reply_markup=ReplyKeyboardMarkup(reply_keyboard,
-                                                                                        one_time_keyboard=True))
-                    else:
-                        update.message.reply_photo(photo=image.data,
-                                                   caption=caption,
-                                                   timeout=30,
-                                                   parse_mode=ParseMode.MARKDOWN_V2,
+                    self.site_service.sender.reply(update.message, artwork_info, artwork_images, caption,
+                                                   gif_as="animation",
                                                    reply_markup=ReplyKeyboardMarkup(reply_keyboard,
                                                                                     one_time_keyboard=True))
                 else:
@@ -197,6 +215,7 @@ class ExamineHandler:
             except BadRequest as TError:
                 Log.error("encounter error with image caption\n%s" % caption)
                 Log.error(TError)
+                self.close_prefetcher(context)
                 update.message.reply_text('程序发生致命错误，退出审核', reply_markup=ReplyKeyboardRemove())
                 return ConversationHandler.END
             if auto_status != "":
@@ -205,6 +224,7 @@ class ExamineHandler:
                 return self.start_handler(update, context)
             return self.EXAMINE_RESULT
         elif update.message.text == "退出":
+            self.close_prefetcher(context)
             update.message.reply_text('退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
         else:
@@ -215,6 +235,7 @@ class ExamineHandler:
         examine_count: ExamineCount = context.chat_data["examine_count"]
         examine_handler_data: ExamineHandlerData = context.chat_data["examine_handler_data"]
         if update.message.text == "不够色":
+            self.close_prefetcher(context)
             update.message.reply_text('那你来发嗷！')
             update.message.reply_text('退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
@@ -228,6 +249,7 @@ class ExamineHandler:
         reply_keyboard = [['下一个', '退出']]
         if update.message.text == "退出":
             self.audit_service.audit_cancel(examine_handler_data.audit_info, examine_handler_data.audit_type)
+            self.close_prefetcher(context)
             update.message.reply_text('退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
         elif update.message.text == "通过" or update.message.text == "下一个":
@@ -240,7 +262,7 @@ class ExamineHandler:
         if IsPass:
             examine_count.is_pass()
             self.audit_service.audit_approve(examine_handler_data.audit_info, examine_handler_data.audit_type)
-            remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+            remaining = self.remaining(context)
             message = "你选择了：%s，已经确认。你已经审核%s个，通过%s个，撤销%s个。" \
                       "缓存池仍有%s件作品。请选择退出还是下一个。" % (
                           update.message.text, examine_count.all_count, examine_count.pass_count,
@@ -281,6 +303,7 @@ class ExamineHandler:
         examine_handler_data: ExamineHandlerData = context.chat_data["examine_handler_data"]
         reply_keyboard = [['下一个', '退出']]
         if update.message.text == "不够色":
+            self.close_prefetcher(context)
             update.message.reply_text('那你来发嗷！')
             update.message.reply_text('退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
@@ -292,6 +315,7 @@ class ExamineHandler:
             return self.EXAMINE_RESULT
         if update.message.text == "退出":
             self.audit_service.audit_cancel(examine_handler_data.audit_info, examine_handler_data.audit_type)
+            self.close_prefetcher(context)
             update.message.reply_text('退出审核', reply_markup=ReplyKeyboardRemove())
             return ConversationHandler.END
         reason = update.message.text
@@ -303,7 +327,7 @@ class ExamineHandler:
             return self.EXAMINE_RESULT
         self.audit_service.audit_reject(examine_handler_data.audit_info,
                                         examine_handler_data.audit_type, reason)
-        remaining = self.audit_service.cache_size(examine_handler_data.audit_type)
+        remaining = self.remaining(context)
         examine_count.is_cancel()
         message = "你选择了：%s，已经确认。你已经审核%s个，通过%s个，撤销%s个。缓存池仍有%s件作品。请选择退出还是下一个。" % (
             update.message.text, examine_count.all_count, examine_count.pass_count, examine_count.cancel_count,
@@ -1,4 +1,4 @@
-from telegram import Update, ReplyKeyboardRemove, InputMediaPhoto, ParseMode, ReplyKeyboardMarkup
+from telegram import Update, ReplyKeyboardRemove, ReplyKeyboardMarkup
 from telegram.error import BadRequest
 from telegram.ext import CallbackContext, ConversationHandler
 from telegram.utils.helpers import escape_markdown
@@ -99,24 +99,9 @@ class SearchHandler:
                       artwork_info.origin_url
                   )
         try:
-            if len(artwork_image) > 1:
-                media = [InputMediaPhoto(media=img_info.data) for img_info in artwork_image]
-                media = media[:10]
-                media[0] = InputMediaPhoto(media=artwork_image[0].data, caption=caption,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
-                update.message.reply_media_group(media, timeout=30)
-            elif len(artwork_image) == 1:
-                image = artwork_image[0]
-                if image.format == "gif":
-                    update.message.reply_animation(animation=image.data,
-                                                   caption=caption,
-                                                   timeout=30,
-                                                   parse_mode=ParseMode.MARKDOWN_V2)
-                else:
-                    update.message.reply_photo(photo=image.data,
-                                               caption=caption,
-                                               timeout=30,
-                                               parse_mode=ParseMode.MARKDOWN_V2)
+            if len(artwork_image) > 0:
+                self.site_service.sender.reply(update.message, artwork_info, artwork_image, caption,
+                                               gif_as="animation")
             else:
                 update.message.reply_text("图片获取错误，找开发者背锅吧~", reply_markup=ReplyKeyboardRemove())  # excuse?
                 return ConversationHandler.END
@@ -1,7 +1,7 @@
 from typing import Optional, List
 
 import telegram
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputMediaPhoto, ParseMode
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.error import BadRequest
 from telegram.ext import CallbackContext, ConversationHandler
 from telegram.utils.helpers import escape_markdown
@@ -112,25 +112,8 @@ class SendHandler:
                           artwork_info.origin_url
                       )
         try:
-            if len(artwork_image) > 1:
-                media = [InputMediaPhoto(media=img_info.data) for img_info in artwork_image]
-                media = media[:10]
-                media[0] = InputMediaPhoto(media=artwork_image[0].data, caption=caption,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
-                update.message.reply_media_group(media, timeout=30)
-            elif len(artwork_image) == 1:
-                image = artwork_image[0]
-                if image.format == "gif":
-                    update.message.reply_document(document=image.data,
-                                                  filename=f"{artwork_info.artwork_id}.{image.format}",
-                                                  caption=caption,
-                                                  timeout=30,
-                                                  parse_mode=ParseMode.MARKDOWN_V2)
-                else:
-                    update.message.reply_photo(photo=image.data,
-                                               caption=caption,
-                                               timeout=30,
-                                               parse_mode=ParseMode.MARKDOWN_V2)
+            if len(artwork_image) > 0:
+                self.send_service.sender.reply(update.message, artwork_info, artwork_image, caption)
             else:
                 update.message.reply_text("图片获取错误，找开发者背锅吧~", reply_markup=ReplyKeyboardRemove())  # excuse?
                 return ConversationHandler.END
@@ -185,25 +168,8 @@ class SendHandler:
                       artwork_info.origin_url
                   )
         try:
-            if len(images) > 1:
-                media = [InputMediaPhoto(media=img_info.data) for img_info in images]
-                media = media[:10]
-                media[0] = InputMediaPhoto(media=images[0].data, caption=caption,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
-                context.bot.send_media_group(channel_id, media=media, timeout=30)
-            elif len(images) == 1:
-                image = images[0]
-                if image.format == "gif":
-                    context.bot.send_document(channel_id, document=image.data,
-                                              filename=f"{artwork_info.artwork_id}.gif",
-                                              caption=caption,
-                                              timeout=30,
-                                              parse_mode=ParseMode.MARKDOWN_V2)
-                else:
-                    context.bot.send_photo(channel_id, photo=image.data,
-                                           caption=caption,
-                                           timeout=30,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
+            if len(images) > 0:
+                self.send_service.sender.send(context.bot, channel_id, artwork_info, images, caption)
             else:
                 update.message.reply_text("图片获取错误，找开发者背锅吧~", reply_markup=ReplyKeyboardRemove())
                 return ConversationHandler.END
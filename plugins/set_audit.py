@@ -1,7 +1,7 @@
 from typing import Optional, Iterable
 
 import telegram
-from telegram import Update, InputMediaPhoto, ParseMode, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ParseMode, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.error import BadRequest
 from telegram.ext import CallbackContext, ConversationHandler
 from telegram.utils.helpers import escape_markdown
@@ -115,25 +115,8 @@ class SetAuditHandler:
                                       reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True))
             return self.TWO
         try:
-            if len(images) > 1:
-                media = [InputMediaPhoto(media=img_info.data) for img_info in images]
-                media = media[:10]
-                media[0] = InputMediaPhoto(media=images[0].data, caption=caption,
-                                           parse_mode=ParseMode.MARKDOWN_V2)
-                update.message.reply_media_group(media, timeout=30)
-            elif len(images) == 1:
-                image = images[0]
-                if image.format == "gif":
-
-                    update.message.reply_animation(animation=image.data,
-                                                   caption=caption,
-                                                   timeout=30,
-                                                   parse_mode=ParseMode.MARKDOWN_V2)
-                else:
-                    update.message.reply_photo(photo=image.data,
-                                               caption=caption,
-                                               timeout=30,
-                                               parse_mode=ParseMode.MARKDOWN_V2)
+            if len(images) > 0:
+                self.site_service.sender.reply(update.message, artwork_info, images, caption, gif_as="animation")
             else:
                 Log.error("图片%s获取失败" % artwork_info.artwork_id)
                 update.message.reply_text("图片获取错误，找开发者背锅吧~", reply_markup=ReplyKeyboardRemove())
@@ -1,10 +1,11 @@
 import pipes
 import time
-import ujson
 import redis
 from enum import Enum
-from typing import Iterable
+from typing import Dict, Iterable, List, Optional
 
+from utils.imagecache import ImageCache
+from utils.queuemember import encode_member, is_legacy_member, migrate_member
 from utils.redisaction import RedisUpdate, RedisActionType
 from model.artwork import AuditType, ArtworkInfo
 
@@ -17,6 +18,7 @@ class QueueType(Enum):
     PENDING = "pending_keys_queue"
     PUSH = "push_keys_queue"
     DIFF = "diff_queue"
+    MARK = "audit_marks"
 
 
 class QueueName:
@@ -30,6 +32,7 @@ class QueueName:
         self.pending = self._queue_name(QueueType.PENDING, audit_type.value)  # sorted set
         self.push = self._queue_name(QueueType.PUSH, audit_type.value)  # set
         self.diff = self._queue_name(QueueType.DIFF, audit_type.value)  # sorted set
+        self.mark = self._queue_name(QueueType.MARK, audit_type.value)  # hash 网站 -> 上次加载到的数据库ID
 
     def _queue_name(self, queue_type: QueueType, audit_type: AuditType):
         if queue_type == QueueType.DIFF:
@@ -37,13 +40,46 @@ class QueueName:
         return f"{self._key_prefix}:{audit_type}:{queue_type.value}"
 
 
+# 从审核队列取出分数最高的作品移动到待审核队列，在Redis中执行，不需要把整个队列传回来
+# 待审核队列的分数为租约到期时间
+# KEYS[1] 审核队列 KEYS[2] 待审核队列 ARGV[1] 数量 ARGV[2] 租约到期时间
+POP_AUDIT_SCRIPT = """
+local items = redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')
+for i = 1, #items, 2 do
+    redis.call('ZREM', KEYS[1], items[i])
+    redis.call('ZADD', KEYS[2], ARGV[2], items[i])
+end
+return items
+"""
+
+# 把租约已经到期的作品放回审核队列
+# KEYS[1] 待审核队列 KEYS[2] 审核队列 ARGV[1] 当前时间 ARGV[2] 放回后的分数 ARGV[3] 一次最多处理的数量
+REAP_PENDING_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for i = 1, #items do
+    redis.call('ZREM', KEYS[1], items[i])
+    redis.call('ZADD', KEYS[2], ARGV[2], items[i])
+end
+return #items
+"""
+
+
+# 队列成员格式的版本，2 为 utils.queuemember 的紧凑格式
+QUEUE_MEMBER_VERSION = 2
+
+
 class ServiceCache:
 
-    def __init__(self, host="127.0.0.1", port=6379, db=0):
+    def __init__(self, host="127.0.0.1", port=6379, db=0, image_cache_ttl=86400,
+                 image_cache_max_bytes=512 * 1024 * 1024, pending_lease=600, audit_full_reload=3600):
         self.rdb = redis.Redis(host=host, port=port, db=db)
-        self.ttl = 600
+        self.ttl = pending_lease  # 取出作品的租约秒数，到期没有审核的作品会被放回审核队列
+        self.audit_full_reload = audit_full_reload  # 审核队列增量加载记录保留的秒数，过期后全部重新加载
         self.key_prefix = "picbed"
-        self.image_cache = f"{self.key_prefix}:image_cache"
+        self.image_cache = ImageCache(self.rdb, f"{self.key_prefix}:image_cache", ttl=image_cache_ttl,
+                                      max_bytes=image_cache_max_bytes)
+        self._pop_audit = self.rdb.register_script(POP_AUDIT_SCRIPT)
+        self._reap_pending = self.rdb.register_script(REAP_PENDING_SCRIPT)
 
     def _artwork_to_score_dict(self, artwork_audit_list: Iterable[ArtworkInfo]):
         """
@@ -53,11 +89,7 @@ class ServiceCache:
         """
         arts_score_dict = dict()
         for artwork in artwork_audit_list:
-            dicts = {
-                "post_id": artwork.artwork_id,
-                "site": artwork.site
-            }
-            key = ujson.dumps(dicts)
+            key = encode_member(artwork.site, artwork.artwork_id)
             arts_score_dict[key] = artwork.create_timestamp
         return arts_score_dict
 
@@ -68,6 +100,8 @@ class ServiceCache:
             return self.add_push(update.audit_type, update.data)
         elif update.action == RedisActionType.GET_AUDIT_ONE:
             return self.get_audit_one(update.audit_type)
+        elif update.action == RedisActionType.GET_AUDIT_MANY:
+            return self.get_audit_many(update.audit_type, update.data)
         elif update.action == RedisActionType.GET_PUSH_ONE:
             return self.get_push_one(update.audit_type)
         elif update.action == RedisActionType.REM_PENDING:
@@ -83,22 +117,49 @@ class ServiceCache:
 
     def add_audit(self, audit_type: AuditType, artwork_audit_list: Iterable[ArtworkInfo]) -> int:
         """
-        批量添加作品到缓存列表
+        批量添加作品到缓存列表，已经被取出正在审核的作品不会重复添加
         :param audit_type:
         :param artwork_audit_list:
-        :return:
+        :return: 缓存列表中的作品数量
         """
         qname = QueueName(audit_type, self.key_prefix)
         arts_score = self._artwork_to_score_dict(artwork_audit_list)
         if len(arts_score) > 0:
             def update_queue(pipe: pipes):
+                pending = {art_key.decode() for art_key in pipe.zrange(qname.pending, 0, -1)}
+                to_add = {art_key: score for art_key, score in arts_score.items() if art_key not in pending}
                 pipe.multi()
-                pipe.zadd(qname.audit, arts_score)
+                if len(to_add) > 0:
+                    pipe.zadd(qname.audit, to_add)
                 pipe.zcard(qname.audit)
 
-            art_count = self.rdb.transaction(update_queue, qname.audit)[1]
+            art_count = self.rdb.transaction(update_queue, qname.audit, qname.pending)[-1]
             return art_count
-        return 0
+        return self.rdb.zcard(qname.audit)
+
+    def get_audit_marks(self, audit_type: AuditType) -> Optional[Dict[str, int]]:
+        """
+        :return: 每个网站上次加载到的数据库ID，没有记录或已经过期时为None
+        """
+        qname = QueueName(audit_type, self.key_prefix)
+        marks = self.rdb.hgetall(qname.mark)
+        if len(marks) == 0:
+            return None
+        return {site.decode(): int(last_id) for site, last_id in marks.items()}
+
+    def set_audit_marks(self, audit_type: AuditType, marks: Dict[str, int]):
+        """
+        保存每个网站这次加载到的数据库ID，第一次保存时开始计算过期时间
+        """
+        if len(marks) == 0:
+            return
+        qname = QueueName(audit_type, self.key_prefix)
+        with self.rdb.pipeline(transaction=True) as pipe:
+            pipe.exists(qname.mark) \
+                .hset(qname.mark, mapping=marks)
+            existed = pipe.execute()[0]
+        if not existed:
+            self.rdb.expire(qname.mark, self.audit_full_reload)
 
     def putback_audit(self, audit_type: AuditType, art_key: str):
         """
@@ -116,33 +177,30 @@ class ServiceCache:
             pipe.multi()
             if result == 1:
                 pipe.zadd(qname.audit, {art_key: int(time.time())})
-                pipe.expire(qname.pending, self.ttl)
                 return 1
             return 0
 
         return self.rdb.transaction(update_queue, qname.audit, value_from_callable=True)
 
     def get_audit_one(self, audit_type: AuditType) -> str:
-        qname = QueueName(audit_type, self.key_prefix)
+        art_keys = self.get_audit_many(audit_type, 1)
+        return art_keys[0] if len(art_keys) > 0 else None
 
-        def update_queue(pipe):
-            art_with_score = pipe.zrevrange(qname.audit, 0, -1, withscores=True, score_cast_func=int)
-            art_key = art_score = None
-            if len(art_with_score) > 0:
-                art_key = art_with_score[0][0]
-                art_score = art_with_score[0][1]
-            pipe.multi()
-            if art_key is not None:
-                pipe.zrem(qname.audit, art_key)
-                pipe.zadd(qname.pending, {art_key: art_score})
-                pipe.expire(qname.pending, self.ttl)
-            return art_key
-
-        return self.rdb.transaction(update_queue, qname.audit, qname.pending, value_from_callable=True)
+    def get_audit_many(self, audit_type: AuditType, count: int) -> List[bytes]:
+        """
+        一次取出多个作品并移动到待审核队列
+        :param count: 最多取出的数量
+        :return: 按审核顺序排列的作品
+        """
+        if count <= 0:
+            return []
+        qname = QueueName(audit_type, self.key_prefix)
+        items = self._pop_audit(keys=[qname.audit, qname.pending], args=[count, time.time() + self.ttl])
+        return items[0::2]
 
     def remove_pending_audit(self, audit_type, art_key: str):
         """
-        从缓存列表移除对应作品
+        从缓存列表移除对应作品，租约到期后已经被放回审核队列的也一起移除，避免重复审核
         :param audit_type:
         :param art_key:
         :return:
@@ -150,9 +208,37 @@ class ServiceCache:
         qname = QueueName(audit_type, self.key_prefix)
         with self.rdb.pipeline(transaction=True) as pipe:
             pipe.zrem(qname.pending, art_key) \
-                .expire(qname.pending, self.ttl) \
+                .zrem(qname.audit, art_key) \
                 .execute()
 
+    def extend_pending(self, audit_type: AuditType, art_keys: Iterable[str]):
+        """
+        延长作品的租约，已经不在待审核队列中的作品不会被添加
+        """
+        qname = QueueName(audit_type, self.key_prefix)
+        deadline = time.time() + self.ttl
+        mapping = {art_key: deadline for art_key in art_keys}
+        if len(mapping) > 0:
+            self.rdb.zadd(qname.pending, mapping, xx=True)
+
+    def pending_size(self, audit_type: AuditType) -> int:
+        qname = QueueName(audit_type, self.key_prefix)
+        return self.rdb.zcard(qname.pending)
+
+    def reap_pending(self, audit_type: AuditType, batch: int = 1000) -> int:
+        """
+        把租约已经到期的作品放回审核队列
+        :return: 放回的作品数量
+        """
+        qname = QueueName(audit_type, self.key_prefix)
+        now = time.time()
+        total = 0
+        while True:
+            count = self._reap_pending(keys=[qname.pending, qname.audit], args=[now, int(now), batch])
+            total += count
+            if count < batch:
+                return total
+
     def add_push(self, audit_type: AuditType, artwork_audit_list: Iterable[ArtworkInfo]) -> int:
         qname = QueueName(audit_type, self.key_prefix)
         arts_to_add = self._artwork_to_score_dict(artwork_audit_list)
@@ -164,6 +250,40 @@ class ServiceCache:
                 return art_count
         return 0
 
+    def push_size(self, audit_type: AuditType) -> int:
+        qname = QueueName(audit_type, self.key_prefix)
+        return self.rdb.scard(qname.push)
+
+    def migrate_queue_members(self) -> int:
+        """
+        把审核、待审核和推送队列中旧版本的 JSON 成员转换为紧凑格式，转换完成后记录版本，之后启动时跳过
+        :return: 转换的成员数量
+        """
+        version_key = f"{self.key_prefix}:queue_member_version"
+        version = self.rdb.get(version_key)
+        if version is not None and int(version) >= QUEUE_MEMBER_VERSION:
+            return 0
+        total = 0
+        for audit_type in (AuditType.SFW, AuditType.NSFW, AuditType.R18):
+            qname = QueueName(audit_type, self.key_prefix)
+            for key in (qname.audit, qname.pending):
+                legacy = {member: score for member, score in self.rdb.zscan_iter(key) if is_legacy_member(member)}
+                if len(legacy) > 0:
+                    with self.rdb.pipeline(transaction=True) as pipe:
+                        pipe.zrem(key, *legacy.keys()) \
+                            .zadd(key, {migrate_member(member): score for member, score in legacy.items()}) \
+                            .execute()
+                    total += len(legacy)
+            legacy = [member for member in self.rdb.sscan_iter(qname.push) if is_legacy_member(member)]
+            if len(legacy) > 0:
+                with self.rdb.pipeline(transaction=True) as pipe:
+                    pipe.srem(qname.push, *legacy) \
+                        .sadd(qname.push, *[migrate_member(member) for member in legacy]) \
+                        .execute()
+                total += len(legacy)
+        self.rdb.set(version_key, QUEUE_MEMBER_VERSION)
+        return total
+
     def get_push_one(self, audit_type: AuditType) -> str:
         qname = QueueName(audit_type, self.key_prefix)
 
@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Tuple
+
+from logger import Log
+from model.artwork import AuditType
+from model.containers import ArtworkAuditData
+from service.service import AuditService
+
+
+class AuditPrefetcher:
+    """
+    审核预取：审核员处理当前作品时，后台线程已经在取出并下载后面的作品
+    每个审核会话一个，退出审核时把没有审核的作品放回审核队列
+    Per-session prefetch buffer for the examine loop
+    """
+
+    def __init__(self, audit_service: AuditService, audit_type: AuditType, depth: int = 3):
+        """
+        :param depth: 预先准备的作品数量
+        """
+        self.audit_service = audit_service
+        self.audit_type = audit_type
+        self.depth = max(1, depth)
+        self._executor = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="examine-prefetch")
+        self._buffer: Deque[Tuple[dict, Future]] = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """
+        已经从审核队列取出但还没有交给审核员的作品数量
+        """
+        return len(self._buffer)
+
+    def _fill(self):
+        for data in self.audit_service.get_audit_many(self.audit_type, self.depth - len(self._buffer)):
+            future = self._executor.submit(self.audit_service.audit_load, self.audit_type, data)
+            self._buffer.append((data, future))
+
+    def next(self) -> ArtworkAuditData:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("AuditPrefetcher is closed")
+            self._fill()
+            if len(self._buffer) == 0:
+                # 审核队列已空，交给 audit_next 从数据库重新填充
+                return self.audit_service.audit_next(self.audit_type)
+            data, future = self._buffer.popleft()
+            self._fill()
+            # 正在审核和预取的作品都续租
+            self.audit_service.extend_pending(self.audit_type, [data] + [d for d, _ in self._buffer])
+        return future.result()
+
+    @staticmethod
+    def _rejected(future: Future) -> bool:
+        """
+        获取失败的作品已经在 audit_load 中被拒绝，不需要放回
+        """
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return False
+        return future.result().is_error
+
+    def close(self):
+        """
+        退出审核：放回没有审核的作品
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while len(self._buffer) > 0:
+                data, future = self._buffer.popleft()
+                future.cancel()
+                if self._rejected(future):
+                    continue
+                try:
+                    self.audit_service.putback_audit(self.audit_type, data)
+                except Exception as exc:
+                    Log.error("放回审核队列失败 %s %s" % (data, exc))
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,227 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import redis
+import ujson
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
+from telegram.error import BadRequest, TelegramError
+from telegram.utils.helpers import escape_markdown
+
+from logger import Log
+from model.artwork import ArtworkInfo, AuditType
+from service.sender import MediaSender
+from service.service import AuditService
+
+
+class PushJob:
+    """
+    一个频道的推送任务，保存在Redis中，重启后继续推送
+    """
+
+    def __init__(self, audit_type: AuditType, chat_id: int = 0, message_id: int = 0):
+        """
+        :param chat_id: 显示推送进度的对话
+        :param message_id: 显示推送进度的消息
+        """
+        self.audit_type = audit_type
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    def to_json(self) -> str:
+        return ujson.dumps({"audit_type": self.audit_type.value, "chat_id": self.chat_id,
+                            "message_id": self.message_id})
+
+    @classmethod
+    def from_json(cls, data):
+        data = ujson.loads(data)
+        return cls(AuditType(data["audit_type"]), data["chat_id"], data["message_id"])
+
+
+class PushScheduler:
+    """
+    后台推送服务，每个频道一个推送线程，不占用对话处理线程
+    发送速度由 MediaSender 按 Telegram 的限制控制，push_interval 为额外的推送间隔，发送和等待期间预先获取下一个作品
+    Background push scheduler driven by the Redis push set, one worker thread per channel
+    """
+
+    # 发送速度已经由 MediaSender 控制，默认不额外等待
+    DEFAULT_INTERVAL = 0
+
+    def __init__(self, bot: Bot, audit_service: AuditService, sender: MediaSender, channels: dict):
+        """
+        :param channels: 配置文件中的 telegram.channel
+        """
+        self.bot = bot
+        self.audit_service = audit_service
+        self.sender = sender
+        self.channels = channels
+        self.rdb: redis.Redis = audit_service.cache.rdb
+        self.jobs_key = f"{audit_service.cache.key_prefix}:push_jobs"  # hash 推送类型 -> PushJob
+        self._workers: Dict[AuditType, threading.Thread] = {}
+        self._stop_events: Dict[AuditType, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def is_running(self, audit_type: AuditType) -> bool:
+        worker = self._workers.get(audit_type)
+        return worker is not None and worker.is_alive()
+
+    def start(self, job: PushJob) -> int:
+        """
+        开始推送，同一个类型只会有一个推送线程
+        :return: 待推送的作品数量，为0时不会开始推送
+        """
+        with self._lock:
+            if self.is_running(job.audit_type):
+                return self.audit_service.cache.push_size(job.audit_type)
+            remaining = self.audit_service.push_start(job.audit_type)
+            if remaining == 0:
+                self.rdb.hdel(self.jobs_key, job.audit_type.value)
+                return 0
+            self.rdb.hset(self.jobs_key, job.audit_type.value, job.to_json())
+            stop_event = threading.Event()
+            worker = threading.Thread(target=self._run, args=(job, stop_event),
+                                      name="push-%s" % job.audit_type.value, daemon=True)
+            self._stop_events[job.audit_type] = stop_event
+            self._workers[job.audit_type] = worker
+            worker.start()
+            return remaining
+
+    def stop(self, audit_type: AuditType):
+        stop_event = self._stop_events.get(audit_type)
+        if stop_event is not None:
+            stop_event.set()
+        self.rdb.hdel(self.jobs_key, audit_type.value)
+
+    def resume(self):
+        """
+        启动时继续上次没有完成的推送
+        """
+        for data in self.rdb.hvals(self.jobs_key):
+            job = PushJob.from_json(data)
+            Log.info("继续推送 %s" % job.audit_type.value)
+            self.start(job)
+
+    def interval(self, audit_type: AuditType) -> float:
+        return float(self.channels[audit_type.value].get("push_interval", self.DEFAULT_INTERVAL))
+
+    def _progress(self, job: PushJob, text: str, stop_button: bool = True):
+        """
+        更新推送进度消息，和推送一样经过 MediaSender 限流，更新失败不影响推送
+        """
+        if job.chat_id == 0:
+            return
+        reply_markup = None
+        if stop_button:
+            reply_markup = InlineKeyboardMarkup([[
+                InlineKeyboardButton("退出任务", callback_data="push_stop:%s" % job.audit_type.value)
+            ]])
+        try:
+            self.sender.edit_text(self.bot, job.chat_id, job.message_id, text, reply_markup=reply_markup)
+        except TelegramError as exc:
+            if "not modified" not in str(exc):
+                Log.warning("更新推送进度失败 %s" % exc)
+
+    @staticmethod
+    def get_caption(artwork_info: ArtworkInfo) -> str:
+        return "Title %s   \n" \
+               "Tags %s   \n" \
+               "From [%s](%s)" % (
+                   escape_markdown(artwork_info.title.replace('\\', '\\\\'), version=2),
+                   escape_markdown(artwork_info.GetStringTags(filter_character_tags=True), version=2),
+                   artwork_info.site_name,
+                   artwork_info.origin_url
+               )
+
+    def _send_warning(self, audit_type: AuditType, caption: str, message_id: int):
+        """
+        NSFW作品推送后在SFW频道发送跳转链接
+        """
+        url = "https://t.me/%s/%s" % (self.channels["NSFW"]["name"], message_id)
+        reply_keyboard = [[InlineKeyboardButton("点击查看/Click it to view", url=url)]]
+        text = " **%s警告/%s warning**   \n" \
+               "      \n" \
+               "%s" % (audit_type.name, audit_type.name, caption)
+        self.sender.send_text(self.bot, self.channels["SFW"]["char_id"], text,
+                              reply_markup=InlineKeyboardMarkup(reply_keyboard),
+                              parse_mode=ParseMode.MARKDOWN_V2, disable_web_page_preview=True)
+
+    def _run(self, job: PushJob, stop_event: threading.Event):
+        audit_type = job.audit_type
+        channel_id = self.channels[audit_type.value]["char_id"]
+        interval = self.interval(audit_type)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="push-prefetch-%s" % audit_type.value)
+        future = executor.submit(self.audit_service.push_next, audit_type)
+        try:
+            while not stop_event.is_set():
+                result = future.result()
+                future = None
+                if result.is_error:
+                    if result.status_code == 67144:
+                        # 推送队列已空
+                        break
+                    self._progress(job, "推送时发生警告，警告信息为 %s 详情警告请看日记" % result.message)
+                    future = executor.submit(self.audit_service.push_next, audit_type)
+                    continue
+                # 发送和等待期间获取下一个作品
+                future = executor.submit(self.audit_service.push_next, audit_type)
+                artwork_info = result.artwork_info
+                self._progress(job, "还剩下%s张图片正在排队..." % result.count)
+                caption = self.get_caption(artwork_info)
+                try:
+                    with self.audit_service.push_manager(artwork_info):
+                        sent = self.sender.send(self.bot, channel_id, artwork_info, result.artwork_image, caption)
+                        if audit_type == AuditType.NSFW and sent is not None:
+                            message_id = sent[0].message_id if isinstance(sent, list) else sent.message_id
+                            self._send_warning(audit_type, caption, message_id)
+                except BadRequest as exc:
+                    Log.error("图片发送出错 %s\n%s" % (exc, caption))
+                    self._progress(job, "图片发送出错，错误图片为 \n%s" % caption)
+                    stop_event.wait(interval)
+                    continue
+                except TelegramError as exc:
+                    Log.error("图片发送出错 %s" % exc)
+                    self._progress(job, "图片发送出错，错误信息请看日记")
+                    stop_event.wait(interval)
+                    continue
+                stop_event.wait(interval)
+        except Exception as exc:
+            Log.error("推送线程出错 %s" % exc)
+            self._progress(job, "推送出错，错误信息请看日记", stop_button=False)
+            return
+        finally:
+            if future is not None:
+                self._putback(audit_type, future)
+            executor.shutdown(wait=False)
+        if stop_event.is_set():
+            self._progress(job, "已经停止推送", stop_button=False)
+        else:
+            self.rdb.hdel(self.jobs_key, audit_type.value)
+            self._progress(job, "推送完成", stop_button=False)
+
+    def _putback(self, audit_type: AuditType, future):
+        """
+        停止推送时放回已经预先取出的作品
+        """
+        try:
+            result = future.result()
+        except Exception as exc:
+            Log.error("获取预取作品失败 %s" % exc)
+            return
+        if not result.is_error:
+            self.audit_service.push_putback(audit_type, result.artwork_info)
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        等待所有推送线程结束
+        """
+        for worker in list(self._workers.values()):
+            worker.join(timeout)
+
+    def stop_all(self, timeout: Optional[float] = None):
+        """
+        关闭机器人时停止推送，推送任务保留在Redis中，重启后继续
+        """
+        for stop_event in self._stop_events.values():
+            stop_event.set()
+        self.join(timeout)
@@ -0,0 +1,198 @@
+import threading
+from typing import Callable, Dict, List, Optional, TypeVar, Union
+
+import redis
+from telegram import Bot, Chat, InputMediaPhoto, Message, ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+from logger import Log
+from model.artwork import ArtworkImage, ArtworkInfo
+from service.cache import ServiceCache
+from utils.ratelimit import TokenBucket
+
+T = TypeVar("T")
+
+
+class MediaSender:
+    """
+    发送作品图片，第一次上传后保存 Telegram 返回的 file_id，之后发送同一张图片时直接使用 file_id
+    Sends artwork images, reusing the Telegram file_id of an earlier upload instead of uploading again
+
+    发送前按全局和每个对话的额度限流，遇到 RetryAfter 时按要求的时间暂停该对话并重试
+    """
+
+    MEDIA_GROUP_SIZE = 10
+    GLOBAL_RATE = 30  # 每秒消息数
+    GROUP_RATE = 20 / 60  # 群组和频道每秒消息数
+    GROUP_BURST = 5
+    PRIVATE_RATE = 1  # 私聊每秒消息数
+    PRIVATE_BURST = 3
+    MAX_RETRIES = 3
+    # file_id 失效或不可用时 Telegram 返回的 BadRequest 信息（小写）
+    FILE_ID_ERRORS = (
+        "wrong file identifier",
+        "wrong remote file",
+        "file reference expired",
+        "file_id",
+    )
+
+    def __init__(self, cache: ServiceCache):
+        self.rdb = cache.rdb
+        self.file_ids = f"{cache.key_prefix}:file_id"  # hash 网站:作品ID:页码:类型 -> file_id
+        self.global_bucket = TokenBucket(rate=self.GLOBAL_RATE, burst=self.GLOBAL_RATE)
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._chat_buckets_lock = threading.Lock()
+
+    def chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        with self._chat_buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                if isinstance(chat_id, int) and chat_id > 0:
+                    bucket = TokenBucket(rate=self.PRIVATE_RATE, burst=self.PRIVATE_BURST)
+                else:
+                    # 群组、频道的ID为负数或 @username
+                    bucket = TokenBucket(rate=self.GROUP_RATE, burst=self.GROUP_BURST)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def call(self, chat_id: Union[int, str], messages: int, func: Callable[[], T]) -> T:
+        """
+        在额度内调用发送方法，遇到 RetryAfter 时等待后重试
+        :param messages: 这次发送的消息数量，相册按图片数量计算
+        :param func: 每次重试都重新调用，文件对象需要在里面打开
+        """
+        chat_bucket = self.chat_bucket(chat_id)
+        for attempt in range(self.MAX_RETRIES):
+            chat_bucket.acquire(messages)
+            self.global_bucket.acquire(messages)
+            try:
+                result = func()
+            except RetryAfter as exc:
+                Log.warning("发送消息过快，%s 秒后重试 chat_id:%s" % (exc.retry_after, chat_id))
+                chat_bucket.throttle(exc.retry_after)
+                if attempt == self.MAX_RETRIES - 1:
+                    raise
+                continue
+            chat_bucket.recover()
+            return result
+
+    def send_text(self, bot: Bot, chat_id: Union[int, str], text: str, **kwargs) -> Message:
+        return self.call(chat_id, 1, lambda: bot.send_message(chat_id, text=text, **kwargs))
+
+    def edit_text(self, bot: Bot, chat_id: Union[int, str], message_id: int, text: str, **kwargs):
+        """
+        编辑消息也占用该对话的额度
+        """
+        return self.call(chat_id, 1, lambda: bot.edit_message_text(
+            text, chat_id=chat_id, message_id=message_id, **kwargs))
+
+    @staticmethod
+    def _field(artwork_info: ArtworkInfo, page: int, kind: str) -> str:
+        return f"{artwork_info.site}:{artwork_info.artwork_id}:{page}:{kind}"
+
+    def get_file_ids(self, artwork_info: ArtworkInfo, count: int, kind: str) -> List[Optional[str]]:
+        fields = [self._field(artwork_info, page, kind) for page in range(count)]
+        try:
+            return [None if v is None else v.decode() for v in self.rdb.hmget(self.file_ids, fields)]
+        except redis.RedisError as exc:
+            Log.warning("读取file_id缓存失败 %s" % exc)
+            return [None] * count
+
+    def save_file_ids(self, artwork_info: ArtworkInfo, kind: str, file_ids: List[Optional[str]]):
+        mapping = {self._field(artwork_info, page, kind): file_id
+                   for page, file_id in enumerate(file_ids) if file_id}
+        if len(mapping) == 0:
+            return
+        try:
+            self.rdb.hset(self.file_ids, mapping=mapping)
+        except redis.RedisError as exc:
+            Log.warning("写入file_id缓存失败 %s" % exc)
+
+    def forget_file_ids(self, artwork_info: ArtworkInfo, count: int, kind: str):
+        try:
+            self.rdb.hdel(self.file_ids, *[self._field(artwork_info, page, kind) for page in range(count)])
+        except redis.RedisError as exc:
+            Log.warning("删除file_id缓存失败 %s" % exc)
+
+    @classmethod
+    def is_file_id_error(cls, exc: BadRequest) -> bool:
+        message = exc.message.lower()
+        return any(error in message for error in cls.FILE_ID_ERRORS)
+
+    @staticmethod
+    def _message_file_id(message: Message, kind: str) -> Optional[str]:
+        if kind == "photo":
+            return message.photo[-1].file_id if message.photo else None
+        media = getattr(message, kind, None) or message.document or message.animation
+        return media.file_id if media is not None else None
+
+    def send(self, bot: Bot, chat_id: Union[int, str], artwork_info: ArtworkInfo, images: List[ArtworkImage],
+             caption: str, gif_as: str = "document", reply_to_message_id: int = None, reply_markup=None,
+             timeout: float = 30) -> Union[Message, List[Message], None]:
+        """
+        发送作品图片，多张图片时发送前10张组成的相册
+        :param gif_as: 单张GIF的发送方式 animation/document/photo
+        :return: 发送的消息，多张图片时为消息列表，没有图片时为None
+        """
+        if len(images) == 0:
+            return None
+        images = images[:self.MEDIA_GROUP_SIZE]
+        if len(images) > 1:
+            kind = "photo"
+        elif images[0].format == "gif":
+            kind = gif_as
+        else:
+            kind = "photo"
+        file_ids = self.get_file_ids(artwork_info, len(images), kind)
+        try:
+            result = self._send(bot, chat_id, artwork_info, images, file_ids, kind, caption,
+                                reply_to_message_id, reply_markup, timeout)
+        except BadRequest as exc:
+            if not any(file_ids) or not self.is_file_id_error(exc):
+                raise
+            # file_id 失效时重新上传
+            Log.warning("使用file_id发送失败，重新上传 %s" % exc)
+            self.forget_file_ids(artwork_info, len(images), kind)
+            file_ids = [None] * len(images)
+            result = self._send(bot, chat_id, artwork_info, images, file_ids, kind, caption,
+                                reply_to_message_id, reply_markup, timeout)
+        messages = result if isinstance(result, list) else [result]
+        if not all(file_ids):
+            self.save_file_ids(artwork_info, kind, [self._message_file_id(m, kind) for m in messages])
+        return result
+
+    def _send(self, bot: Bot, chat_id, artwork_info: ArtworkInfo, images: List[ArtworkImage],
+              file_ids: List[Optional[str]], kind: str, caption: str, reply_to_message_id, reply_markup, timeout):
+        def inputs():
+            return [file_id or image.open() for image, file_id in zip(images, file_ids)]
+
+        if len(images) > 1:
+            def send_media_group():
+                files = inputs()
+                media = [InputMediaPhoto(media=files[0], caption=caption, parse_mode=ParseMode.MARKDOWN_V2)]
+                media += [InputMediaPhoto(media=f) for f in files[1:]]
+                return bot.send_media_group(chat_id, media, reply_to_message_id=reply_to_message_id, timeout=timeout)
+
+            return self.call(chat_id, len(images), send_media_group)
+        kwargs = {
+            "caption": caption,
+            "parse_mode": ParseMode.MARKDOWN_V2,
+            "reply_to_message_id": reply_to_message_id,
+            "reply_markup": reply_markup,
+            "timeout": timeout,
+        }
+        if kind == "animation":
+            return self.call(chat_id, 1, lambda: bot.send_animation(chat_id, inputs()[0], **kwargs))
+        if kind == "document":
+            filename = f"{artwork_info.artwork_id}.{images[0].format}"
+            return self.call(chat_id, 1, lambda: bot.send_document(chat_id, inputs()[0], filename=filename, **kwargs))
+        return self.call(chat_id, 1, lambda: bot.send_photo(chat_id, inputs()[0], **kwargs))
+
+    def reply(self, message: Message, artwork_info: ArtworkInfo, images: List[ArtworkImage], caption: str,
+              **kwargs) -> Union[Message, List[Message], None]:
+        """
+        和 Message.reply_* 相同，在群组中引用原消息
+        """
+        reply_to_message_id = message.message_id if message.chat.type != Chat.PRIVATE else None
+        return self.send(message.bot, message.chat_id, artwork_info, images, caption,
+                         reply_to_message_id=reply_to_message_id, **kwargs)
@@ -1,6 +1,5 @@
 from contextlib import contextmanager
-from typing import List
-import ujson
+from typing import Dict, List, Optional, Tuple
 
 from logger import Log
 from model.artwork import AuditType, AuditInfo, AuditStatus, AuditCount
@@ -9,6 +8,9 @@ from model.containers import ArtworkData, ArtworkAuditData, ArtworkPushData
 from model.helpers import parse_artwork_data, parse_artwork_audit_data, parse_artwork_push_data
 from service.cache import ServiceCache
 from service.repository import ServiceRepository
+from service.sender import MediaSender
+from utils.metacache import MetadataCache
+from utils.queuemember import decode_member, encode_member
 from utils.redisaction import RedisUpdate
 
 
@@ -20,8 +22,12 @@ class SiteService:
         self.sql_config: dict = {}
         self.redis_config: dict = {}
         self.pixiv_cookie: str = ""
+        self.http_config: dict = {}
+        self.exclude_ai: bool = True
         self.service_repository: ServiceRepository = None
         self.cache = None
+        self.meta_cache = None
+        self.sender = None
 
     def set_handlers(self, handlers):
         self.BaseSizeHandlers = handlers
@@ -30,10 +36,14 @@ class SiteService:
         self.sql_config = sql_config
         self.redis_config = redis_config
         self.pixiv_cookie: str = args.get('pixiv_cookie', "")
+        self.http_config: dict = args.get('http_config') or {}
+        self.exclude_ai: bool = args.get('exclude_ai', True)
 
     def load(self):
         self.service_repository: ServiceRepository = ServiceRepository(**self.sql_config)
         self.cache: ServiceCache = ServiceCache(**self.redis_config)
+        self.meta_cache: MetadataCache = MetadataCache.from_config(self.cache.rdb, self.http_config)
+        self.sender: MediaSender = MediaSender(self.cache)
         for handler in self.BaseSizeHandlers:
             handler_size = handler[0]
             handler_module_name = handler[1]
@@ -42,7 +52,9 @@ class SiteService:
                 if callable(handler_call):
                     self.SiteClassHandlers.append((
                         handler_size,
-                        handler_call(sql_config=self.sql_config, pixiv_cookie=self.pixiv_cookie)
+                        handler_call(sql_config=self.sql_config, pixiv_cookie=self.pixiv_cookie,
+                                     http_config=self.http_config, meta_cache=self.meta_cache,
+                                     image_cache=self.cache.image_cache, exclude_ai=self.exclude_ai)
                     ))
                 Log.info(f"{handler_size} 网站 {handler_module_name} 模块 加载成功")
 
@@ -119,16 +131,26 @@ class SiteService:
     def get_audit_info(self, artwork_info: ArtworkInfo) -> AuditInfo:
         return self.service_repository.get_audit_info(artwork_info)
 
-    def get_art_for_audit(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
+    def get_art_for_audit_since(self, audit_type: AuditType = AuditType.SFW,
+                                marks: Optional[Dict[str, int]] = None) -> Tuple[List[ArtworkInfo], Dict[str, int]]:
+        """
+        增量加载待审核作品
+        增量加载只能发现数据库ID大于上次记录的新作品，ID不大于记录的作品重新变为待审核时，
+        要等到记录过期（redis.audit_full_reload）后全部重新加载才会加入审核队列
+        只加载有 get_art_for_audit_since 的网站，其他网站（twitter、bilibili）不加入审核队列
+        :param marks: 每个网站上次加载到的数据库ID，为None时全部重新加载
+        :return: 作品列表和每个网站这次加载到的数据库ID
+        """
+        marks = dict(marks or {})
         artwork_info_list: list = []
         for handler in self.SiteClassHandlers:
+            handler_size = handler[0]
             handler_call = handler[1]
-            try:
-                if hasattr(handler_call, "get_art_for_audit"):
-                    artwork_info_list += handler_call.get_art_for_audit(audit_type)
-            except AttributeError:
-                pass
-        return artwork_info_list
+            if hasattr(handler_call, "get_art_for_audit_since"):
+                artwork_list, marks[handler_size] = handler_call.get_art_for_audit_since(
+                    audit_type, marks.get(handler_size, 0))
+                artwork_info_list += artwork_list
+        return artwork_info_list, marks
 
     def get_art_for_push(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
         artwork_info_list: list = []
@@ -150,11 +172,14 @@ class AuditService:
         self.audit_repository: ServiceRepository = service.service_repository
 
     def get_cache_key(self, audit_info: AuditInfo):
-        arts_dict = {
-            "post_id": audit_info.connection_id,
-            "site": audit_info.site
-        }
-        return ujson.dumps(arts_dict)
+        return encode_member(audit_info.site, audit_info.connection_id)
+
+    @staticmethod
+    def get_data_key(data: dict) -> str:
+        """
+        get_audit 返回的 {"post_id", "site"} 对应的缓存键
+        """
+        return encode_member(data["site"], data["post_id"])
 
     def get_artwork_info_and_image(self, site: str, post_id: int) -> ArtworkData:
         return self.service.get_artwork_info_and_image(site, post_id)
@@ -168,24 +193,40 @@ class AuditService:
     def get_audit(self, audit_type: AuditType):
         update = RedisUpdate.get_audit_one(audit_type)
         data = self.cache.apply_update(update)
-        return ujson.loads(data)
+        if data is None:
+            return None
+        return decode_member(data)
+
+    def get_audit_many(self, audit_type: AuditType, count: int) -> List[dict]:
+        update = RedisUpdate.get_audit_many(audit_type, count)
+        return [decode_member(data) for data in self.cache.apply_update(update)]
+
+    def putback_audit(self, audit_type: AuditType, data: dict):
+        """
+        把取出但没有审核的作品放回审核队列
+        """
+        update = RedisUpdate.putback_audit(audit_type, self.get_data_key(data))
+        self.cache.apply_update(update)
 
     def get_push_one(self, audit_type: AuditType):
         update = RedisUpdate.get_push_one(audit_type)
         data, count = self.cache.apply_update(update)
         if data is None:
             return None, count
-        return ujson.loads(data), count
+        return decode_member(data), count
 
     def audit_start(self, audit_type: AuditType) -> int:
         """
         :param audit_type: 设置审核的类型，并对审核进行初始化
         :return: 审核数量
         """
-        # 1. Get from database  从数据库获取到要审核的数据
-        artwork_audit_list = self.service.get_art_for_audit(audit_type)
+        # 1. Get from database  从数据库获取上次加载之后新增的数据，没有记录时全部重新加载
+        marks = self.cache.get_audit_marks(audit_type)
+        artwork_audit_list, marks = self.service.get_art_for_audit_since(audit_type, marks)
         update = RedisUpdate.add_audit(audit_type, artwork_audit_list)
-        return self.cache.apply_update(update)
+        count = self.cache.apply_update(update)
+        self.cache.set_audit_marks(audit_type, marks)
+        return count
 
     def audit_next(self, audit_type: AuditType) -> ArtworkAuditData:
         """
@@ -202,6 +243,13 @@ class AuditService:
             data = self.get_audit(audit_type)
             if data is None:
                 return parse_artwork_audit_data(error_message="缓存错误")
+        return self.audit_load(audit_type, data)
+
+    def audit_load(self, audit_type: AuditType, data: dict) -> ArtworkAuditData:
+        """
+        获取已经从审核队列取出的作品信息和图片，获取失败时直接拒绝该作品
+        :param data: get_audit 返回的 {"post_id", "site"}
+        """
         art_data = self.get_artwork_info_and_image(**data)
         if art_data.is_error:
             Log.error("图片获取错误 site:%s post_id:%s" % (data["site"], data["post_id"]))
@@ -234,11 +282,38 @@ class AuditService:
     def cache_size(self, audit_type: AuditType) -> int:
         return self.cache.audit_size(audit_type)
 
+    def extend_pending(self, audit_type: AuditType, data_list: List[dict]):
+        """
+        延长已取出作品的租约
+        :param data_list: get_audit 返回的 {"post_id", "site"}
+        """
+        self.cache.extend_pending(audit_type, [self.get_data_key(data) for data in data_list])
+
+    def reap_pending(self) -> int:
+        """
+        把所有类型中租约到期的作品放回审核队列，由定时任务调用
+        :return: 放回的作品数量
+        """
+        total = 0
+        for audit_type in (AuditType.SFW, AuditType.NSFW, AuditType.R18):
+            count = self.cache.reap_pending(audit_type)
+            if count > 0:
+                Log.info("%s 审核队列放回 %s 个超时作品" % (audit_type.value, count))
+            total += count
+        return total
+
     def push_start(self, audit_type: AuditType) -> int:
         artwork_audit_list = self.service.get_art_for_push(audit_type)
         update = RedisUpdate.add_push(audit_type, artwork_audit_list)
         return self.cache.apply_update(update)
 
+    def push_putback(self, audit_type: AuditType, artwork_info: ArtworkInfo):
+        """
+        把取出但没有推送的作品放回推送队列
+        """
+        update = RedisUpdate.add_push(audit_type, [artwork_info])
+        self.cache.apply_update(update)
+
     def push_next(self, audit_type: AuditType) -> ArtworkPushData:
         # 1. Get from redis
         data, count = self.get_push_one(audit_type)
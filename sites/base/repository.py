@@ -30,6 +30,25 @@ class Repository:
             conn.commit()
             return result
 
+    def _execute_and_iterate(self, query, args, batch_size: int = 1000):
+        """
+        使用不缓冲的游标逐批读取查询结果，结果集很大时不会一次全部读入内存
+        读取期间一直占用一个连接，需要读完或关闭返回的迭代器
+        """
+        with self.sql_pool.get_connection() as conn:
+            with conn.cursor(buffered=False) as cur:
+                cur.execute(query, args)
+                try:
+                    while True:
+                        rows = cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield from rows
+                finally:
+                    # 没有读完就停止时丢弃剩下的结果，连接才能放回连接池
+                    conn.consume_results()
+            conn.commit()
+
 
 class AsyncRepository:
     def __init__(self, mysql_host: str = "127.0.0.1", mysql_port: int = 3306, mysql_user: str = "root",
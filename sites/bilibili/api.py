@@ -1,12 +1,19 @@
-import httpx
-
 from sites.bilibili.base import CreateArtworkInfoFromAPIResponse, BArtworkInfo
+from utils.httpclient import create_client
+from utils.metacache import MetadataCache, fetch_json
 
 
 def get_info_url(dynamic_id: int) -> str:
     return f"https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/get_dynamic_detail?dynamic_id=={dynamic_id}"
 
 
+def is_valid_response(data) -> bool:
+    """
+    出错时接口仍然返回200，code 不为0
+    """
+    return isinstance(data, dict) and data.get("code") == 0
+
+
 def get_headers():
     return {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -16,8 +23,15 @@ def get_headers():
 
 class BilibiliApi:
 
+    def __init__(self, http_config: dict = None, meta_cache: MetadataCache = None):
+        self.client = create_client(http_config)
+        self.meta_cache = meta_cache
+
     def get_artwork_info(self, dynamic_id: int) -> BArtworkInfo:
         url = get_info_url(dynamic_id)
         headers = get_headers()
-        response = httpx.get(url=url, headers=headers).json()
+        _, response = fetch_json(self.client, self.meta_cache, "bilibili", dynamic_id, url,
+                                 is_valid=is_valid_response, headers=headers)
+        if response is None:
+            return None
         return CreateArtworkInfoFromAPIResponse(response)
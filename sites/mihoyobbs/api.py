@@ -1,14 +1,22 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
-import httpx
 
 from model.artwork import ArtworkImage
 from sites.mihoyobbs.base import CreateArtworkListFromAPIResponse, MiHoYoBBSResponse, ImagePostListResponse, \
     MArtworkInfo
+from utils.httpclient import create_client, create_async_client
+from utils.metacache import MetadataCache, fetch_json
 
 
 class BaseMihoyobbsApi:
+    @staticmethod
+    def is_valid_response(data) -> bool:
+        """
+        出错时接口仍然返回200，retcode 不为0
+        """
+        return isinstance(data, dict) and data.get("retcode") == 0
+
     @staticmethod
     def get_list_uri() -> str:
         return f"https://bbs-api.mihoyo.com/post/wapi/getForumPostList"
@@ -87,8 +95,8 @@ class BaseMihoyobbsApi:
 
 
 class AsyncMihoyobbsApi(BaseMihoyobbsApi):
-    def __init__(self):
-        self.client = httpx.AsyncClient(headers=self.get_headers())
+    def __init__(self, http_config: dict = None):
+        self.client = create_async_client(http_config, headers=self.get_headers())
 
     async def get_image_post_list(self, forum_id: int, image_type: int, page_size: int = 21) -> List[int]:
         url = self.get_image_post_list_url()
@@ -155,11 +163,15 @@ class AsyncMihoyobbsApi(BaseMihoyobbsApi):
 
 class MihoyobbsApi(BaseMihoyobbsApi):
 
+    def __init__(self, http_config: dict = None, meta_cache: MetadataCache = None):
+        self.client = create_client(http_config)
+        self.meta_cache = meta_cache
+
     def get_artwork_list(self, forum_id: int, is_good: bool = False, is_hot: bool = False, page_size: int = 20):
         url = self.get_list_uri()
         headers = self.get_headers()
         params = self.get_list_url_params(forum_id=forum_id, is_good=is_good, is_hot=is_hot, page_size=page_size)
-        response = httpx.get(url=url, headers=headers, params=params)
+        response = self.client.get(url=url, headers=headers, params=params)
         if response.is_error:
             return None
         return CreateArtworkListFromAPIResponse(response.json())
@@ -167,10 +179,11 @@ class MihoyobbsApi(BaseMihoyobbsApi):
     def get_artwork_info(self, post_id: int) -> MiHoYoBBSResponse:
         url = self.get_info_url(post_id)
         headers = self.get_headers()
-        response = httpx.get(url=url, headers=headers)
-        if response.is_error:
+        _, response = fetch_json(self.client, self.meta_cache, "mihoyobbs", post_id, url,
+                                 is_valid=self.is_valid_response, headers=headers)
+        if response is None:
             return MiHoYoBBSResponse(error_message="请求错误")
-        return MiHoYoBBSResponse(response.json())
+        return MiHoYoBBSResponse(response)
 
     def get_images(self, response: MiHoYoBBSResponse) -> List[ArtworkImage]:
         if response is None:
@@ -196,7 +209,7 @@ class MihoyobbsApi(BaseMihoyobbsApi):
 
     def download_image(self, post_id: int, url: str, page: int = 0) -> ArtworkImage:
         headers = self.get_headers()
-        response = httpx.get(url, headers=headers, params=self.get_images_params(resize=2000), timeout=5)
+        response = self.client.get(url, headers=headers, params=self.get_images_params(resize=2000), timeout=5)
         if response.is_error:
             return ArtworkImage(post_id, page, True)
         return ArtworkImage(post_id, page, data=response.content)
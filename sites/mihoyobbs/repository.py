@@ -1,4 +1,4 @@
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Tuple
 
 from model.artwork import AuditType, AuditStatus, AuditInfo, AuditCount
 from sites.base.repository import Repository, AsyncRepository
@@ -57,34 +57,46 @@ class MihoyobbsRepository(Repository):
         )
         return self._executemany_and_fetchall(query, query_args)
 
-    def get_art_for_push(self, audit_type: AuditType) -> List[AuditInfo]:
-        query = rf"""
-            SELECT post_id, type, status, reason
-            FROM `mihoyobbs_audit`
-            WHERE type=%s AND status=%s;
-        """
-        query_args = (audit_type.value, AuditStatus.PASS.value,)
-        data = self._execute_and_fetchall(query, query_args)
-        return [CreateArtworkAuditInfoFromSQLData(i) for i in data]
-
     def get_audit_count(self, user_id: int) -> AuditCount:
         # 寄
         return AuditCount(user_id=user_id)
 
-    def get_art_for_audit(self) -> List[AuditInfo]:
+    def get_art_for_audit_since(self, last_id: int = 0) -> Iterator[Tuple[MArtworkInfo, AuditInfo]]:
         """
-        :return: 返回带有作品具体信息的列表
+        一次查询获取 mihoyobbs.id 大于 last_id 的待审核作品和审核信息
+        :param last_id: 上次加载到的 mihoyobbs.id，为0时加载全部
+        :return: 按 mihoyobbs.id 排序的作品和审核信息
         """
         query = rf"""
-                    SELECT post_id, type, status, reason
-                    FROM `mihoyobbs_audit`
-                    WHERE status IS NULL or status = 0
-                """
-        query_args = ()
-        data = self._execute_and_fetchall(query, query_args)
-        if len(data) == 0:
-            return []
-        return [CreateArtworkAuditInfoFromSQLData(i) for i in data]
+            SELECT m.id, m.post_id, m.title, m.tags, m.view_num, m.reply_num, m.like_num, m.bookmark_num,
+                   m.forward_num, m.uid, m.created_at,
+                   ma.type, ma.status, ma.reason
+            FROM `mihoyobbs_audit` AS ma
+            INNER JOIN `mihoyobbs` AS m
+                ON m.post_id = ma.post_id
+            WHERE (ma.status IS NULL or ma.status = 0) AND m.id > %s
+            ORDER BY m.id
+        """
+        query_args = (last_id,)
+        for i in self._execute_and_iterate(query, query_args):
+            yield CreateMArtworkFromSQLData(i[:11]), CreateArtworkAuditInfoFromSQLData(i[1:2] + i[11:])
+
+    def get_art_for_push_with_info(self, audit_type: AuditType) -> Iterator[Tuple[MArtworkInfo, AuditInfo]]:
+        """
+        一次查询获取待推送的作品和审核信息
+        """
+        query = rf"""
+            SELECT m.id, m.post_id, m.title, m.tags, m.view_num, m.reply_num, m.like_num, m.bookmark_num,
+                   m.forward_num, m.uid, m.created_at,
+                   ma.type, ma.status, ma.reason
+            FROM `mihoyobbs_audit` AS ma
+            INNER JOIN `mihoyobbs` AS m
+                ON m.post_id = ma.post_id
+            WHERE ma.type=%s AND ma.status=%s;
+        """
+        query_args = (audit_type.value, AuditStatus.PASS.value,)
+        for i in self._execute_and_iterate(query, query_args):
+            yield CreateMArtworkFromSQLData(i[:11]), CreateArtworkAuditInfoFromSQLData(i[1:2] + i[11:])
 
 
 class AsyncMihoyobbsRepository(AsyncRepository):
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Tuple
 
 from model.artwork import ArtworkInfo, ArtworkImage, AuditType
 from model.containers import ArtworkData
@@ -6,19 +6,22 @@ from model.helpers import parse_artwork_data
 from sites import listener
 from sites.mihoyobbs.api import MihoyobbsApi
 from sites.mihoyobbs.repository import MihoyobbsRepository
+from utils.imagecache import cached_images
 
 
 @listener(site_name="mihoyobbs", module_name="MihoyobbsService")
 class MihoyobbsService:
     def __init__(self, sql_config=None, **args):
         self.repository = MihoyobbsRepository(**sql_config)
-        self.api = MihoyobbsApi()
+        self.api = MihoyobbsApi(http_config=args.get("http_config"), meta_cache=args.get("meta_cache"))
+        self.image_cache = args.get("image_cache")
 
     def get_artwork_info_and_image(self, post_id: int) -> ArtworkData:
         temp_artwork_info = self.api.get_artwork_info(post_id)
         if temp_artwork_info.error:
             return parse_artwork_data(error_message=temp_artwork_info.message)
-        artwork_image = self.api.get_images(temp_artwork_info)
+        artwork_image = cached_images(self.image_cache, "mihoyobbs", post_id,
+                                      lambda: self.api.get_images(temp_artwork_info))
         artwork_info = temp_artwork_info.results.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
@@ -29,28 +32,28 @@ class MihoyobbsService:
         temp_artwork_info = self.api.get_artwork_info(post_id)
         if temp_artwork_info.error:
             return parse_artwork_data(error_message=temp_artwork_info.message)
-        artwork_image = self.api.get_images(temp_artwork_info)
+        artwork_image = cached_images(self.image_cache, "mihoyobbs", post_id,
+                                      lambda: self.api.get_images(temp_artwork_info))
         artwork_info = temp_artwork_info.results.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
     def contribute(self, artwork_info: ArtworkInfo):
         self.repository.save_art_one(artwork_info.info)
 
-    def get_art_for_audit(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
-        art_list = self.repository.get_art_for_audit()
+    def get_art_for_audit_since(self, audit_type: AuditType = AuditType.SFW,
+                                last_id: int = 0) -> Tuple[List[ArtworkInfo], int]:
+        """
+        增量加载待审核作品
+        :param last_id: 上次加载到的数据库ID
+        :return: 作品列表和这次加载到的数据库ID
+        """
         art_info_list = []
-        for art_info in art_list:
-            info = self.repository.get_art_by_artid(art_info.connection_id)
-            if info is not None:
-                if audit_type.SFW == audit_type:
-                    # 国内有啥涩涩的？
-                    art_info_list.append(info.GetArtworkInfo())
-        return art_info_list
+        for info, _ in self.repository.get_art_for_audit_since(last_id):
+            last_id = max(last_id, info.database_id)
+            if audit_type.SFW == audit_type:
+                # 国内有啥涩涩的？
+                art_info_list.append(info.GetArtworkInfo())
+        return art_info_list, last_id
 
     def get_art_for_push(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
-        art_list = self.repository.get_art_for_push(audit_type)
-        art_info_list = []
-        for art_info in art_list:
-            info = self.repository.get_art_by_artid(art_info.connection_id)
-            art_info_list.append(info.GetArtworkInfo())
-        return art_info_list
+        return [info.GetArtworkInfo() for info, _ in self.repository.get_art_for_push_with_info(audit_type)]
@@ -1,23 +1,31 @@
-import httpx
+import io
 import imageio
 import zipfile
-import os
 from typing import List
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from logger import Log
 from model.artwork import ArtworkImage
 from sites.pixiv.base import PixivResponse
-
-cur_path = os.path.realpath(os.getcwd())
+from utils.httpclient import create_client
+from utils.metacache import MetadataCache, fetch_json
 
 
 class PixivApi:
 
-    def __init__(self, cookie: str = ""):
+    def __init__(self, cookie: str = "", http_config: dict = None, meta_cache: MetadataCache = None):
         self.cookie = cookie
+        self.client = create_client(http_config)
+        self.meta_cache = meta_cache
         self.is_logged_in()
 
+    @staticmethod
+    def is_valid_response(data) -> bool:
+        """
+        出错时接口仍然返回200，响应内容为 {"error": true, "message": ...}
+        """
+        return isinstance(data, dict) and not data.get("error", True)
+
     def get_images_uri(self, art_id: int):
         return f"https://www.pixiv.net/ajax/illust/{art_id}/pages"
 
@@ -38,7 +46,7 @@ class PixivApi:
 
     def is_logged_in(self):
         user_status_url = "https://www.pixiv.net/touch/ajax/user/self/status?lang=zh"
-        user_status_data = httpx.get(user_status_url, headers=self.get_headers())
+        user_status_data = self.client.get(user_status_url, headers=self.get_headers())
         if user_status_data.is_error:
             Log.error("获取Pixiv用户状态失败")
             return False
@@ -53,19 +61,19 @@ class PixivApi:
     def get_artwork_info(self, art_id: int) -> PixivResponse:
         uri = self.get_info_uri(art_id)
         headers = self.get_headers(art_id)
-        res = httpx.get(uri, headers=headers, timeout=5)
-        if res.is_error:
-            if res.status_code == 404:
+        status_code, response = fetch_json(self.client, self.meta_cache, "pixiv", art_id, uri,
+                                           is_valid=self.is_valid_response, headers=headers, timeout=5)
+        if response is None:
+            if status_code == 404:
                 return PixivResponse(error_message="该作品不存在")
             else:
                 return PixivResponse(error_message="请求错误")
-        response = res.json()
         return PixivResponse(response)
 
     def get_artwork_uris(self, art_id: int) -> list:
         uri = self.get_images_uri(art_id)
         headers = self.get_headers(art_id)
-        res = httpx.get(uri, headers=headers)
+        res = self.client.get(uri, headers=headers)
         if res.is_error:
             return []
         response = res.json()
@@ -75,35 +83,21 @@ class PixivApi:
         art_list = []
         if response.type == 2:
             ims_list: list = []
-            temp_path = os.path.join(cur_path, 'temp')  # 获取临时文件目录
-            if not os.path.exists(temp_path):
-                os.mkdir(temp_path)  # 如果不存在这个文件夹，就自动创建一个
-            zip_file_name = os.path.join(temp_path, f"{response.id}.zip")  # 创建ZIP文件名
-            gif_file_name = os.path.join(temp_path, f"{response.id}.gif")  # 创建GIF文件名
-            if os.path.isfile(gif_file_name):
-                with open(gif_file_name, 'rb+') as f:
-                    art_list.append(ArtworkImage(response.id, data=f.read()))
-                return art_list
             data = self.download_image(response.id, response.urls[0])  # 下载文件
-            temp_zip_file = open(zip_file_name, mode='wb+')  # 打开文件
-            temp_zip_file.write(data.data)
-            zip_file = zipfile.ZipFile(file=zip_file_name)
+            if data.is_error:
+                return [data]
             frames = response.get_frames_info()  # 获取图片序列文件名和图片延迟
             all_delay: int = 0
-            for frame in frames:
-                file_name = frame["file"]  # 获取文件名
-                all_delay += frame["delay"]  # 总动画时长
-                file_data = zip_file.read(file_name)
-                ims_list.append(imageio.imread(uri=file_data))
+            with zipfile.ZipFile(file=io.BytesIO(data.data)) as zip_file:
+                for frame in frames:
+                    file_name = frame["file"]  # 获取文件名
+                    all_delay += frame["delay"]  # 总动画时长
+                    file_data = zip_file.read(file_name)
+                    ims_list.append(imageio.imread(uri=file_data))
             src_img_delay = (all_delay / len(frames)) / 1000  # 平均，单位为秒
-            imageio.mimsave(uri=gif_file_name, ims=ims_list, format="GIF", duration=src_img_delay)
-            gif_file = open(gif_file_name, mode='rb+')
-            gif_data = gif_file.read()
-            art_list.append(ArtworkImage(response.id, data=gif_data))
-            gif_file.close()  # 关闭文件
-            temp_zip_file.close()
-            # os.remove(zip_file_name)  # 删除缓存文件
-            # os.remove(gif_file_name)
+            gif_file = io.BytesIO()
+            imageio.mimsave(uri=gif_file, ims=ims_list, format="GIF", duration=src_img_delay)
+            art_list.append(ArtworkImage(response.id, data=gif_file.getvalue()))
             return art_list
         else:
             urls = response.urls
@@ -126,7 +120,7 @@ class PixivApi:
 
     def download_image(self, art_id: int, url: str, page: int = 0) -> ArtworkImage:
         headers = self.get_headers(art_id)
-        response = httpx.get(url, headers=headers, timeout=5)
+        response = self.client.get(url, headers=headers, timeout=5)
         if response.is_error:
             return ArtworkImage(art_id, page, True)
         return ArtworkImage(art_id, page, data=response.content)
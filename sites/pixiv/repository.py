@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Iterator, Optional, Tuple
 
 from model.artwork import AuditInfo, AuditType, AuditStatus, AuditCount
 
@@ -52,30 +52,44 @@ class PixivRepository(Repository):
         )
         return self._execute_and_fetchall(query, query_args)
 
-    def get_art_for_audit(self) -> List[AuditInfo]:
+    def get_art_for_audit_since(self, last_id: int = 0,
+                                exclude_ai: bool = True) -> Iterator[Tuple[PArtworkInfo, AuditInfo]]:
         """
-        :return: 返回带有作品具体信息的列表
+        一次查询获取 pixiv.id 大于 last_id 的待审核作品和审核信息
+        :param last_id: 上次加载到的 pixiv.id，为0时加载全部
+        :param exclude_ai: 为True时排除AI生成的作品
+        :return: 按 pixiv.id 排序的作品和审核信息
         """
         query = rf"""
-                    SELECT illusts_id, type, status, reason
-                    FROM `pixiv_audit`
-                    WHERE status IS NULL or status = 0
-                """
-        query_args = ()
-        data = self._execute_and_fetchall(query, query_args)
-        if len(data) == 0:
-            return []
-        return [CreateArtworkAuditInfoFromPixivSQLData(i, site="pixiv") for i in data]
+            SELECT p.id, p.illusts_id, p.title, p.tags, p.view_count,
+                   p.like_count, p.love_count, p.user_id, p.upload_timestamp,
+                   pa.type, pa.status, pa.reason
+            FROM `pixiv_audit` AS pa
+            INNER JOIN `pixiv` AS p
+                ON p.illusts_id = pa.illusts_id
+            WHERE (pa.status IS NULL or pa.status = 0) AND p.id > %s {"AND p.ai_type < 2" if exclude_ai else ""}
+            ORDER BY p.id
+        """
+        query_args = (last_id,)
+        for i in self._execute_and_iterate(query, query_args):
+            yield CreateArtworkFromSQLData(i[:9]), CreateArtworkAuditInfoFromPixivSQLData(i[1:2] + i[9:], site="pixiv")
 
-    def get_art_for_push(self, audit_type: AuditType) -> List[AuditInfo]:
+    def get_art_for_push_with_info(self, audit_type: AuditType) -> Iterator[Tuple[PArtworkInfo, AuditInfo]]:
+        """
+        一次查询获取待推送的作品和审核信息
+        """
         query = rf"""
-            SELECT illusts_id, type, status, reason
-            FROM `pixiv_audit`
-            WHERE type=%s AND status=%s;
+            SELECT p.id, p.illusts_id, p.title, p.tags, p.view_count,
+                   p.like_count, p.love_count, p.user_id, p.upload_timestamp,
+                   pa.type, pa.status, pa.reason
+            FROM `pixiv_audit` AS pa
+            INNER JOIN `pixiv` AS p
+                ON p.illusts_id = pa.illusts_id
+            WHERE pa.type=%s AND pa.status=%s;
         """
         query_args = (audit_type.value, AuditStatus.PASS.value,)
-        data = self._execute_and_fetchall(query, query_args)
-        return [CreateArtworkAuditInfoFromPixivSQLData(i, site="pixiv") for i in data]
+        for i in self._execute_and_iterate(query, query_args):
+            yield CreateArtworkFromSQLData(i[:9]), CreateArtworkAuditInfoFromPixivSQLData(i[1:2] + i[9:], site="pixiv")
 
     def get_audit_info(self, illusts_id: int) -> AuditInfo:
         query = f"""
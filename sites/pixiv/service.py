@@ -1,11 +1,13 @@
-from typing import List
+from typing import List, Tuple
 
-from model.artwork import ArtworkInfo, AuditType
+from model.artwork import ArtworkInfo, AuditInfo, AuditType
 from model.containers import ArtworkData
 from model.helpers import parse_artwork_data
 from sites import listener
 from sites.pixiv.api import PixivApi
+from sites.pixiv.base import PArtworkInfo
 from sites.pixiv.repository import PixivRepository
+from utils.imagecache import cached_images
 
 
 def artwork_data(args):
@@ -16,13 +18,18 @@ def artwork_data(args):
 class PixivService:
     def __init__(self, sql_config: dict = None, pixiv_cookie: str = "", **args):
         self.repository = PixivRepository(**sql_config)
-        self.api = PixivApi(pixiv_cookie)
+        self.api = PixivApi(pixiv_cookie, http_config=args.get("http_config"),
+                            meta_cache=args.get("meta_cache"))
+        self.image_cache = args.get("image_cache")
+        # 为True时排除AI生成的作品，对应配置文件中的 pixiv.crawl.exclude_ai
+        self.exclude_ai = bool(args.get("exclude_ai", True))
 
     def get_artwork_info_and_image(self, artwork_id: int) -> ArtworkData:
         temp_artwork_info_response = self.api.get_artwork_info(artwork_id)
         if bool(temp_artwork_info_response):
             return parse_artwork_data(error_message=temp_artwork_info_response.message)
-        artwork_image = self.api.get_images(temp_artwork_info_response)
+        artwork_image = cached_images(self.image_cache, "pixiv", artwork_id,
+                                      lambda: self.api.get_images(temp_artwork_info_response))
         artwork_info = temp_artwork_info_response.results.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
@@ -36,33 +43,35 @@ class PixivService:
         temp_artwork_info_response = self.api.get_artwork_info(art_id)
         if bool(temp_artwork_info_response):
             return parse_artwork_data(error_message=temp_artwork_info_response.message)
-        artwork_image = self.api.get_images(temp_artwork_info_response)
+        artwork_image = cached_images(self.image_cache, "pixiv", art_id,
+                                      lambda: self.api.get_images(temp_artwork_info_response))
         artwork_info = temp_artwork_info_response.results.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
     def contribute_confirm(self, artwork_info: ArtworkInfo):
         self.repository.save_art_one(artwork_info.info)
 
-    def get_art_for_audit(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
-        art_list = self.repository.get_art_for_audit()
+    @staticmethod
+    def get_audit_type(info: PArtworkInfo, art_info: AuditInfo) -> AuditType:
+        if art_info.type.value is None:
+            if info.tags.count("R-18") >= 1:
+                return AuditType.R18
+            return AuditType.SFW
+        return art_info.type
+
+    def get_art_for_audit_since(self, audit_type: AuditType = AuditType.SFW,
+                                last_id: int = 0) -> Tuple[List[ArtworkInfo], int]:
+        """
+        增量加载待审核作品
+        :param last_id: 上次加载到的数据库ID
+        :return: 作品列表和这次加载到的数据库ID
+        """
         art_info_list = []
-        for art_info in art_list:
-            info = self.repository.get_art_by_artid(art_info.connection_id)
-            if info is not None:
-                temp_audit_type = AuditType.SFW
-                if art_info.type.value is None:
-                    if info.tags.count("R-18") >= 1:
-                        temp_audit_type = AuditType.R18
-                else:
-                    temp_audit_type = art_info.type
-                if temp_audit_type == audit_type:
-                    art_info_list.append(info.GetArtworkInfo())
-        return art_info_list
+        for info, art_info in self.repository.get_art_for_audit_since(last_id, self.exclude_ai):
+            last_id = max(last_id, info.database_id)
+            if self.get_audit_type(info, art_info) == audit_type:
+                art_info_list.append(info.GetArtworkInfo())
+        return art_info_list, last_id
 
     def get_art_for_push(self, audit_type: AuditType = AuditType.SFW) -> List[ArtworkInfo]:
-        art_list = self.repository.get_art_for_push(audit_type)
-        art_info_list = []
-        for art_info in art_list:
-            info = self.repository.get_art_by_artid(art_info.connection_id)
-            art_info_list.append(info.GetArtworkInfo())
-        return art_info_list
+        return [info.GetArtworkInfo() for info, _ in self.repository.get_art_for_push_with_info(audit_type)]
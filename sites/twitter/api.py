@@ -1,13 +1,23 @@
-import httpx
 from typing import List
 
 from model.artwork import ArtworkImage
 from sites.twitter.base import CreateArtworkInfoFromAPIResponse, TArtworkInfo
+from utils.httpclient import create_client
+from utils.metacache import MetadataCache, fetch_json
 
 
 class TwitterApi:
-    def __init__(self, cookie: str = ""):
+    def __init__(self, cookie: str = "", http_config: dict = None, meta_cache: MetadataCache = None):
         self.cookie = cookie
+        self.client = create_client(http_config)
+        self.meta_cache = meta_cache
+
+    @staticmethod
+    def is_valid_response(data) -> bool:
+        """
+        推文不存在时接口返回空的JSON
+        """
+        return isinstance(data, dict) and "id_str" in data
 
     def get_api_uri(self, tid: int):
         return f"https://cdn.syndication.twimg.com/tweet?id={tid}"
@@ -21,10 +31,11 @@ class TwitterApi:
     def get_artwork_info(self, tid: int) -> TArtworkInfo:
         url = self.get_api_uri(tid)
         headers = self.get_headers()
-        response = httpx.get(url=url, headers=headers)
-        if response.is_error:
+        _, response = fetch_json(self.client, self.meta_cache, "twitter", tid, url,
+                                 is_valid=self.is_valid_response, headers=headers)
+        if response is None:
             return None
-        return CreateArtworkInfoFromAPIResponse(response.json())
+        return CreateArtworkInfoFromAPIResponse(response)
 
     def get_images_by_artid(self, tid: int) -> List[ArtworkImage]:
         artwork_info = self.get_artwork_info(tid)
@@ -33,7 +44,7 @@ class TwitterApi:
         art_list = []
         for url in artwork_info.urls:
             headers = self.get_headers()
-            response = httpx.get(url=url, headers=headers)
+            response = self.client.get(url=url, headers=headers)
             if response.is_error:
                 return None
             art_list.append(ArtworkImage(artwork_info.tid, data=response.content))
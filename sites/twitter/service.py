@@ -6,19 +6,22 @@ from model.helpers import parse_artwork_data
 from sites import listener
 from sites.twitter.api import TwitterApi
 from sites.twitter.repository import TwitterRepository
+from utils.imagecache import cached_images
 
 
 @listener(site_name="twitter", module_name="TwitterService")
 class TwitterService:
     def __init__(self, sql_config=None, **args):
         self.repository = TwitterRepository(**sql_config)
-        self.api = TwitterApi()
+        self.api = TwitterApi(http_config=args.get("http_config"), meta_cache=args.get("meta_cache"))
+        self.image_cache = args.get("image_cache")
 
     def get_artwork_info_and_image(self, art_id: int) -> ArtworkData:
         temp_artwork_info = self.api.get_artwork_info(art_id)
         if temp_artwork_info is None:
             return parse_artwork_data(error_message="请求错误")
-        artwork_image = self.api.get_images_by_artid(art_id)
+        artwork_image = cached_images(self.image_cache, "twitter", art_id,
+                                      lambda: self.api.get_images_by_artid(art_id))
         artwork_info = temp_artwork_info.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
@@ -29,7 +32,8 @@ class TwitterService:
         temp_artwork_info = self.api.get_artwork_info(art_id)
         if temp_artwork_info is None:
             return parse_artwork_data(error_message="已经存在数据库")
-        artwork_image = self.api.get_images_by_artid(art_id)
+        artwork_image = cached_images(self.image_cache, "twitter", art_id,
+                                      lambda: self.api.get_images_by_artid(art_id))
         artwork_info = temp_artwork_info.GetArtworkInfo()
         return parse_artwork_data(artwork_info, artwork_image)
 
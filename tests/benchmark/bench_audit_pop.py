@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# python3 -m tests.benchmark.bench_audit_pop
+#
+# 对比旧的 ZREVRANGE 0 -1 事务和 Lua 脚本从审核队列取出作品的耗时随队列长度的变化
+# 需要本地Redis，使用 REDIS_HOST REDIS_PORT REDIS_DATABASE 环境变量，默认 127.0.0.1:6379/4
+# 输出每次取出的平均、中位数和p99耗时，结果可以直接贴到提交信息中
+#
+# 本地 Redis 6.0.9（单核，无持久化），每种实现取出200次的结果：
+#
+#   实现                 队列长度      中位数         p99
+#   ZREVRANGE 0 -1          5000     30.543ms     35.561ms
+#   get_audit_one           5000      0.111ms      0.227ms
+#   get_audit_many/10       5000      0.215ms      0.499ms
+#   ZREVRANGE 0 -1         50000    280.636ms    346.121ms
+#   get_audit_one          50000      0.102ms      0.198ms
+#   get_audit_many/10      50000      0.176ms      0.445ms
+#   ZREVRANGE 0 -1        500000   2810.940ms   3510.283ms
+#   get_audit_one         500000      0.083ms      0.158ms
+#   get_audit_many/10     500000      0.211ms      2.200ms
+
+import os
+import statistics
+import sys
+import time
+
+import redis
+
+from model.artwork import AuditType
+from service.cache import QueueName, ServiceCache
+from utils.queuemember import encode_member
+
+SIZES = (5000, 50000, 500000)
+POPS = 200
+
+
+def fill(sc: ServiceCache, qname: QueueName, size: int):
+    sc.rdb.delete(qname.audit, qname.pending)
+    pipe = sc.rdb.pipeline(transaction=False)
+    for start in range(0, size, 10000):
+        pipe.zadd(qname.audit, {encode_member("pixiv", i): i
+                                for i in range(start, min(size, start + 10000))})
+    pipe.execute()
+
+
+def get_audit_one_range(sc: ServiceCache, qname: QueueName):
+    """
+    改动前的实现，把整个审核队列传回来只取第一个
+    """
+    def update_queue(pipe):
+        art_with_score = pipe.zrevrange(qname.audit, 0, -1, withscores=True, score_cast_func=int)
+        art_key = art_score = None
+        if len(art_with_score) > 0:
+            art_key, art_score = art_with_score[0]
+        pipe.multi()
+        if art_key is not None:
+            pipe.zrem(qname.audit, art_key)
+            pipe.zadd(qname.pending, {art_key: art_score})
+            pipe.expire(qname.pending, sc.ttl)
+        return art_key
+
+    return sc.rdb.transaction(update_queue, qname.audit, qname.pending, value_from_callable=True)
+
+
+def run(name: str, size: int, pop):
+    timings = []
+    for _ in range(POPS):
+        start = time.perf_counter()
+        pop()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print("%-18s 队列 %6d  平均 %.3fms  中位数 %.3fms  p99 %.3fms" % (
+        name, size, statistics.mean(timings), statistics.median(timings), timings[int(len(timings) * 0.99) - 1]))
+
+
+def main():
+    sc = ServiceCache(
+        host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+        port=int(os.environ.get('REDIS_PORT', default='6379')),
+        db=int(os.environ.get('REDIS_DATABASE', default='4')),
+    )
+    try:
+        info = sc.rdb.info("server")
+    except redis.ConnectionError as exc:
+        print("无法连接Redis %s" % exc)
+        sys.exit(1)
+    print("Redis %s，每种实现取出 %s 次" % (info["redis_version"], POPS))
+    qname = QueueName(AuditType.SFW, sc.key_prefix)
+    try:
+        for size in SIZES:
+            fill(sc, qname, size)
+            run("ZREVRANGE 0 -1", size, lambda: get_audit_one_range(sc, qname))
+            fill(sc, qname, size)
+            run("get_audit_one", size, lambda: sc.get_audit_one(AuditType.SFW))
+            fill(sc, qname, size)
+            run("get_audit_many/10", size, lambda: sc.get_audit_many(AuditType.SFW, 10))
+    finally:
+        sc.rdb.delete(qname.audit, qname.pending)
+
+
+if __name__ == '__main__':
+    main()
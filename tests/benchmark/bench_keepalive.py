@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# python3 -m tests.benchmark.bench_keepalive
+#
+# 对比每次请求新建连接（httpx.get）和复用连接池（create_client）的耗时与TLS握手次数
+# 需要 openssl 命令生成自签名证书
+
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from utils.httpclient import create_client
+
+REQUESTS = 200
+BODY = b"x" * 1024
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_cert(directory: str):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def start_server(cert: str, key: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(name: str, server: ThreadingHTTPServer, get):
+    url = "https://127.0.0.1:%d/" % server.server_address[1]
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        get(url).raise_for_status()
+    elapsed = time.perf_counter() - start
+    print("%-12s %4d 次请求  %.3fs  %.2fms/次  握手 %d 次"
+          % (name, REQUESTS, elapsed, elapsed / REQUESTS * 1000, server.connections))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_server(*make_cert(directory))
+        try:
+            run("httpx.get", server, lambda url: httpx.get(url, verify=False))
+            with create_client(verify=False) as client:
+                run("连接池", server, client.get)
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
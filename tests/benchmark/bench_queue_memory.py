@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+# python3 -m tests.benchmark.bench_queue_memory
+#
+# 对比旧的 JSON 成员和紧凑成员在审核队列(sorted set)和推送队列(set)中占用的Redis内存
+# 需要本地Redis，使用 REDIS_HOST REDIS_PORT REDIS_DATABASE 环境变量，默认 127.0.0.1:6379/4
+# 同时输出 MEMORY USAGE 和 INFO memory 中 used_memory 的增量，后者包含分配器的开销，其他客户端写入时不准确
+#
+# 本地 Redis 6.0.9（无其他客户端）写入100000个成员的结果，两种统计方式相同：
+#
+#   队列            JSON        紧凑        节省
+#   zset(审核)    11.5 MiB     9.2 MiB     2.3 MiB (20%)
+#   set(推送)      7.6 MiB     5.3 MiB     2.3 MiB (30%)
+
+import os
+import sys
+from typing import Tuple
+
+import redis
+import ujson
+
+from utils.queuemember import encode_member
+
+ITEMS = 100000
+BATCH = 10000
+BASE_POST_ID = 100000000
+
+
+def legacy_member(post_id: int) -> str:
+    return ujson.dumps({"post_id": post_id, "site": "pixiv"})
+
+
+def compact_member(post_id: int) -> str:
+    return encode_member("pixiv", post_id)
+
+
+def used_memory(rdb: redis.Redis) -> int:
+    return rdb.info("memory")["used_memory"]
+
+
+def fill(rdb: redis.Redis, key: str, kind: str, member) -> Tuple[int, int]:
+    """
+    :return: (MEMORY USAGE, used_memory 增量)
+    """
+    rdb.delete(key)
+    before = used_memory(rdb)
+    pipe = rdb.pipeline(transaction=False)
+    for start in range(0, ITEMS, BATCH):
+        post_ids = range(BASE_POST_ID + start, BASE_POST_ID + min(ITEMS, start + BATCH))
+        if kind == "zset":
+            pipe.zadd(key, {member(post_id): post_id for post_id in post_ids})
+        else:
+            pipe.sadd(key, *[member(post_id) for post_id in post_ids])
+    pipe.execute()
+    return rdb.memory_usage(key, samples=0), used_memory(rdb) - before
+
+
+def mib(size: int) -> str:
+    return "%.1f MiB" % (size / 1024 / 1024)
+
+
+def main():
+    rdb = redis.Redis(
+        host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+        port=int(os.environ.get('REDIS_PORT', default='6379')),
+        db=int(os.environ.get('REDIS_DATABASE', default='4')),
+    )
+    try:
+        info = rdb.info("server")
+    except redis.ConnectionError as exc:
+        print("无法连接Redis %s" % exc)
+        sys.exit(1)
+    print("Redis %s" % info["redis_version"])
+    key = "picbed:bench:queue_memory"
+    try:
+        for kind in ("zset", "set"):
+            legacy = fill(rdb, key, kind, legacy_member)
+            compact = fill(rdb, key, kind, compact_member)
+            for name, legacy_size, compact_size in (("MEMORY USAGE", legacy[0], compact[0]),
+                                                    ("used_memory", legacy[1], compact[1])):
+                print("%-5s %d 个成员 %-12s  JSON %s  紧凑 %s  节省 %s (%.0f%%)" % (
+                    kind, ITEMS, name, mib(legacy_size), mib(compact_size), mib(legacy_size - compact_size),
+                    (legacy_size - compact_size) / legacy_size * 100))
+    finally:
+        rdb.delete(key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+import redis
+
+from model.artwork import ArtworkImage
+from utils.blobstore import BlobStore, set_default_store
+from utils.imagecache import ImageCache
+
+
+class TestImageCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rdb = redis.Redis(
+            host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+            port=int(os.environ.get('REDIS_PORT', default='6379')),
+            db=int(os.environ.get('REDIS_DATABASE', default='4')),
+        )
+
+    def setUp(self):
+        self.rdb.delete(*self.rdb.keys("test:image_cache*") or ["test:image_cache:lru"])
+        self.fetch_count = 0
+
+    def fetch(self, post_id: int, size: int = 10):
+        def _fetch():
+            self.fetch_count += 1
+            return [ArtworkImage(post_id, page, data=b"\x00" * size) for page in range(2)]
+        return _fetch
+
+    def test_second_read_does_not_fetch(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache")
+        # 2. Execute
+        first = cache.get_or_fetch("pixiv", 1, self.fetch(1))
+        second = cache.get_or_fetch("pixiv", 1, self.fetch(1))
+        # 3. Compare
+        self.assertEqual(self.fetch_count, 1)
+        self.assertEqual([image.page for image in second], [0, 1])
+        self.assertEqual([image.data for image in second], [image.data for image in first])
+
+    def test_least_recently_used_is_evicted(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache", max_bytes=50)
+        cache.get_or_fetch("pixiv", 1, self.fetch(1))
+        cache.get_or_fetch("pixiv", 2, self.fetch(2))
+        # 2. Execute
+        cache.get_images("pixiv", 1)
+        cache.get_or_fetch("pixiv", 3, self.fetch(3))
+        # 3. Compare
+        self.assertIsNotNone(cache.get_images("pixiv", 1))
+        self.assertIsNone(cache.get_images("pixiv", 2))
+        self.assertEqual(int(self.rdb.get("test:image_cache:bytes")), 40)
+
+    def test_failed_download_is_not_cached(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache")
+        # 2. Execute
+        cache.get_or_fetch("pixiv", 1, lambda: [ArtworkImage(1, 0, is_error=True)])
+        # 3. Compare
+        self.assertIsNone(cache.get_images("pixiv", 1))
+
+
+class TestImageCacheWithBlobStore(TestImageCache):
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.temp_dir.name)
+        set_default_store(self.store)
+
+    def tearDown(self):
+        set_default_store(None)
+        self.temp_dir.cleanup()
+
+    def fetch(self, post_id: int, size: int = 10):
+        def _fetch():
+            self.fetch_count += 1
+            return [ArtworkImage(post_id, page, data=bytes([post_id, page]) * size) for page in range(2)]
+        return _fetch
+
+    def test_least_recently_used_is_evicted(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache", max_bytes=300)
+        cache.get_or_fetch("pixiv", 1, self.fetch(1))
+        cache.get_or_fetch("pixiv", 2, self.fetch(2))
+        # 2. Execute
+        cache.get_images("pixiv", 1)
+        cache.get_or_fetch("pixiv", 3, self.fetch(3))
+        # 3. Compare
+        self.assertIsNotNone(cache.get_images("pixiv", 1))
+        self.assertIsNone(cache.get_images("pixiv", 2))
+        # 每页只保存 "sha256:" 和64位的sha256
+        self.assertEqual(int(self.rdb.get("test:image_cache:bytes")), 2 * 2 * 71)
+
+    def test_cached_pages_stay_in_blob_store(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache")
+        first = cache.get_or_fetch("pixiv", 1, self.fetch(1, size=1000))
+        # 2. Execute
+        second = cache.get_images("pixiv", 1)
+        # 3. Compare
+        self.assertTrue(all(len(v) == 71 for v in self.rdb.hvals("test:image_cache:pixiv:1")))
+        self.assertEqual([image.digest for image in second], [image.digest for image in first])
+        self.assertEqual([image._data for image in second], [b"", b""])
+        self.assertEqual(second[1].data, bytes([1, 1]) * 1000)
+
+    def test_evicted_blob_is_fetched_again(self):
+        # 1. Setup
+        cache = ImageCache(self.rdb, key_prefix="test:image_cache")
+        digest = cache.get_or_fetch("pixiv", 1, self.fetch(1))[0].digest
+        os.remove(self.store.path(digest))
+        # 2. Execute
+        images = cache.get_or_fetch("pixiv", 1, self.fetch(1))
+        # 3. Compare
+        self.assertEqual(self.fetch_count, 2)
+        self.assertEqual(images[0].data, bytes([1, 0]) * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+import httpx
+import redis
+
+from utils.metacache import MetadataCache
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rdb = redis.Redis(
+            host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+            port=int(os.environ.get('REDIS_PORT', default='6379')),
+            db=int(os.environ.get('REDIS_DATABASE', default='4')),
+        )
+
+    def setUp(self):
+        self.requests = []
+        self.rdb.delete(*self.rdb.keys("test:meta:*") or ["test:meta:index"])
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/error":
+            return httpx.Response(200, json={"error": True, "message": "rate limited"})
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"id": 1}, headers={"ETag": '"v1"'})
+
+    def test_fresh_entry_skips_upstream(self):
+        # 1. Setup
+        cache = MetadataCache(self.rdb, ttl=60, key_prefix="test:meta")
+        client = httpx.Client(transport=httpx.MockTransport(self.handler))
+        # 2. Execute
+        first = cache.fetch_json(client, "pixiv", 1, "https://example.com/1")
+        second = cache.fetch_json(client, "pixiv", 1, "https://example.com/1")
+        # 3. Compare
+        self.assertEqual(first, (200, {"id": 1}))
+        self.assertEqual(second, (200, {"id": 1}))
+        self.assertEqual(len(self.requests), 1)
+
+    def test_stale_entry_revalidates_with_etag(self):
+        # 1. Setup
+        cache = MetadataCache(self.rdb, ttl=0, key_prefix="test:meta")
+        client = httpx.Client(transport=httpx.MockTransport(self.handler))
+        # 2. Execute
+        cache.fetch_json(client, "pixiv", 1, "https://example.com/1")
+        result = cache.fetch_json(client, "pixiv", 1, "https://example.com/1")
+        # 3. Compare
+        self.assertEqual(result, (200, {"id": 1}))
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[1].headers["If-None-Match"], '"v1"')
+
+    def test_invalid_payload_is_not_cached(self):
+        # 1. Setup
+        cache = MetadataCache(self.rdb, ttl=60, key_prefix="test:meta")
+        client = httpx.Client(transport=httpx.MockTransport(self.handler))
+        is_valid = lambda data: not data.get("error", True)
+        # 2. Execute
+        first = cache.fetch_json(client, "pixiv", 1, "https://example.com/error", is_valid=is_valid)
+        second = cache.fetch_json(client, "pixiv", 1, "https://example.com/error", is_valid=is_valid)
+        # 3. Compare
+        self.assertEqual(first, (200, {"error": True, "message": "rate limited"}))
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.requests), 2)
+        self.assertIsNone(cache.get("pixiv", 1))
+
+    def test_oldest_entries_are_evicted(self):
+        # 1. Setup
+        cache = MetadataCache(self.rdb, ttl=60, max_entries=2, key_prefix="test:meta")
+        # 2. Execute
+        for art_id in range(3):
+            cache.put("pixiv", art_id, {"id": art_id})
+        # 3. Compare
+        self.assertIsNone(cache.get("pixiv", 0))
+        self.assertIsNotNone(cache.get("pixiv", 2))
+        self.assertEqual(self.rdb.zcard("test:meta:index"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import threading
+import unittest
+
+from model.artwork import ArtworkInfo, AuditType
+from model.helpers import parse_artwork_push_data
+from service.cache import ServiceCache
+from service.pusher import PushJob, PushScheduler
+
+
+class QueueAuditService:
+    """
+    推送队列保存在列表中的审核服务
+    """
+
+    def __init__(self, cache: ServiceCache, post_ids):
+        self.cache = cache
+        self.queue = list(post_ids)
+        self.pushed = []
+        self.putback = []
+
+    def push_start(self, audit_type):
+        return len(self.queue)
+
+    def push_next(self, audit_type):
+        if len(self.queue) == 0:
+            return parse_artwork_push_data(count=0, error_message="获取缓存数据失败", status_code=67144)
+        artwork_info = ArtworkInfo()
+        artwork_info.artwork_id = self.queue.pop(0)
+        return parse_artwork_push_data(artwork_info, [], len(self.queue))
+
+    def push_manager(self, artwork_info):
+        service = self
+
+        class Manager:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type is None:
+                    service.pushed.append(artwork_info.artwork_id)
+
+        return Manager()
+
+    def push_putback(self, audit_type, artwork_info):
+        self.putback.append(artwork_info.artwork_id)
+
+
+class RecordingSender:
+
+    def __init__(self):
+        self.sent = []
+        self.edits = []
+        self.first_sent = threading.Event()
+
+    def send(self, bot, chat_id, artwork_info, images, caption):
+        self.sent.append((chat_id, artwork_info.artwork_id))
+        self.first_sent.set()
+        return None
+
+    def edit_text(self, bot, chat_id, message_id, text, **kwargs):
+        self.edits.append((chat_id, message_id, text))
+
+
+class TestPushScheduler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache = ServiceCache(
+            host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+            port=int(os.environ.get('REDIS_PORT', default='6379')),
+            db=int(os.environ.get('REDIS_DATABASE', default='4')),
+        )
+
+    def setUp(self):
+        self.channels = {"SFW": {"char_id": -100, "name": "sfw", "push_interval": 0}}
+        self.cache.rdb.delete(f"{self.cache.key_prefix}:push_jobs")
+
+    def test_pushes_every_artwork_and_clears_job(self):
+        # 1. Setup
+        service = QueueAuditService(self.cache, [1, 2, 3])
+        sender = RecordingSender()
+        scheduler = PushScheduler(None, service, sender, self.channels)
+        # 2. Execute
+        scheduler.start(PushJob(AuditType.SFW))
+        scheduler.join(timeout=5)
+        # 3. Compare
+        self.assertEqual(sender.sent, [(-100, 1), (-100, 2), (-100, 3)])
+        self.assertEqual(service.pushed, [1, 2, 3])
+        self.assertEqual(self.cache.rdb.hlen(scheduler.jobs_key), 0)
+
+    def test_stop_puts_back_prefetched_artwork(self):
+        # 1. Setup
+        self.channels["SFW"]["push_interval"] = 5
+        service = QueueAuditService(self.cache, [1, 2, 3])
+        sender = RecordingSender()
+        scheduler = PushScheduler(None, service, sender, self.channels)
+        scheduler.start(PushJob(AuditType.SFW))
+        sender.first_sent.wait(5)
+        # 2. Execute
+        scheduler.stop(AuditType.SFW)
+        scheduler.stop_all(timeout=5)
+        # 3. Compare
+        self.assertEqual(service.pushed, [1])
+        self.assertEqual(service.putback, [2])
+
+    def test_progress_is_edited_through_sender(self):
+        # 1. Setup
+        service = QueueAuditService(self.cache, [1, 2])
+        sender = RecordingSender()
+        scheduler = PushScheduler(None, service, sender, self.channels)
+        # 2. Execute
+        scheduler.start(PushJob(AuditType.SFW, chat_id=5, message_id=9))
+        scheduler.join(timeout=5)
+        # 3. Compare
+        self.assertEqual(sender.edits[-1], (5, 9, "推送完成"))
+        self.assertTrue(all(edit[:2] == (5, 9) for edit in sender.edits))
+
+    def test_resume_restarts_saved_job(self):
+        # 1. Setup
+        service = QueueAuditService(self.cache, [1])
+        sender = RecordingSender()
+        scheduler = PushScheduler(None, service, sender, self.channels)
+        self.cache.rdb.hset(scheduler.jobs_key, AuditType.SFW.value, PushJob(AuditType.SFW).to_json())
+        # 2. Execute
+        scheduler.resume()
+        scheduler.join(timeout=5)
+        # 3. Compare
+        self.assertEqual(sender.sent, [(-100, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,9 @@
 import os
+import time
 import unittest
 
-from service.cache import ServiceCache
-from model.artwork import AuditType
+from service.cache import QueueName, ServiceCache
+from model.artwork import ArtworkInfo, AuditType
 
 
 class TestPixivService(unittest.TestCase):
@@ -24,3 +25,141 @@ class TestPixivService(unittest.TestCase):
         artwork_info, count = self.sc.get_push_one(AuditType.SFW)
         self.assertEqual(artwork_info, None)
         self.assertEqual(count, 0)
+
+    def _add_audit(self, post_ids):
+        artworks = []
+        for post_id in post_ids:
+            artwork = ArtworkInfo()
+            artwork.site = "pixiv"
+            artwork.artwork_id = post_id
+            artwork.create_timestamp = post_id
+            artworks.append(artwork)
+        self.sc.add_audit(AuditType.SFW, artworks)
+
+    def _clear_audit(self):
+        qname = QueueName(AuditType.SFW, self.sc.key_prefix)
+        self.sc.rdb.delete(qname.audit, qname.pending)
+        return qname
+
+    def test_get_audit_one_moves_highest_score_to_pending(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit([1, 3, 2])
+        # 2. Execute
+        art_key = self.sc.get_audit_one(AuditType.SFW)
+        # 3. Compare
+        self.assertEqual(art_key, b'p:3')
+        self.assertEqual(self.sc.audit_size(AuditType.SFW), 2)
+        self.assertAlmostEqual(self.sc.rdb.zscore(qname.pending, art_key), time.time() + self.sc.ttl, delta=5)
+
+    def test_get_audit_many_returns_in_order(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit([1, 2, 3, 4])
+        # 2. Execute
+        art_keys = self.sc.get_audit_many(AuditType.SFW, 3)
+        # 3. Compare
+        self.assertEqual(art_keys, [b'p:4', b'p:3', b'p:2'])
+        self.assertEqual(self.sc.rdb.zcard(qname.pending), 3)
+
+    def test_get_audit_one_should_not_fail_when_empty(self):
+        # 1. Setup
+        self._clear_audit()
+        # 2. Execute
+        art_key = self.sc.get_audit_one(AuditType.SFW)
+        # 3. Compare
+        self.assertEqual(art_key, None)
+
+    def test_reap_pending_returns_expired_leases_only(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit([1, 2])
+        art_keys = self.sc.get_audit_many(AuditType.SFW, 2)
+        self.sc.rdb.zadd(qname.pending, {art_keys[0]: time.time() - 1})
+        # 2. Execute
+        count = self.sc.reap_pending(AuditType.SFW)
+        # 3. Compare
+        self.assertEqual(count, 1)
+        self.assertEqual(self.sc.get_audit_one(AuditType.SFW), art_keys[0])
+        self.assertEqual(self.sc.pending_size(AuditType.SFW), 2)
+
+    def test_reap_pending_in_batches(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit(range(1, 8))
+        art_keys = self.sc.get_audit_many(AuditType.SFW, 7)
+        self.sc.rdb.zadd(qname.pending, {art_key: time.time() - 1 for art_key in art_keys})
+        # 2. Execute
+        count = self.sc.reap_pending(AuditType.SFW, batch=3)
+        # 3. Compare
+        self.assertEqual(count, 7)
+        self.assertEqual(self.sc.audit_size(AuditType.SFW), 7)
+        self.assertEqual(self.sc.pending_size(AuditType.SFW), 0)
+
+    def test_extend_pending_renews_lease_without_adding(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit([1])
+        art_key = self.sc.get_audit_one(AuditType.SFW)
+        self.sc.rdb.zadd(qname.pending, {art_key: time.time() - 1})
+        # 2. Execute
+        self.sc.extend_pending(AuditType.SFW, [art_key, b'p:9'])
+        count = self.sc.reap_pending(AuditType.SFW)
+        # 3. Compare
+        self.assertEqual(count, 0)
+        self.assertEqual(self.sc.pending_size(AuditType.SFW), 1)
+
+    def test_remove_pending_also_removes_reaped_artwork(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self._add_audit([1])
+        art_key = self.sc.get_audit_one(AuditType.SFW)
+        self.sc.rdb.zadd(qname.pending, {art_key: time.time() - 1})
+        self.sc.reap_pending(AuditType.SFW)
+        # 2. Execute
+        self.sc.remove_pending_audit(AuditType.SFW, art_key)
+        # 3. Compare
+        self.assertEqual(self.sc.audit_size(AuditType.SFW), 0)
+        self.assertEqual(self.sc.pending_size(AuditType.SFW), 0)
+
+    def test_add_audit_skips_pending_artwork(self):
+        # 1. Setup
+        self._clear_audit()
+        self._add_audit([1])
+        art_key = self.sc.get_audit_one(AuditType.SFW)
+        # 2. Execute
+        self._add_audit([1, 2])
+        # 3. Compare
+        self.assertEqual(self.sc.audit_size(AuditType.SFW), 1)
+        self.assertNotEqual(self.sc.get_audit_one(AuditType.SFW), art_key)
+
+    def test_audit_marks_expire_from_first_save(self):
+        # 1. Setup
+        qname = QueueName(AuditType.SFW, self.sc.key_prefix)
+        self.sc.rdb.delete(qname.mark)
+        # 2. Execute
+        empty = self.sc.get_audit_marks(AuditType.SFW)
+        self.sc.set_audit_marks(AuditType.SFW, {"pixiv": 3})
+        self.sc.rdb.expire(qname.mark, 100)
+        self.sc.set_audit_marks(AuditType.SFW, {"pixiv": 5, "mihoyobbs": 2})
+        # 3. Compare
+        self.assertEqual(empty, None)
+        self.assertEqual(self.sc.get_audit_marks(AuditType.SFW), {"pixiv": 5, "mihoyobbs": 2})
+        self.assertLessEqual(self.sc.rdb.ttl(qname.mark), 100)
+
+    def test_migrate_queue_members_converts_legacy_json(self):
+        # 1. Setup
+        qname = self._clear_audit()
+        self.sc.rdb.delete(qname.push, f"{self.sc.key_prefix}:queue_member_version")
+        self.sc.rdb.zadd(qname.audit, {'{"post_id":1,"site":"pixiv"}': 10, 'm:2': 20})
+        self.sc.rdb.zadd(qname.pending, {'{"post_id":3,"site":"twitter"}': 30})
+        self.sc.rdb.sadd(qname.push, '{"post_id":4,"site":"mihoyobbs"}')
+        # 2. Execute
+        count = self.sc.migrate_queue_members()
+        again = self.sc.migrate_queue_members()
+        # 3. Compare
+        self.assertEqual(count, 3)
+        self.assertEqual(again, 0)
+        self.assertEqual(self.sc.rdb.zrange(qname.audit, 0, -1, withscores=True), [(b'p:1', 10), (b'm:2', 20)])
+        self.assertEqual(self.sc.rdb.zrange(qname.pending, 0, -1, withscores=True), [(b't:3', 30)])
+        self.assertEqual(self.sc.rdb.smembers(qname.push), {b'm:4'})
@@ -0,0 +1,140 @@
+import datetime
+import os
+import time
+import unittest
+
+from telegram import Chat, Message, PhotoSize
+from telegram.error import BadRequest, RetryAfter
+
+from model.artwork import ArtworkImage, ArtworkInfo
+from service.cache import ServiceCache
+from service.sender import MediaSender
+
+
+class RecordingBot:
+    """
+    记录发送的内容，返回带有 file_id 的消息
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def _message(self, file_id: str) -> Message:
+        chat = Chat(1, Chat.PRIVATE)
+        return Message(len(self.sent), datetime.datetime.now(), chat,
+                       photo=[PhotoSize(file_id, file_id, 10, 10)])
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+        return self._message("file-0")
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        self.sent.append([m.media for m in media])
+        return [self._message("file-%s" % i) for i in range(len(media))]
+
+
+class FloodBot(RecordingBot):
+    """
+    第一次发送时返回 RetryAfter
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.retry_after = retry_after
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        if self.retry_after:
+            retry_after, self.retry_after = self.retry_after, 0
+            raise RetryAfter(retry_after)
+        self.sent.append(photo.read())
+        return self._message("file-0")
+
+
+class RejectingBot(RecordingBot):
+    """
+    使用 file_id 发送时返回指定的 BadRequest
+    """
+
+    def __init__(self, message: str):
+        super().__init__()
+        self.message = message
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        if isinstance(photo, str):
+            raise BadRequest(self.message)
+        return super().send_photo(chat_id, photo, **kwargs)
+
+
+class TestMediaSender(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache = ServiceCache(
+            host=os.environ.get('REDIS_HOST', default='127.0.0.1'),
+            port=int(os.environ.get('REDIS_PORT', default='6379')),
+            db=int(os.environ.get('REDIS_DATABASE', default='4')),
+        )
+
+    def setUp(self):
+        self.sender = MediaSender(self.cache)
+        self.cache.rdb.delete(self.sender.file_ids)
+        self.artwork_info = ArtworkInfo()
+        self.artwork_info.site = "pixiv"
+        self.artwork_info.artwork_id = 1
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 10
+        self.images = [ArtworkImage(1, page, data=png) for page in range(2)]
+
+    def test_second_send_uses_file_id(self):
+        # 1. Setup
+        bot = RecordingBot()
+        # 2. Execute
+        self.sender.send(bot, 1, self.artwork_info, self.images, "caption")
+        self.sender.send(bot, 2, self.artwork_info, self.images, "caption")
+        # 3. Compare
+        self.assertNotIsInstance(bot.sent[0][0], str)
+        self.assertEqual(bot.sent[1], ["file-0", "file-1"])
+
+    def test_single_photo_shares_file_id_with_album(self):
+        # 1. Setup
+        bot = RecordingBot()
+        self.sender.send(bot, 1, self.artwork_info, self.images, "caption")
+        # 2. Execute
+        self.sender.send(bot, 1, self.artwork_info, self.images[:1], "caption")
+        # 3. Compare
+        self.assertEqual(bot.sent[1], "file-0")
+
+    def test_expired_file_id_is_uploaded_again(self):
+        # 1. Setup
+        self.sender.send(RecordingBot(), 1, self.artwork_info, self.images[:1], "caption")
+        bot = RejectingBot("Wrong file identifier/http url specified")
+        # 2. Execute
+        self.sender.send(bot, 1, self.artwork_info, self.images[:1], "caption")
+        # 3. Compare
+        self.assertEqual(len(bot.sent), 1)
+        self.assertNotIsInstance(bot.sent[0], str)
+
+    def test_other_bad_request_keeps_file_id(self):
+        # 1. Setup
+        self.sender.send(RecordingBot(), 1, self.artwork_info, self.images[:1], "caption")
+        bot = RejectingBot("Message caption is too long")
+        # 2. Execute
+        with self.assertRaises(BadRequest):
+            self.sender.send(bot, 1, self.artwork_info, self.images[:1], "caption")
+        # 3. Compare
+        self.assertEqual(bot.sent, [])
+        self.assertEqual(self.sender.get_file_ids(self.artwork_info, 1, "photo"), ["file-0"])
+
+    def test_retry_after_waits_and_resends(self):
+        # 1. Setup
+        bot = FloodBot(retry_after=1)
+        # 2. Execute
+        start = time.monotonic()
+        self.sender.send(bot, 1, self.artwork_info, self.images[:1], "caption")
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertGreaterEqual(elapsed, 0.9)
+        self.assertEqual(bot.sent, [self.images[0].data])
+
+
+if __name__ == '__main__':
+    unittest.main()
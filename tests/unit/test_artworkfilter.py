@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_artworkfilter
+
+import re
+import unittest
+
+from crawl.base import ArtworkInfo
+from crawl.pixivdownload import Pixiv
+from utils.artworkfilter import ArtworkFilter, ArtworkBatch, FilterRule
+
+NOW = 1660000000
+DAY = 24 * 60 * 60
+
+
+def legacy_filter_artwork(artwork_info: ArtworkInfo) -> bool:
+    # 原来 Pixiv.filter_artwork 的逻辑
+    if re.search(r"R.?18", artwork_info.tags, re.I) is not None:
+        if artwork_info.love_count < 2000:
+            return False
+    days_hundred_fold = (NOW - artwork_info.upload_timestamp) / 24 / 60 / 60 * 100
+    if 10 <= days_hundred_fold <= 300 and artwork_info.love_count >= 700:
+        if artwork_info.love_count < 1000 - days_hundred_fold:
+            return False
+    else:
+        if artwork_info.love_count < 1000:
+            return False
+    return True
+
+
+class TestArtworkFilter(unittest.TestCase):
+
+    def test_default_rules_match_legacy_filter(self):
+        # 1. Setup
+        artworks = [
+            ArtworkInfo(art_id=i, tags=tags, love_count=love, upload_timestamp=NOW - age * DAY)
+            for i, (tags, love, age) in enumerate(
+                (tags, love, age)
+                for tags in ("#原神#甘雨", "#原神#R-18", "#R18")
+                for love in (100, 699, 700, 750, 900, 999, 1000, 1999, 2000, 5000)
+                for age in (0.01, 0.1, 0.5, 1, 2.5, 3, 3.5, 10)
+            )
+        ]
+        sut = ArtworkFilter.from_config(Pixiv.DEFAULT_FILTER_RULES)
+        # 2. Execute
+        result, _ = sut.filter(artworks, now=NOW)
+        # 3. Compare
+        expected = [a for a in artworks if legacy_filter_artwork(a)]
+        self.assertEqual([a.art_id for a in result], [a.art_id for a in expected])
+
+    def test_report_counts_drops_per_rule(self):
+        # 1. Setup
+        artworks = [
+            ArtworkInfo(art_id=1, tags="#原神", love_count=5000, upload_timestamp=NOW - 10 * DAY),
+            ArtworkInfo(art_id=2, tags="#原神#R-18", love_count=1500, upload_timestamp=NOW - 10 * DAY),
+            ArtworkInfo(art_id=3, tags="#原神", love_count=100, upload_timestamp=NOW - 10 * DAY),
+        ]
+        sut = ArtworkFilter.from_config(Pixiv.DEFAULT_FILTER_RULES)
+        # 2. Execute
+        result, report = sut.filter(artworks, now=NOW)
+        # 3. Compare
+        self.assertEqual([a.art_id for a in result], [1])
+        self.assertEqual(report, {"r18": 1, "popularity": 1})
+
+    def test_require_tag_and_max_ai_type(self):
+        # 1. Setup
+        batch = ArtworkBatch(
+            love_count=[500, 500, 500],
+            upload_timestamp=[NOW, NOW, NOW],
+            ai_type=[1, 2, 1],
+            tags=["#GenshinImpact", "#原神", "#Honkai"],
+        )
+        sut = ArtworkFilter([
+            FilterRule("genshin", require_tag=r"(Genshin(Impact)?)|(原神)"),
+            FilterRule("ai", max_ai_type=1),
+        ])
+        # 2. Execute
+        keep, report = sut.evaluate(batch, NOW)
+        # 3. Compare
+        self.assertEqual(keep.tolist(), [True, False, False])
+        self.assertEqual(report, {"genshin": 1, "ai": 1})
+
+    def test_empty_input(self):
+        # 1. Setup
+        sut = ArtworkFilter.from_config(Pixiv.DEFAULT_ARTIST_FILTER_RULES)
+        # 2. Execute
+        result, report = sut.filter([])
+        # 3. Compare
+        self.assertEqual(result, [])
+        self.assertEqual(report, {"genshin": 0, "popularity": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
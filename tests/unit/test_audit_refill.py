@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_audit_refill
+
+import unittest
+
+from model.artwork import ArtworkInfo, AuditType
+from service.service import SiteService
+
+
+def artwork(site: str, artwork_id: int) -> ArtworkInfo:
+    artwork_info = ArtworkInfo()
+    artwork_info.site = site
+    artwork_info.artwork_id = artwork_id
+    return artwork_info
+
+
+class IncrementalSite:
+    """
+    数据库ID和作品ID相同，ids 为待审核的作品
+    """
+
+    def __init__(self, site: str, ids):
+        self.site = site
+        self.ids = list(ids)
+        self.calls = []
+
+    def get_art_for_audit_since(self, audit_type, last_id=0):
+        self.calls.append(last_id)
+        ids = [i for i in self.ids if i > last_id]
+        return [artwork(self.site, i) for i in ids], max([last_id] + ids)
+
+
+class TestAuditRefill(unittest.TestCase):
+
+    def setUp(self):
+        self.pixiv = IncrementalSite("pixiv", [1, 2, 3])
+        self.service = SiteService()
+        self.service.SiteClassHandlers = [("pixiv", self.pixiv)]
+
+    def test_full_load_returns_all_sites_and_marks(self):
+        # 1. Setup
+        # 2. Execute
+        artworks, marks = self.service.get_art_for_audit_since(AuditType.SFW)
+        # 3. Compare
+        self.assertEqual([(a.site, a.artwork_id) for a in artworks], [("pixiv", 1), ("pixiv", 2), ("pixiv", 3)])
+        self.assertEqual(marks, {"pixiv": 3})
+
+    def test_incremental_load_returns_new_rows_only(self):
+        # 1. Setup
+        _, marks = self.service.get_art_for_audit_since(AuditType.SFW)
+        self.pixiv.ids.append(4)
+        # 2. Execute
+        artworks, marks = self.service.get_art_for_audit_since(AuditType.SFW, marks)
+        # 3. Compare
+        self.assertEqual([(a.site, a.artwork_id) for a in artworks], [("pixiv", 4)])
+        self.assertEqual(marks, {"pixiv": 4})
+        self.assertEqual(self.pixiv.calls, [0, 3])
+
+    def test_row_reset_below_mark_waits_for_full_reload(self):
+        # 1. Setup
+        _, marks = self.service.get_art_for_audit_since(AuditType.SFW)
+        # 作品2审核后又被重置为待审核，数据库ID不大于记录
+        self.pixiv.ids.remove(2)
+        _, marks = self.service.get_art_for_audit_since(AuditType.SFW, marks)
+        self.pixiv.ids.append(2)
+        # 2. Execute
+        incremental, _ = self.service.get_art_for_audit_since(AuditType.SFW, marks)
+        full, _ = self.service.get_art_for_audit_since(AuditType.SFW)
+        # 3. Compare
+        self.assertNotIn(("pixiv", 2), [(a.site, a.artwork_id) for a in incremental])
+        self.assertIn(("pixiv", 2), [(a.site, a.artwork_id) for a in full])
+
+    def test_incremental_load_without_new_rows_keeps_marks(self):
+        # 1. Setup
+        _, marks = self.service.get_art_for_audit_since(AuditType.SFW)
+        # 2. Execute
+        artworks, new_marks = self.service.get_art_for_audit_since(AuditType.SFW, marks)
+        # 3. Compare
+        self.assertEqual(artworks, [])
+        self.assertEqual(new_marks, marks)
+
+
+if __name__ == '__main__':
+    unittest.main()
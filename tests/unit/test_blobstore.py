@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_blobstore
+
+import gc
+import os
+import tempfile
+import unittest
+
+from model.artwork import ArtworkImage
+from utils.blobstore import BlobStore, set_default_store
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+    def tearDown(self):
+        set_default_store(None)
+        self.temp_dir.cleanup()
+
+    def test_same_content_is_stored_once(self):
+        # 1. Setup
+        store = BlobStore(self.root)
+        # 2. Execute
+        first = store.put(b"image")
+        second = store.put(b"image")
+        # 3. Compare
+        self.assertEqual(first, second)
+        self.assertEqual(store.total, 5)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, first[:2], first[2:4], first)))
+        with store.open(first) as buffer:
+            self.assertEqual(buffer.read(), b"image")
+
+    def test_least_recently_used_is_evicted(self):
+        # 1. Setup
+        store = BlobStore(self.root, max_bytes=10)
+        first = store.put(b"aaaa")
+        second = store.put(b"bbbb")
+        # 2. Execute
+        store.read(first)
+        third = store.put(b"cccc")
+        # 3. Compare
+        self.assertIn(first, store)
+        self.assertNotIn(second, store)
+        self.assertIn(third, store)
+        self.assertFalse(os.path.exists(store.path(second)))
+        self.assertEqual(store.total, 8)
+
+    def test_startup_scan_restores_index(self):
+        # 1. Setup
+        digest = BlobStore(self.root).put(b"image")
+        temp_path = BlobStore(self.root).path(digest) + ".1.tmp"
+        open(temp_path, "wb").close()
+        # 2. Execute
+        store = BlobStore(self.root)
+        # 3. Compare
+        self.assertIn(digest, store)
+        self.assertEqual(store.total, 5)
+        self.assertFalse(os.path.exists(temp_path))
+
+    def test_artwork_image_keeps_data_on_disk(self):
+        # 1. Setup
+        set_default_store(BlobStore(self.root))
+        data = b"GIF89a" + b"\x00" * 10
+        # 2. Execute
+        image = ArtworkImage(1, data=data)
+        # 3. Compare
+        self.assertEqual(image._data, b"")
+        self.assertEqual(image.format, "gif")
+        self.assertEqual(image.data, data)
+        self.assertEqual(image.open().read(), data)
+
+    def test_evicted_blob_raises_key_error(self):
+        # 1. Setup
+        store = BlobStore(self.root, max_bytes=4)
+        first = store.put(b"aaaa")
+        store.put(b"bbbb")
+        # 2. Execute
+        # 3. Compare
+        with self.assertRaises(KeyError):
+            store.read(first)
+        with self.assertRaises(KeyError):
+            store.open(first)
+
+    def test_artwork_image_pins_blob_until_released(self):
+        # 1. Setup
+        store = BlobStore(self.root, max_bytes=20)
+        set_default_store(store)
+        data = b"GIF89a" + b"\x00" * 10
+        image = ArtworkImage(1, data=data)
+        digest = image.digest
+        # 2. Execute
+        store.put(b"x" * 16)
+        pinned = digest in store
+        del image
+        gc.collect()
+        store.put(b"y" * 16)
+        # 3. Compare
+        self.assertTrue(pinned)
+        self.assertNotIn(digest, store)
+
+    def test_artwork_image_lost_blob_raises_key_error(self):
+        # 1. Setup
+        store = BlobStore(self.root)
+        set_default_store(store)
+        image = ArtworkImage(1, data=b"GIF89a" + b"\x00" * 10)
+        # 2. Execute
+        os.remove(store.path(image.digest))
+        # 3. Compare
+        with self.assertRaises(KeyError):
+            image.open()
+        with self.assertRaises(KeyError):
+            image.data
+
+    def test_artwork_image_from_store_does_not_read_data(self):
+        # 1. Setup
+        store = BlobStore(self.root, max_bytes=20)
+        data = b"GIF89a" + b"\x00" * 10
+        digest = store.put(data)
+        # 2. Execute
+        image = ArtworkImage.from_store(1, 2, store, digest)
+        store.put(b"x" * 16)
+        # 3. Compare
+        self.assertEqual((image.page, image.format, image._data), (2, "gif", b""))
+        self.assertIn(digest, store)
+        self.assertEqual(image.data, data)
+
+    def test_artwork_image_from_missing_blob_raises_key_error(self):
+        # 1. Setup
+        store = BlobStore(self.root)
+        # 2. Execute
+        # 3. Compare
+        with self.assertRaises(KeyError):
+            ArtworkImage.from_store(1, 0, store, "0" * 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
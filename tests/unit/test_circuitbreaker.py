@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_circuitbreaker
+
+import time
+import unittest
+from email.utils import formatdate
+
+from utils.circuitbreaker import CircuitBreaker, parse_retry_after
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        # 1. Setup
+        breaker = CircuitBreaker(base_delay=10, max_delay=1000)
+        delays = []
+        # 2. Execute
+        for _ in range(4):
+            delay, _ = breaker.record_failure()
+            delays.append(delay)
+            breaker._open_until = 0
+        # 3. Compare
+        for i, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 10 * 2 ** i / 2)
+            self.assertLessEqual(delay, 10 * 2 ** i)
+
+    def test_failures_while_open_do_not_escalate(self):
+        # 1. Setup
+        breaker = CircuitBreaker(base_delay=10)
+        # 2. Execute
+        _, opened = breaker.record_failure()
+        reopened = [breaker.record_failure()[1] for _ in range(5)]
+        # 3. Compare
+        self.assertTrue(opened)
+        self.assertEqual(reopened, [False] * 5)
+        self.assertEqual(breaker.failures, 1)
+        self.assertTrue(breaker.is_open)
+
+    def test_retry_after_overrides_backoff(self):
+        # 1. Setup
+        breaker = CircuitBreaker(base_delay=10, max_delay=100)
+        # 2. Execute
+        delay, _ = breaker.record_failure(retry_after=42)
+        # 3. Compare
+        self.assertEqual(delay, 42)
+
+    def test_success_resets_failures(self):
+        # 1. Setup
+        breaker = CircuitBreaker(base_delay=0.01)
+        breaker.record_failure()
+        # 2. Execute
+        breaker.record_success()
+        # 3. Compare
+        self.assertEqual(breaker.failures, 0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
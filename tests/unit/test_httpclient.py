@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_httpclient
+
+import unittest
+
+import httpx
+
+from utils import httpclient
+from utils.httpclient import create_client
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def test_client_reuses_pool_limits_from_config(self):
+        # 1. Setup
+        http_config = {"http2": False, "max_connections": 3, "max_keepalive_connections": 2,
+                       "keepalive_expiry": 15, "timeout": 7}
+        # 2. Execute
+        options = httpclient._client_options(http_config)
+        # 3. Compare
+        self.assertFalse(options["http2"])
+        self.assertEqual(options["limits"], httpx.Limits(max_connections=3, max_keepalive_connections=2,
+                                                         keepalive_expiry=15))
+        self.assertEqual(options["timeout"], 7)
+
+    def test_http2_requires_h2(self):
+        # 1. Setup
+        http_config = {"http2": True}
+        # 2. Execute
+        options = httpclient._client_options(http_config)
+        # 3. Compare
+        self.assertEqual(options["http2"], httpclient.HTTP2_AVAILABLE)
+
+    def test_kwargs_override_config(self):
+        # 1. Setup
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=request.headers["X-Test"]))
+        # 2. Execute
+        with create_client({"http2": False}, transport=transport, headers={"X-Test": "ok"}) as client:
+            response = client.get("https://example.com/")
+        # 3. Compare
+        self.assertEqual(response.text, "ok")
+
+
+if __name__ == '__main__':
+    unittest.main()
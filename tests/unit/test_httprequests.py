@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_httprequests
+
+import asyncio
+import random
+import time
+import unittest
+
+import httpx
+
+from utils.httprequests import HttpRequests, TooManyRequest
+
+
+class CountingRateLimiter:
+
+    def __init__(self):
+        self.throttles = []
+
+    async def acquire(self):
+        pass
+
+    def throttle(self, delay):
+        self.throttles.append(delay)
+
+    def recover(self):
+        pass
+
+
+class TestHttpRequests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(random.random() / 100)
+            art_id = request.url.params["id"]
+            if art_id == "404":
+                return httpx.Response(404)
+            if request.url.host == "burst.example.com":
+                return httpx.Response(429, headers={"Retry-After": "60"})
+            if request.url.host == "throttled.example.com":
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            if request.url.host == "offline.example.com":
+                self.attempts += 1
+                raise httpx.ConnectError("connection refused", request=request)
+            if request.url.host == "unstable.example.com":
+                self.attempts += 1
+                if self.attempts == 1:
+                    raise httpx.ConnectError("connection refused", request=request)
+            if request.url.host == "flaky.example.com":
+                self.attempts += 1
+                if self.attempts == 1:
+                    return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(200, text='{"id": %s}' % art_id)
+
+        self.attempts = 0
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.sut = HttpRequests(client=self.client)
+
+    async def asyncTearDown(self):
+        await self.sut.aclose()
+
+    async def test_concurrent_requests_get_their_own_response(self):
+        # 1. Setup
+        art_ids = list(range(50))
+        # 2. Execute
+        results = await asyncio.gather(*[
+            self.sut.ARequest_json("GET", "https://example.com/", params={"id": art_id}) for art_id in art_ids
+        ])
+        # 3. Compare
+        self.assertEqual([r.code for r in results], [0] * len(art_ids))
+        self.assertEqual([r.data["id"] for r in results], art_ids)
+
+    async def test_error_does_not_leak_into_other_requests(self):
+        # 1. Execute
+        ok, missing = await asyncio.gather(
+            self.sut.ARequest_json("GET", "https://example.com/", params={"id": 1}),
+            self.sut.ARequest_json("GET", "https://example.com/", params={"id": 404}),
+        )
+        # 2. Compare
+        self.assertEqual((ok.code, ok.data), (0, {"id": 1}))
+        self.assertEqual((missing.code, missing.status_code), (2, 404))
+
+    async def test_throttled_request_is_retried_after_retry_after(self):
+        # 1. Execute
+        result = await self.sut.ARequest_json("GET", "https://flaky.example.com/", params={"id": 7})
+        # 2. Compare
+        self.assertEqual((result.code, result.data), (0, {"id": 7}))
+        self.assertEqual(self.attempts, 2)
+
+    async def test_retry_budget_exhausted_raises(self):
+        # 1. Execute & Compare
+        with self.assertRaises(TooManyRequest):
+            await self.sut.ARequest_json("GET", "https://throttled.example.com/", params={"id": 1})
+
+    async def test_network_error_is_retried_after_backoff(self):
+        # 1. Setup
+        sut = HttpRequests(client=self.client, retry_base_delay=0.2)
+        # 2. Execute
+        start = time.monotonic()
+        result = await sut.ARequest_json("GET", "https://unstable.example.com/", params={"id": 7})
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertEqual((result.code, result.data), (0, {"id": 7}))
+        self.assertEqual(self.attempts, 2)
+        self.assertGreaterEqual(elapsed, 0.1)
+
+    async def test_network_error_backoff_grows_until_retries_run_out(self):
+        # 1. Setup
+        sut = HttpRequests(client=self.client, max_retries=3, retry_base_delay=0.1, retry_max_delay=0.15)
+        # 2. Execute
+        start = time.monotonic()
+        result = await sut.ARequest_json("GET", "https://offline.example.com/", params={"id": 1})
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertEqual(result.code, 3)
+        self.assertIsInstance(result.message, httpx.ConnectError)
+        self.assertEqual(self.attempts, 3)
+        # 第一次等待 0.05~0.1 秒，第二次 0.075~0.15 秒，最后一次失败后不等待
+        self.assertGreaterEqual(elapsed, 0.125)
+        self.assertLess(elapsed, 1)
+
+    async def test_concurrent_failures_throttle_once(self):
+        # 1. Setup
+        rate_limiter = CountingRateLimiter()
+        sut = HttpRequests(client=self.client, rate_limiter=rate_limiter, max_retries=1)
+        # 2. Execute
+        results = await asyncio.gather(*[
+            sut.ARequest_json("GET", "https://burst.example.com/", params={"id": i}) for i in range(10)
+        ], return_exceptions=True)
+        # 3. Compare
+        self.assertTrue(all(isinstance(r, TooManyRequest) for r in results))
+        self.assertEqual(rate_limiter.throttles, [60])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -199,3 +199,11 @@ class TestTag(unittest.TestCase):
         # 3. Compare
         character_names = {("Hutao", "胡桃")}
         self.assertEqual(result, character_names)
+
+    def test_namemap_all_character_names_skip_single_letter(self):
+        # 1. Execute
+        result = self.name_map.get_all_character_names()
+        # 2. Compare
+        self.assertIn("胡桃", result)
+        self.assertIn("Jean", result)
+        self.assertNotIn("琴", result)
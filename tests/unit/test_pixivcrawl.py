@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_pixivcrawl
+
+import asyncio
+import time
+import unittest
+
+from crawl.base import ArtworkInfo, FrontierState, RecommendResult
+from crawl.pixivdownload import Pixiv
+from model.artist import ArtistCrawlInfo
+from utils.httprequests import TooManyRequest
+
+
+def artwork(art_id: int, love_count: int = 500) -> ArtworkInfo:
+    return ArtworkInfo(art_id=art_id, title=str(art_id), tags="#原神", love_count=love_count,
+                       upload_timestamp=int(time.time()) - 10 * 24 * 60 * 60, ai_type=1)
+
+
+class FakeRepository:
+    """
+    用字典代替数据库，所有记录都在 skip_fresh_hours 之内
+    """
+
+    def __init__(self, stored=(), frontier=None, artists=()):
+        self.artworks = {art_id: artwork(art_id) for art_id in stored}
+        self.frontier = dict(frontier or {})
+        self.artists = list(artists)
+        self.last_crawl = {}
+
+    async def close(self):
+        pass
+
+    async def get_stored_art_ids(self, art_ids, updated_within_hours=None):
+        return set(art_ids).intersection(self.artworks)
+
+    async def get_rejected_art_ids(self, art_ids, updated_within_hours=None):
+        return set(i for i in art_ids if self.frontier.get(i) == FrontierState.REJECTED)
+
+    async def clear_frontier(self, keep_rejected_hours=0):
+        self.frontier = {i: state for i, state in self.frontier.items()
+                         if keep_rejected_hours > 0 and state == FrontierState.REJECTED}
+
+    async def add_frontier_many(self, art_ids):
+        for art_id in art_ids:
+            if self.frontier.get(art_id, FrontierState.REJECTED) == FrontierState.REJECTED:
+                self.frontier[art_id] = FrontierState.QUEUED
+
+    async def update_frontier_state_many(self, art_ids, state):
+        for art_id in art_ids:
+            self.frontier[art_id] = state
+
+    async def get_frontier_art_ids(self, states):
+        return set(i for i, state in self.frontier.items() if state in states)
+
+    async def save_artwork_many(self, artwork_list):
+        for a in artwork_list:
+            self.artworks[a.art_id] = a
+        return len(artwork_list)
+
+    async def get_artists_with_multiple_approved_arts(self, num, days_ago, limit=None):
+        return self.artists
+
+    async def save_artist_last_crawl_many(self, last_crawl_list):
+        for a in last_crawl_list:
+            self.last_crawl[a.user_id] = a.art_id
+        return len(last_crawl_list)
+
+
+class RecordingRepository(FakeRepository):
+    """
+    记录每次写入的作品id，前 fail_count 次写入失败
+    """
+
+    def __init__(self, fail_count=0):
+        super().__init__()
+        self.fail_count = fail_count
+        self.batches = []
+
+    async def save_artwork_many(self, artwork_list):
+        if self.fail_count > 0:
+            self.fail_count -= 1
+            raise ConnectionError("database is down")
+        self.batches.append(sorted(a.art_id for a in artwork_list))
+        return await super().save_artwork_many(artwork_list)
+
+
+class FakeBasicRequest:
+
+    def __init__(self, artworks=(), too_many=(), recommendations=None, broken=(), user_illusts=None):
+        self.artworks = {a.art_id: a for a in artworks}
+        self.user_illusts = dict(user_illusts or {})
+        self.too_many = set(too_many)
+        self.recommendations = dict(recommendations or {})
+        self.broken = set(broken)
+        self.requested = []
+        self.recommended = []
+
+    async def close(self):
+        pass
+
+    async def download_artwork_info(self, art_id):
+        self.requested.append(art_id)
+        if art_id in self.too_many:
+            raise TooManyRequest
+        if art_id in self.broken:
+            raise ConnectionError("network is down")
+        return self.artworks.get(art_id)
+
+    async def get_user_all_illusts(self, user_id):
+        if user_id in self.broken:
+            raise ValueError("unexpected response")
+        return self.user_illusts.get(user_id)
+
+    async def get_recommendation(self, art_id):
+        self.recommended.append(art_id)
+        if art_id in self.broken:
+            raise ValueError("unexpected response")
+        illusts = [{"id": str(i), "tags": ["原神"]} for i in self.recommendations.get(art_id, [])]
+        return RecommendResult(illusts=illusts)
+
+
+def create_pixiv(repository: FakeRepository, request: FakeBasicRequest, **crawl_config) -> Pixiv:
+    config = {
+        "workers": 2,
+        "exclude_ai": False,
+        "filter_rules": [{"name": "popularity", "min_love": 100}],
+    }
+    config.update(crawl_config)
+    pixiv = Pixiv(crawl_config=config)
+    pixiv.repository = repository
+    pixiv.BasicRequest = request
+    return pixiv
+
+
+async def crawl_ids(pixiv: Pixiv, art_ids):
+    pixiv.art_id_queue = asyncio.Queue()
+    pixiv.start_workers()
+    await pixiv.enqueue_art_ids(art_ids)
+    await pixiv.art_id_queue.join()
+    await pixiv.stop_workers()
+
+
+class TestPixivFreshnessSkip(unittest.IsolatedAsyncioTestCase):
+
+    async def test_flush_records_rejected_ids(self):
+        # 1. Setup
+        repository = FakeRepository()
+        pixiv = create_pixiv(repository, FakeBasicRequest())
+        # 2. Execute
+        ok = await pixiv.flush([artwork(1), artwork(2, love_count=10)], {1, 2}, set())
+        # 3. Compare
+        self.assertTrue(ok)
+        self.assertEqual(set(repository.artworks), {1})
+        self.assertEqual(repository.frontier, {1: FrontierState.DONE, 2: FrontierState.REJECTED})
+
+    async def test_dry_run_does_not_record_rejected_ids(self):
+        # 1. Setup
+        repository = FakeRepository()
+        pixiv = create_pixiv(repository, FakeBasicRequest(), filter_dry_run=True)
+        # 2. Execute
+        await pixiv.flush([artwork(1), artwork(2, love_count=10)], {1, 2}, set())
+        # 3. Compare
+        self.assertEqual(repository.artworks, {})
+        self.assertEqual(repository.frontier, {1: FrontierState.DONE, 2: FrontierState.DONE})
+
+    async def test_enqueue_skips_stored_and_rejected_ids(self):
+        # 1. Setup
+        repository = FakeRepository(stored=[1], frontier={2: FrontierState.REJECTED})
+        pixiv = create_pixiv(repository, FakeBasicRequest())
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        count = await pixiv.enqueue_art_ids([1, 2, 3])
+        # 3. Compare
+        self.assertEqual(count, 1)
+        self.assertEqual(pixiv.skipped_count, 2)
+        self.assertEqual(pixiv.art_id_queue.get_nowait(), {"id": 3})
+        self.assertTrue(pixiv.art_id_queue.empty())
+
+    async def test_rejected_ids_are_not_fetched_again(self):
+        # 1. Setup
+        repository = FakeRepository()
+        request = FakeBasicRequest([artwork(1), artwork(2, love_count=10)])
+        pixiv = create_pixiv(repository, request)
+        await crawl_ids(pixiv, [1, 2])
+        await repository.clear_frontier(keep_rejected_hours=pixiv.skip_fresh_hours)
+        # 2. Execute
+        pixiv.seen_ids = set()
+        pixiv.art_id_queue = asyncio.Queue()
+        count = await pixiv.enqueue_art_ids([1, 2])
+        # 3. Compare
+        self.assertEqual(sorted(request.requested), [1, 2])
+        self.assertEqual(count, 0)
+
+
+class TestPixivFrontier(unittest.IsolatedAsyncioTestCase):
+
+    async def test_flush_updates_frontier_states(self):
+        # 1. Setup
+        repository = FakeRepository(frontier={1: FrontierState.QUEUED, 2: FrontierState.QUEUED,
+                                              3: FrontierState.QUEUED})
+        pixiv = create_pixiv(repository, FakeBasicRequest())
+        pixiv.in_flight_ids = {3}
+        # 2. Execute
+        await pixiv.flush([artwork(1)], {1}, {2})
+        # 3. Compare
+        self.assertEqual(repository.frontier, {1: FrontierState.DONE, 2: FrontierState.FAILED,
+                                               3: FrontierState.IN_FLIGHT})
+
+    async def test_workers_record_failed_and_throttled_ids(self):
+        # 1. Setup
+        repository = FakeRepository()
+        request = FakeBasicRequest([artwork(1)], too_many=[3])
+        pixiv = create_pixiv(repository, request)
+        # 2. Execute
+        await crawl_ids(pixiv, [1, 2, 3])
+        # 3. Compare
+        self.assertEqual(repository.frontier, {1: FrontierState.DONE, 2: FrontierState.FAILED,
+                                               3: FrontierState.IN_FLIGHT})
+
+    async def test_resume_fetches_queued_and_in_flight_ids(self):
+        # 1. Setup
+        repository = FakeRepository(frontier={1: FrontierState.QUEUED, 2: FrontierState.IN_FLIGHT,
+                                              3: FrontierState.DONE, 4: FrontierState.FAILED})
+        request = FakeBasicRequest([artwork(1), artwork(2)])
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task(resume=True)
+        # 3. Compare
+        self.assertEqual(sorted(request.requested), [1, 2])
+        self.assertEqual(repository.frontier, {1: FrontierState.DONE, 2: FrontierState.DONE,
+                                               3: FrontierState.DONE, 4: FrontierState.FAILED})
+
+    async def test_new_task_clears_frontier(self):
+        # 1. Setup
+        repository = FakeRepository(frontier={1: FrontierState.QUEUED, 2: FrontierState.IN_FLIGHT})
+        request = FakeBasicRequest([artwork(5)])
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+
+        async def discover():
+            await pixiv.enqueue_art_ids([5])
+
+        pixiv.discover = discover
+        # 2. Execute
+        await pixiv.task(resume=False)
+        # 3. Compare
+        self.assertEqual(request.requested, [5])
+        self.assertEqual(repository.frontier, {5: FrontierState.DONE})
+
+
+class TestPixivSink(unittest.IsolatedAsyncioTestCase):
+
+    @staticmethod
+    def start_sink(pixiv: Pixiv):
+        pixiv.sink_queue = asyncio.Queue()
+        return asyncio.ensure_future(pixiv.sink())
+
+    @staticmethod
+    async def put_artworks(pixiv: Pixiv, art_ids):
+        for art_id in art_ids:
+            await pixiv.sink_queue.put({"status": "done", "id": art_id, "artwork": artwork(art_id)})
+
+    async def test_flush_every_checkpoint_size_and_on_shutdown(self):
+        # 1. Setup
+        repository = RecordingRepository()
+        pixiv = create_pixiv(repository, FakeBasicRequest(), checkpoint_size=2, checkpoint_interval=60)
+        sink_task = self.start_sink(pixiv)
+        # 2. Execute
+        await self.put_artworks(pixiv, [1, 2, 3, 4, 5])
+        await pixiv.sink_queue.put({"status": "failed", "id": 6})
+        await pixiv.sink_queue.put({"status": "close"})
+        await sink_task
+        # 3. Compare
+        self.assertEqual(repository.batches, [[1, 2], [3, 4], [5]])
+        self.assertEqual(repository.frontier[5], FrontierState.DONE)
+        self.assertEqual(repository.frontier[6], FrontierState.FAILED)
+
+    async def test_flush_after_checkpoint_interval(self):
+        # 1. Setup
+        repository = RecordingRepository()
+        pixiv = create_pixiv(repository, FakeBasicRequest(), checkpoint_size=100, checkpoint_interval=0.05)
+        sink_task = self.start_sink(pixiv)
+        # 2. Execute
+        await self.put_artworks(pixiv, [1])
+        await asyncio.sleep(0.2)
+        batches = list(repository.batches)
+        await pixiv.sink_queue.put({"status": "close"})
+        await sink_task
+        # 3. Compare
+        self.assertEqual(batches, [[1]])
+
+    async def test_failed_flush_is_retried_with_next_batch(self):
+        # 1. Setup
+        repository = RecordingRepository(fail_count=1)
+        pixiv = create_pixiv(repository, FakeBasicRequest(), checkpoint_size=1, checkpoint_interval=60)
+        sink_task = self.start_sink(pixiv)
+        # 2. Execute
+        await self.put_artworks(pixiv, [1, 2])
+        await pixiv.sink_queue.put({"status": "close"})
+        await sink_task
+        # 3. Compare
+        self.assertEqual(repository.batches, [[1, 2]])
+        self.assertEqual(set(repository.artworks), {1, 2})
+
+
+class TestPixivRecommendation(unittest.IsolatedAsyncioTestCase):
+    # 推荐图 Recommendation graph: 1 -> 2, 3; 2 -> 1, 3, 4; 3 -> 2; 4 -> 5 -> 6
+    RECOMMENDATIONS = {1: [2, 3], 2: [1, 3, 4], 3: [2], 4: [5], 5: [6]}
+
+    async def expand(self, seeds, broken=(), **crawl_config):
+        request = FakeBasicRequest(recommendations=self.RECOMMENDATIONS, broken=broken)
+        pixiv = create_pixiv(FakeRepository(), request, recommend_next_pages=0, **crawl_config)
+        pixiv.art_id_queue = asyncio.Queue()
+        pixiv.seen_ids = set(seeds)
+        count = await pixiv.expand_recommendation(seeds)
+        queued = set()
+        while not pixiv.art_id_queue.empty():
+            queued.add(pixiv.art_id_queue.get_nowait()["id"])
+        return count, queued, request.recommended
+
+    async def test_depth_limits_expansion(self):
+        # 1. Setup
+        seeds = [1]
+        # 2. Execute
+        count, queued, recommended = await self.expand(seeds, recommend_depth=2)
+        # 3. Compare
+        self.assertEqual(count, 3)
+        self.assertEqual(queued, {2, 3, 4})
+        self.assertEqual(sorted(recommended), [1, 2, 3])
+
+    async def test_each_artwork_is_expanded_and_queued_once(self):
+        # 1. Setup
+        seeds = [1, 2]
+        # 2. Execute
+        count, queued, recommended = await self.expand(seeds, recommend_depth=5)
+        # 3. Compare
+        self.assertEqual(queued, {3, 4, 5, 6})
+        self.assertEqual(count, 4)
+        self.assertEqual(sorted(recommended), [1, 2, 3, 4, 5, 6])
+
+    async def test_max_nodes_limits_expansion(self):
+        # 1. Setup
+        seeds = [1]
+        # 2. Execute
+        count, queued, recommended = await self.expand(seeds, recommend_depth=5, recommend_max_nodes=2)
+        # 3. Compare
+        self.assertEqual(len(recommended), 2)
+
+    async def test_recommendation_error_skips_only_that_seed(self):
+        # 1. Setup
+        seeds = [1, 4]
+        # 2. Execute
+        count, queued, recommended = await self.expand(seeds, broken=[1], recommend_depth=1)
+        # 3. Compare
+        self.assertEqual(queued, {5})
+        self.assertEqual(sorted(recommended), [1, 4])
+
+
+class TestPixivArtistCrawl(unittest.IsolatedAsyncioTestCase):
+
+    async def test_progress_stops_before_unresolved_artwork(self):
+        # 1. Setup
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7, last_art_id=10)])
+        request = FakeBasicRequest([artwork(i) for i in (11, 12, 13, 14)], too_many=[13],
+                                   user_illusts={7: [9, 10, 11, 12, 13, 14]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(sorted(request.requested), [11, 12, 13, 14])
+        self.assertEqual(repository.last_crawl, {7: 12})
+
+    async def test_stored_and_rejected_artworks_count_as_resolved(self):
+        # 1. Setup
+        repository = FakeRepository(stored=[11], artists=[ArtistCrawlInfo(user_id=7, last_art_id=10)])
+        request = FakeBasicRequest([artwork(12, love_count=10), artwork(13)], user_illusts={7: [11, 12, 13]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(sorted(request.requested), [12, 13])
+        self.assertEqual(repository.last_crawl, {7: 13})
+
+    async def test_unavailable_artwork_counts_as_resolved(self):
+        # 1. Setup
+        # 作品11已删除，download_artwork_info 返回None
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7, last_art_id=10)])
+        request = FakeBasicRequest([artwork(12)], user_illusts={7: [11, 12]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(repository.frontier[11], FrontierState.FAILED)
+        self.assertEqual(repository.last_crawl, {7: 12})
+
+    async def test_network_error_keeps_previous_progress(self):
+        # 1. Setup
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7, last_art_id=10)])
+        request = FakeBasicRequest([artwork(11), artwork(12)], broken=[11], user_illusts={7: [11, 12]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(repository.frontier[11], FrontierState.FAILED)
+        self.assertEqual(repository.last_crawl, {7: 10})
+
+    async def test_artist_without_progress_is_still_updated(self):
+        # 1. Setup
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7)])
+        request = FakeBasicRequest(broken=[11], user_illusts={7: [11]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(repository.last_crawl, {7: None})
+
+    async def test_artist_error_does_not_stop_other_artists(self):
+        # 1. Setup
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7), ArtistCrawlInfo(user_id=8)])
+        request = FakeBasicRequest([artwork(21)], broken=[7], user_illusts={8: [21]})
+        pixiv = create_pixiv(repository, request)
+        pixiv.art_id_queue = asyncio.Queue()
+        # 2. Execute
+        await pixiv.task1()
+        # 3. Compare
+        self.assertEqual(repository.last_crawl, {8: 21})
+
+    async def test_workers_stop_when_artist_crawl_fails(self):
+        # 1. Setup
+        repository = FakeRepository(artists=[ArtistCrawlInfo(user_id=7)])
+        pixiv = create_pixiv(repository, FakeBasicRequest())
+        pixiv.art_id_queue = asyncio.Queue()
+
+        async def crawl_artist(artist):
+            raise RuntimeError("crawl failed")
+
+        pixiv.crawl_artist = crawl_artist
+        # 2. Execute
+        with self.assertRaises(RuntimeError):
+            await pixiv.task1()
+        # 3. Compare
+        self.assertTrue(all(task.done() for task in pixiv.GetIllustInformationTasks))
+        self.assertTrue(pixiv.sink_task.done())
+        self.assertEqual(repository.last_crawl, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_prefetch
+
+import threading
+import unittest
+
+from model.artwork import ArtworkInfo, AuditType
+from model.helpers import parse_artwork_audit_data
+from service.prefetch import AuditPrefetcher
+
+
+class QueueAuditService:
+    """
+    只实现审核预取用到的方法，审核队列保存在列表中
+    """
+
+    def __init__(self, post_ids):
+        self.queue = [{"post_id": post_id, "site": "pixiv"} for post_id in post_ids]
+        self.loaded = []
+        self.putback = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_audit(self, audit_type):
+        if len(self.queue) == 0:
+            return None
+        return self.queue.pop(0)
+
+    def get_audit_many(self, audit_type, count):
+        items, self.queue = self.queue[:count], self.queue[count:]
+        return items
+
+    def audit_load(self, audit_type, data):
+        self.release.wait(5)
+        self.loaded.append(data["post_id"])
+        artwork_info = ArtworkInfo()
+        artwork_info.artwork_id = data["post_id"]
+        return parse_artwork_audit_data(artwork_info=artwork_info)
+
+    def audit_next(self, audit_type):
+        return parse_artwork_audit_data(error_message="缓存错误")
+
+    def extend_pending(self, audit_type, data_list):
+        self.extended = [data["post_id"] for data in data_list]
+
+    def putback_audit(self, audit_type, data):
+        self.putback.append(data["post_id"])
+
+
+class TestAuditPrefetcher(unittest.TestCase):
+
+    def test_next_returns_in_queue_order_and_leases_ahead(self):
+        # 1. Setup
+        service = QueueAuditService(range(1, 6))
+        prefetcher = AuditPrefetcher(service, AuditType.SFW, depth=2)
+        # 2. Execute
+        first = prefetcher.next()
+        second = prefetcher.next()
+        # 3. Compare
+        self.assertEqual(first.artwork_info.artwork_id, 1)
+        self.assertEqual(second.artwork_info.artwork_id, 2)
+        self.assertEqual(prefetcher.pending, 2)
+        self.assertEqual(service.queue, [{"post_id": 5, "site": "pixiv"}])
+        self.assertEqual(service.extended, [2, 3, 4])
+        prefetcher.close()
+
+    def test_close_puts_back_unreviewed_items(self):
+        # 1. Setup
+        service = QueueAuditService(range(1, 6))
+        prefetcher = AuditPrefetcher(service, AuditType.SFW, depth=3)
+        prefetcher.next()
+        service.release.clear()
+        # 2. Execute
+        prefetcher.close()
+        service.release.set()
+        # 3. Compare
+        self.assertEqual(sorted(service.putback), [2, 3, 4])
+        self.assertEqual(prefetcher.pending, 0)
+
+    def test_empty_queue_falls_back_to_audit_next(self):
+        # 1. Setup
+        service = QueueAuditService([])
+        prefetcher = AuditPrefetcher(service, AuditType.SFW)
+        # 2. Execute
+        result = prefetcher.next()
+        # 3. Compare
+        self.assertEqual(result.message, "缓存错误")
+        prefetcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
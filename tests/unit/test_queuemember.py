@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_queuemember
+
+import unittest
+
+from utils.queuemember import decode_member, encode_member, is_legacy_member, migrate_member
+
+
+class TestQueueMember(unittest.TestCase):
+
+    def test_encode_decode_round_trip(self):
+        # 1. Setup
+        # 2. Execute
+        member = encode_member("pixiv", 12345)
+        data = decode_member(member.encode())
+        # 3. Compare
+        self.assertEqual(member, "p:12345")
+        self.assertEqual(data, {"post_id": 12345, "site": "pixiv"})
+
+    def test_encode_is_canonical(self):
+        # 1. Setup
+        # 2. Execute
+        from_str = encode_member("twitter", "42")
+        from_int = encode_member("twitter", 42)
+        # 3. Compare
+        self.assertEqual(from_str, from_int)
+
+    def test_unknown_site_raises(self):
+        # 1. Setup
+        # 2. Execute
+        # 3. Compare
+        with self.assertRaises(ValueError):
+            encode_member("unknown", 1)
+        with self.assertRaises(ValueError):
+            decode_member("x:1")
+
+    def test_migrate_legacy_member(self):
+        # 1. Setup
+        legacy = b'{"site":"mihoyobbs","post_id":7}'
+        # 2. Execute
+        member = migrate_member(legacy)
+        # 3. Compare
+        self.assertTrue(is_legacy_member(legacy))
+        self.assertFalse(is_legacy_member(member))
+        self.assertEqual(member, "m:7")
+
+
+if __name__ == '__main__':
+    unittest.main()
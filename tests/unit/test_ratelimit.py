@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_ratelimit
+
+import threading
+import time
+import unittest
+
+from utils.ratelimit import AsyncTokenBucket, TokenBucket
+
+
+class TestAsyncTokenBucket(unittest.IsolatedAsyncioTestCase):
+
+    async def test_burst_does_not_wait(self):
+        # 1. Setup
+        bucket = AsyncTokenBucket(rate=1, burst=5)
+        # 2. Execute
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertLess(elapsed, 0.1)
+
+    async def test_rate_is_enforced_after_burst(self):
+        # 1. Setup
+        bucket = AsyncTokenBucket(rate=20, burst=1)
+        # 2. Execute
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertGreaterEqual(elapsed, 4 / 20 * 0.9)
+
+    async def test_throttle_pauses_and_halves_rate(self):
+        # 1. Setup
+        bucket = AsyncTokenBucket(rate=10, burst=10)
+        # 2. Execute
+        bucket.throttle(0.2)
+        start = time.monotonic()
+        await bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertEqual(bucket.rate, 5)
+
+    async def test_recover_never_exceeds_max_rate(self):
+        # 1. Setup
+        bucket = AsyncTokenBucket(rate=10, burst=1)
+        bucket.throttle(0)
+        # 2. Execute
+        for _ in range(100):
+            bucket.recover()
+        # 3. Compare
+        self.assertEqual(bucket.rate, 10)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_does_not_wait(self):
+        # 1. Setup
+        bucket = TokenBucket(rate=1, burst=3)
+        # 2. Execute
+        start = time.monotonic()
+        bucket.acquire(3)
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertLess(elapsed, 0.1)
+
+    def test_large_request_overdraws_and_delays_next(self):
+        # 1. Setup
+        bucket = TokenBucket(rate=20, burst=2)
+        # 2. Execute
+        start = time.monotonic()
+        bucket.acquire(4)
+        first = time.monotonic() - start
+        bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertLess(first, 0.1)
+        self.assertGreaterEqual(elapsed, 3 / 20 * 0.9)
+
+    def test_shared_between_threads(self):
+        # 1. Setup
+        bucket = TokenBucket(rate=50, burst=1)
+
+        def worker():
+            for _ in range(3):
+                bucket.acquire()
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        # 2. Execute
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertGreaterEqual(elapsed, 8 / 50 * 0.9)
+
+    def test_throttle_pauses(self):
+        # 1. Setup
+        bucket = TokenBucket(rate=10, burst=10)
+        # 2. Execute
+        bucket.throttle(0.2)
+        start = time.monotonic()
+        bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 3. Compare
+        self.assertGreaterEqual(elapsed, 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
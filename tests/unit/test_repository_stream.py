@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_repository_stream
+
+import unittest
+
+from sites.base.repository import Repository
+
+
+class ListCursor:
+    """
+    按 fetchmany 分批返回结果，记录每次读取的行数
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.connection.closed_with_unread = self.connection.unread_result
+
+    def execute(self, query, args):
+        self.connection.unread_result = True
+
+    def fetchmany(self, size):
+        rows = self.connection.rows[:size]
+        self.connection.rows = self.connection.rows[size:]
+        self.connection.batches.append(len(rows))
+        if not rows:
+            self.connection.unread_result = False
+        return rows
+
+
+class ListConnection:
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.batches = []
+        self.unread_result = False
+        self.closed_with_unread = None
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def cursor(self, buffered=False):
+        return ListCursor(self)
+
+    def consume_results(self):
+        self.rows = []
+        self.unread_result = False
+
+    def commit(self):
+        self.committed = True
+
+
+class ListPool:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_connection(self):
+        return self.connection
+
+
+def repository(connection) -> Repository:
+    repo = Repository.__new__(Repository)
+    repo.sql_pool = ListPool(connection)
+    return repo
+
+
+class TestExecuteAndIterate(unittest.TestCase):
+
+    def test_reads_in_batches(self):
+        # 1. Setup
+        connection = ListConnection([(i,) for i in range(5)])
+        # 2. Execute
+        rows = list(repository(connection)._execute_and_iterate("SELECT", (), batch_size=2))
+        # 3. Compare
+        self.assertEqual(rows, [(0,), (1,), (2,), (3,), (4,)])
+        self.assertEqual(connection.batches, [2, 2, 1, 0])
+        self.assertTrue(connection.committed)
+
+    def test_early_close_discards_unread_rows(self):
+        # 1. Setup
+        connection = ListConnection([(i,) for i in range(5)])
+        rows = repository(connection)._execute_and_iterate("SELECT", (), batch_size=2)
+        # 2. Execute
+        first = next(rows)
+        rows.close()
+        # 3. Compare
+        self.assertEqual(first, (0,))
+        self.assertFalse(connection.closed_with_unread)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+#
+# python3 -m unittest tests.unit.test_searchplan
+
+import datetime
+import unittest
+
+from crawl.searchplan import SearchPlanner
+
+
+class TestSearchPlanner(unittest.TestCase):
+
+    def test_date_ranges_cover_window_by_day(self):
+        # 1. Setup
+        planner = SearchPlanner(keywords=["原神"], days=3, shard_days=1)
+        today = datetime.date(2022, 8, 10)
+        # 2. Execute
+        ranges = planner.date_ranges(today)
+        # 3. Compare
+        self.assertEqual(ranges, [
+            (datetime.date(2022, 8, 10), datetime.date(2022, 8, 10)),
+            (datetime.date(2022, 8, 9), datetime.date(2022, 8, 9)),
+            (datetime.date(2022, 8, 8), datetime.date(2022, 8, 8)),
+        ])
+
+    def test_date_ranges_last_shard_is_clipped(self):
+        # 1. Setup
+        planner = SearchPlanner(keywords=["原神"], days=7, shard_days=3)
+        today = datetime.date(2022, 8, 10)
+        # 2. Execute
+        ranges = planner.date_ranges(today)
+        # 3. Compare
+        self.assertEqual(ranges, [
+            (datetime.date(2022, 8, 8), datetime.date(2022, 8, 10)),
+            (datetime.date(2022, 8, 5), datetime.date(2022, 8, 7)),
+            (datetime.date(2022, 8, 4), datetime.date(2022, 8, 4)),
+        ])
+
+    def test_plan_marks_character_keywords_as_genshin_only(self):
+        # 1. Setup
+        planner = SearchPlanner(keywords=["原神", "GenshinImpact"], character_keywords=["甘雨"], days=2)
+        # 2. Execute
+        shards = planner.plan(datetime.date(2022, 8, 10))
+        # 3. Compare
+        self.assertEqual(len(shards), 6)
+        self.assertEqual([s.keyword for s in shards if s.genshin_only], ["甘雨", "甘雨"])
+
+
+if __name__ == '__main__':
+    unittest.main()
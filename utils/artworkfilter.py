@@ -0,0 +1,147 @@
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ArtworkBatch:
+    """
+    按列存放的一批作品数据，过滤规则一次计算整批作品
+    A batch of artworks stored column by column, rules are evaluated over the whole batch at once
+    """
+
+    def __init__(self, love_count: Sequence[int], upload_timestamp: Sequence[float],
+                 ai_type: Sequence[int], tags: Sequence[str]):
+        self.love_count = np.asarray(love_count, dtype=np.int64)
+        self.upload_timestamp = np.asarray(upload_timestamp, dtype=np.float64)
+        self.ai_type = np.asarray(ai_type, dtype=np.int64)
+        self.tags = list(tags)
+        self._tag_match_cache = {}
+
+    def __len__(self):
+        return len(self.tags)
+
+    @classmethod
+    def from_items(cls, items: Sequence[Any],
+                   love_count: Callable[[Any], int] = lambda a: a.love_count,
+                   upload_timestamp: Callable[[Any], float] = lambda a: a.upload_timestamp,
+                   ai_type: Callable[[Any], int] = lambda a: getattr(a, "ai_type", 0),
+                   tags: Callable[[Any], str] = lambda a: a.tags):
+        """
+        默认按爬虫的 ArtworkInfo 取值，其他站点的作品通过传入取值函数使用
+        """
+        return cls(
+            love_count=[love_count(a) or 0 for a in items],
+            upload_timestamp=[upload_timestamp(a) or 0 for a in items],
+            ai_type=[ai_type(a) or 0 for a in items],
+            tags=[tags(a) or "" for a in items],
+        )
+
+    def tag_match(self, regex: re.Pattern) -> np.ndarray:
+        """
+        Returns a bool array, True where the tags match the regex. Results are cached per pattern.
+        """
+        result = self._tag_match_cache.get(regex.pattern)
+        if result is None:
+            result = np.fromiter((regex.search(t) is not None for t in self.tags), dtype=bool, count=len(self.tags))
+            self._tag_match_cache[regex.pattern] = result
+        return result
+
+
+class FilterRule:
+    """
+    一条过滤规则，返回需要保留的作品
+    One filter rule, evaluates to the mask of artworks to keep
+
+    配置示例 Config example:
+        {"name": "r18", "tag": "R.?18", "min_love": 2000}
+        {"name": "popularity", "min_love": 1000, "love_decay_per_day": 100, "decay_window_days": [0.1, 3]}
+        {"name": "genshin", "require_tag": "(Genshin(Impact)?)|(原神)"}
+    """
+
+    def __init__(self, name: str, tag: str = None, require_tag: str = None, min_love: int = None,
+                 love_decay_per_day: float = 0, decay_window_days: Tuple[float, float] = None,
+                 max_ai_type: int = None):
+        """
+        :param tag: 规则只作用于标签匹配该正则的作品
+        :param require_tag: 丢弃标签不匹配该正则的作品
+        :param min_love: 丢弃收藏数低于该值的作品
+        :param love_decay_per_day: 在 decay_window_days 时间范围内，min_love 每天降低的数量
+        :param decay_window_days: [最小天数, 最大天数]，为空时任何时间都降低
+        :param max_ai_type: 丢弃 ai_type 大于该值的作品
+        """
+        self.name = name
+        self.tag = re.compile(tag, re.I) if tag else None
+        self.require_tag = re.compile(require_tag, re.I) if require_tag else None
+        self.min_love = min_love
+        self.love_decay_per_day = love_decay_per_day
+        self.decay_window_days = tuple(decay_window_days) if decay_window_days is not None else None
+        self.max_ai_type = max_ai_type
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]):
+        return cls(**config)
+
+    def evaluate(self, batch: ArtworkBatch, now: float) -> np.ndarray:
+        keep = np.ones(len(batch), dtype=bool)
+        if self.require_tag is not None:
+            keep &= batch.tag_match(self.require_tag)
+        if self.min_love is not None:
+            threshold = np.full(len(batch), float(self.min_love))
+            if self.love_decay_per_day:
+                age_days = (now - batch.upload_timestamp) / 24 / 60 / 60
+                in_window = np.ones(len(batch), dtype=bool)
+                if self.decay_window_days is not None:
+                    in_window = (age_days >= self.decay_window_days[0]) & (age_days <= self.decay_window_days[1])
+                threshold = np.where(in_window, threshold - self.love_decay_per_day * age_days, threshold)
+            keep &= batch.love_count >= threshold
+        if self.max_ai_type is not None:
+            keep &= batch.ai_type <= self.max_ai_type
+        if self.tag is not None:
+            # 不匹配的作品不受该规则影响
+            keep |= ~batch.tag_match(self.tag)
+        return keep
+
+
+class ArtworkFilter:
+    """
+    过滤引擎：所有规则都通过的作品才会保留
+    Filter engine: an artwork is kept only if every rule keeps it
+    """
+
+    def __init__(self, rules: Iterable[FilterRule]):
+        self.rules = list(rules)
+
+    @classmethod
+    def from_config(cls, rules: Iterable[Dict[str, Any]]):
+        return cls(FilterRule.from_config(rule) for rule in rules)
+
+    def evaluate(self, batch: ArtworkBatch, now: float = None) -> Tuple[np.ndarray, Dict[str, int]]:
+        """
+        :return: (保留的作品, {规则名: 该规则丢弃的作品数量})
+        一个作品可能被多条规则丢弃，所以各规则丢弃数量之和可能大于实际丢弃数量
+        """
+        if now is None:
+            now = time.time()
+        keep = np.ones(len(batch), dtype=bool)
+        report = {}
+        for rule in self.rules:
+            rule_keep = rule.evaluate(batch, now)
+            report[rule.name] = int(np.count_nonzero(~rule_keep))
+            keep &= rule_keep
+        return keep, report
+
+    def filter(self, items: Sequence[Any], batch: Optional[ArtworkBatch] = None,
+               now: float = None) -> Tuple[List[Any], Dict[str, int]]:
+        """
+        :param batch: 非爬虫 ArtworkInfo 的作品需要传入自己构造的 ArtworkBatch
+        :return: (保留的作品, {规则名: 该规则丢弃的作品数量})
+        """
+        items = list(items)
+        if len(items) == 0:
+            return [], {rule.name: 0 for rule in self.rules}
+        if batch is None:
+            batch = ArtworkBatch.from_items(items)
+        keep, report = self.evaluate(batch, now)
+        return [item for item, k in zip(items, keep) if k], report
@@ -0,0 +1,175 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from logger import Log
+
+
+class BlobStore:
+    """
+    按内容寻址的磁盘图片存储，文件名为内容的sha256，按前两级哈希分目录保存
+    超出容量时按最近使用时间淘汰，被固定的内容不会被淘汰，读取时返回内存映射，图片不常驻内存
+    Content-addressed on-disk blob store with a size cap and LRU eviction, reads are memory-mapped
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        :param root: 存储目录
+        :param max_bytes: 所有文件的总字节数上限
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # digest -> 字节数，按最近使用排序
+        self._pins: Dict[str, int] = {}  # digest -> 固定次数
+        self._released = deque()  # 等待取消固定的 digest
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _scan(self):
+        """
+        启动时扫描已有文件，按修改时间恢复使用顺序，并清理写入到一半的临时文件
+        """
+        found = []
+        for dir_path, _, file_names in os.walk(self.root):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                if file_name.endswith(".tmp"):
+                    os.remove(file_path)
+                    continue
+                stat = os.stat(file_path)
+                found.append((stat.st_mtime, file_name, stat.st_size))
+        found.sort()
+        for _, digest, size in found:
+            self._index[digest] = size
+            self.total += size
+        self._evict()
+        Log.info("图片存储加载完成 %s 个文件 %s 字节" % (len(self._index), self.total))
+
+    def _evict(self):
+        """
+        从最久没有使用的内容开始淘汰，跳过被固定的内容，全部被固定时允许暂时超出容量
+        """
+        while len(self._released) > 0:
+            digest = self._released.popleft()
+            count = self._pins.get(digest, 0) - 1
+            if count > 0:
+                self._pins[digest] = count
+            else:
+                self._pins.pop(digest, None)
+        if self.total <= self.max_bytes:
+            return
+        for digest, size in list(self._index.items()):
+            if self.total <= self.max_bytes:
+                break
+            if digest in self._pins:
+                continue
+            del self._index[digest]
+            self.total -= size
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._index
+
+    def put(self, data: bytes, pin: bool = False) -> str:
+        """
+        保存内容，相同的内容只保存一次
+        :param pin: 为True时同时固定内容，使用完后需要调用 unpin
+        :return: 内容的sha256
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._index:
+                self._touch(digest)
+                if pin:
+                    self._pin(digest)
+                return digest
+        file_path = self.path(digest)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = "%s.%s.tmp" % (file_path, threading.get_ident())
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+        with self._lock:
+            if digest not in self._index:
+                self._index[digest] = len(data)
+                self.total += len(data)
+            if pin:
+                self._pin(digest)
+            self._evict()
+        return digest
+
+    def pin(self, digest: str):
+        """
+        固定已有的内容，使用完后需要调用 unpin
+        :raise KeyError: 内容不存在或已被淘汰
+        """
+        with self._lock:
+            if digest not in self._index:
+                raise KeyError(digest)
+            self._touch(digest)
+            self._pin(digest)
+
+    def _pin(self, digest: str):
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def unpin(self, digest: str):
+        """
+        取消一次固定，下次写入时生效
+        会在垃圾回收时调用，不能加锁，否则持有锁的线程触发垃圾回收时会死锁
+        """
+        self._released.append(digest)
+
+    def _touch(self, digest: str):
+        self._index.move_to_end(digest)
+        try:
+            now = time.time()
+            os.utime(self.path(digest), (now, now))
+        except FileNotFoundError:
+            pass
+
+    def open(self, digest: str) -> mmap.mmap:
+        """
+        以只读内存映射打开内容，可以直接作为文件对象发送
+        :raise KeyError: 内容不存在或已被淘汰
+        """
+        with self._lock:
+            if digest not in self._index:
+                raise KeyError(digest)
+            self._touch(digest)
+            try:
+                with open(self.path(digest), "rb") as f:
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                self.total -= self._index.pop(digest)
+                raise KeyError(digest)
+
+    def read(self, digest: str) -> bytes:
+        with self.open(digest) as buffer:
+            return buffer[:]
+
+
+_default_store: Optional[BlobStore] = None
+
+
+def set_default_store(store: Optional[BlobStore]):
+    """
+    设置作品图片使用的存储，未设置时图片保存在内存中
+    """
+    global _default_store
+    _default_store = store
+
+
+def get_default_store() -> Optional[BlobStore]:
+    return _default_store
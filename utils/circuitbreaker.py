@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头，支持秒数和HTTP日期两种格式
+    :return: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    单个站点的熔断器，同一个站点的所有请求共享
+    撞墙后熔断一段时间，等待时间按指数增长并加入随机抖动，熔断期间再次撞墙不会重复增加等待时间
+    Circuit breaker for one host, shared by every caller of that host
+    """
+
+    def __init__(self, base_delay: float = 30, max_delay: float = 600):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """
+        :return: 距离熔断结束的秒数，未熔断时为0
+        """
+        return max(0.0, self._open_until - time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        return self.remaining() > 0
+
+    def record_failure(self, retry_after: float = None) -> Tuple[float, bool]:
+        """
+        撞墙时调用，打开熔断器
+        :param retry_after: 服务器要求等待的秒数，优先于指数退避
+        :return: (需要等待的秒数, 是否由这次调用打开熔断器)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                # 熔断前已经发出的请求，不重复增加等待时间
+                return self._open_until - now, False
+            self.failures += 1
+            if retry_after is not None:
+                delay = min(retry_after, self.max_delay)
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+                delay = random.uniform(delay / 2, delay)
+            self._open_until = now + delay
+            return delay, True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """
+    获取站点的熔断器，同一个进程内所有请求共享
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[host] = breaker
+        return breaker
@@ -0,0 +1,57 @@
+import httpx
+
+from logger import Log
+
+try:
+    import h2  # noqa: F401 httpx 的 HTTP/2 支持需要 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_http2_warned = False
+
+
+def _client_options(http_config: dict = None) -> dict:
+    """
+    把配置文件中的 http 配置转换为 httpx 客户端参数
+    http_config:
+        http2: 是否启用HTTP/2，需要安装 h2，服务器不支持时自动使用HTTP/1.1
+        max_connections: 连接池最大连接数
+        max_keepalive_connections: 连接池最多保持的空闲连接数
+        keepalive_expiry: 空闲连接保持的秒数
+        timeout: 请求超时秒数
+    """
+    global _http2_warned
+    if not http_config:
+        http_config = {}
+    http2 = bool(http_config.get("http2", True))
+    if http2 and not HTTP2_AVAILABLE:
+        if not _http2_warned:
+            Log.warning("未安装 h2，HTTP/2 不可用，使用 HTTP/1.1")
+            _http2_warned = True
+        http2 = False
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=int(http_config.get("max_connections", 20)),
+            max_keepalive_connections=int(http_config.get("max_keepalive_connections", 10)),
+            keepalive_expiry=float(http_config.get("keepalive_expiry", 30)),
+        ),
+        "timeout": float(http_config.get("timeout", 5)),
+    }
+
+
+def create_client(http_config: dict = None, **kwargs) -> httpx.Client:
+    """
+    创建长期使用的同步客户端，同一个站点的请求复用连接
+    Creates a long-lived client so requests to one site reuse keep-alive connections
+    """
+    return httpx.Client(**{**_client_options(http_config), **kwargs})
+
+
+def create_async_client(http_config: dict = None, **kwargs) -> httpx.AsyncClient:
+    """
+    创建长期使用的异步客户端
+    Creates a long-lived async client
+    """
+    return httpx.AsyncClient(**{**_client_options(http_config), **kwargs})
@@ -1,8 +1,11 @@
 import httpx
 import asyncio
+import random
 import ujson
-import time
 from logger import Log
+from utils.circuitbreaker import CircuitBreaker, get_breaker, parse_retry_after
+from utils.httpclient import create_async_client
+from utils.ratelimit import AsyncTokenBucket
 
 
 class TooManyRequest(Exception):
@@ -10,128 +13,118 @@ class TooManyRequest(Exception):
 
 
 class Rsp:
-    def __init__(self, status=True, message=None, data=None):
-        self.data = data
-        self.status = status
+    """
+    一次请求的结果，每次请求返回新的实例，并发请求之间互不影响
+    Result of one request, every call returns its own instance so concurrent requests never share state
+    code: 0 成功, 1 其他状态码, 2 请求失败, 3 网络错误
+    """
+
+    def __init__(self, code: int = 0, message=None, data=None, status_code: int = None):
+        self.code = code
         self.message = message
+        self.data = data
+        self.status_code = status_code
+
+    def parse_json(self):
+        """
+        把响应解析为JSON，失败时设置错误码
+        """
+        if self.code < 1:
+            try:
+                self.data = ujson.loads(self.data)
+            except (ValueError, TypeError):
+                self.code = 2
+                self.message = "解析JSON失败"
+        return self
 
 
 class HttpRequests(object):
+    # 撞墙时返回的状态码
+    THROTTLE_STATUS_CODES = (403, 429, 500)
 
-    def __init__(self, proxies=None):
-        self.client = httpx.AsyncClient(proxies=proxies)
+    def __init__(self, proxies=None, rate_limiter: AsyncTokenBucket = None, client: httpx.AsyncClient = None,
+                 max_retries: int = 3, http_config: dict = None, retry_base_delay: float = 1,
+                 retry_max_delay: float = 30):
+        """
+        :param client: 共享的连接池，为空时按 http_config 创建新的连接池
+        :param max_retries: 每次请求最多尝试的次数
+        :param retry_base_delay: 网络错误后第一次重试前等待的秒数，之后按指数增长
+        :param retry_max_delay: 网络错误后重试前最多等待的秒数
+        """
+        self.client = client if client is not None else create_async_client(http_config, proxies=proxies)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max(1, max_retries)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
 
     async def aclose(self):
         await self.client.aclose()
 
-    def Request(self, method, url, headers=None, data=None, params=None) -> Rsp:
-        i = 0
-        while True:
-            i += 1
-            try:
-                if method == "GET":
-                    data = httpx.get(url, headers=headers, params=params)
-                elif method == "POST":
-                    data = httpx.post(url, headers=headers, data=data)
-            except BaseException as TError:
-                Log.warning("Url: %s 请求错误" % url)
-                if i >= 3:
-                    Rsp.code = 3
-                    Rsp.message = TError
-                    break
-            else:
-                if data.status_code == 200:
-                    Rsp.code = 0
-                elif data.status_code == 403:
-                    if i >= 3:
-                        Rsp.code = 2
-                        Rsp.message = "403频繁"
-                        break
-                    Log.warning("Url: %s 请求错误" % url)
-                    Log.warning("403频繁,休眠240s")
-                    time.sleep(240)
-                elif data.status_code == 404:
-                    Rsp.code = 2
-                    Rsp.message = "404无效地址"
-                    break
-                elif data.status_code == 405:
-                    Rsp.code = 2
-                    Rsp.message = "请求方法错误"
-                    break
-                else:
-                    Log.warning("Url: %s 请求错误" % url)
-                    Log.warning("status_code: %s " % data.status_code)
-                    Rsp.code = 1
-                Rsp.data = data.text
-                break
-        return Rsp
+    def _record_throttle(self, url: str, breaker: CircuitBreaker, response: httpx.Response) -> float:
+        """
+        撞墙后打开该站点的熔断器，存在限流器时同时降低速率
+        熔断前已经发出的请求撞墙时熔断器已经打开，不重复降低速率
+        :return: 需要等待的秒数
+        """
+        delay, opened = breaker.record_failure(parse_retry_after(response.headers.get("Retry-After")))
+        if not opened:
+            Log.debug("Url: %s 撞墙，状态码%s，该站点已经暂停" % (url, response.status_code))
+            return delay
+        if self.rate_limiter is not None:
+            self.rate_limiter.throttle(delay)
+        Log.warning("Url: %s 撞墙，状态码%s，暂停该站点%.0f秒" % (url, response.status_code, delay))
+        return delay
 
-    def Request_json(self, method, url, headers=None, data=None, params=None):
-        try:
-            Rsp.data = ujson.loads(Rsp.data)
-        except BaseException as TError:
-            Rsp.code = 2
-            Rsp.message = "解析JSON失败"
-        return Rsp
+    def _retry_delay(self, attempt: int) -> float:
+        """
+        网络错误后重试前等待的秒数，按指数增长并加入随机抖动，避免同时失败的请求一起重试
+        """
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
 
     async def ARequest(self, method, url, headers=None, data=None, params=None) -> Rsp:
+        """
+        异步请求，撞墙时等待熔断结束后重试，重试次数用完后抛出 TooManyRequest
+        网络错误时按指数退避等待后重试，重试次数用完后返回 code 3
+        """
         if headers is not None:
             headers = httpx.Headers(headers)
-        i = 0
-        while True:
-            i += 1
+        breaker = get_breaker(httpx.URL(url).host)
+        for attempt in range(1, self.max_retries + 1):
+            # 熔断期间同一站点的所有请求一起等待
+            wait = breaker.remaining()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
             try:
                 if method == "GET":
-                    data = await self.client.get(url, headers=headers, params=params)
+                    response = await self.client.get(url, headers=headers, params=params)
                 elif method == "POST":
-                    data = await self.client.post(url, headers=headers, data=data)
-            except BaseException as TError:
-                Log.warning("Url: %s 请求错误" % url)
-                if i >= 3:
-                    Rsp.code = 3
-                    Rsp.message = TError
-                    break
-            else:
-                if data.status_code == 200:
-                    Rsp.code = 0
-                elif data.status_code == 403:
-                    if i >= 3:
-                        Rsp.code = 2
-                        Rsp.message = "403频繁"
-                        break
-                    Log.warning("Url: %s 请求错误" % url)
-                    Log.warning("403频繁,休眠240s")
-                    await asyncio.sleep(240)
-                elif data.status_code == 404:
-                    Rsp.code = 2
-                    Rsp.message = "404无效地址"
-                    break
-                elif data.status_code == 500:
-                    raise TooManyRequest
-                    # Log.warning("撞墙，等待60S")
-                    # await asyncio.sleep(60)
-                    # continue
-                elif data.status_code == 429:
-                    Log.warning("撞墙，等待60S")
-                    await asyncio.sleep(60)
-                    continue
+                    response = await self.client.post(url, headers=headers, data=data)
                 else:
-                    Log.warning("Url: %s 请求错误" % url)
-                    Log.warning("status_code: %s " % data.status_code)
-                    Rsp.code = 1
-                Rsp.data = data.text
-                break
-        return Rsp
+                    return Rsp(code=2, message="请求方法错误")
+            except Exception as TError:
+                Log.warning("Url: %s 请求错误" % url)
+                if attempt >= self.max_retries:
+                    return Rsp(code=3, message=TError)
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code in self.THROTTLE_STATUS_CODES:
+                self._record_throttle(url, breaker, response)
+                continue
+            breaker.record_success()
+            if response.status_code == 200:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.recover()
+                return Rsp(code=0, data=response.text, status_code=200)
+            elif response.status_code == 404:
+                return Rsp(code=2, message="404无效地址", status_code=404)
+            Log.warning("Url: %s 请求错误" % url)
+            Log.warning("status_code: %s " % response.status_code)
+            return Rsp(code=1, data=response.text, status_code=response.status_code)
+        raise TooManyRequest
 
-    async def ARequest_json(self, method, url, headers=None, data=None, params=None):
-        i = 0
-        while True:
-            i += 1
-            Rsp = await self.ARequest(method, url, headers, data, params)
-            if Rsp.code < 1:
-                try:
-                    Rsp.data = ujson.loads(Rsp.data)
-                except BaseException as TError:
-                    Rsp.code = 2
-                    Rsp.message = "解析JSON失败"
-            return Rsp
+    async def ARequest_json(self, method, url, headers=None, data=None, params=None) -> Rsp:
+        rsp = await self.ARequest(method, url, headers, data, params)
+        return rsp.parse_json()
@@ -0,0 +1,143 @@
+import time
+from typing import Callable, List, Optional
+
+import redis
+
+from logger import Log
+from model.artwork import ArtworkImage
+from utils.blobstore import get_default_store
+
+
+class ImageCache:
+    """
+    作品图片缓存，按 网站+作品ID+页码 保存下载后的图片，审核时写入，推送时直接读取
+    图片已经在图片存储中时只保存内容的sha256，读取时不会把图片传回内存
+    超出容量时按最近使用时间淘汰
+    Redis-backed cache for downloaded artwork images with a byte budget, LRU eviction and TTL
+    """
+
+    DIGEST_PREFIX = b"sha256:"  # 保存的是图片存储中内容的sha256，图片内容不会以此开头
+
+    def __init__(self, rdb: redis.Redis, key_prefix: str = "picbed:image_cache", ttl: int = 86400,
+                 max_bytes: int = 512 * 1024 * 1024):
+        """
+        :param ttl: 图片保存的秒数，每次读取后重新计算
+        :param max_bytes: Redis中保存的总字节数上限，图片在图片存储中时只计算sha256的长度
+        """
+        self.rdb = rdb
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lru = f"{key_prefix}:lru"  # sorted set 作品 -> 最近使用时间
+        self.sizes = f"{key_prefix}:sizes"  # hash 作品 -> 字节数
+        self.total = f"{key_prefix}:bytes"  # 所有作品的总字节数
+
+    def _member(self, site: str, post_id: int) -> str:
+        return f"{site}:{post_id}"
+
+    def _key(self, member: str) -> str:
+        return f"{self.key_prefix}:{member}"
+
+    def _forget(self, member: str):
+        """
+        删除一个作品的图片和记录
+        """
+        size = self.rdb.hget(self.sizes, member)
+        pipe = self.rdb.pipeline()
+        pipe.delete(self._key(member))
+        pipe.zrem(self.lru, member)
+        pipe.hdel(self.sizes, member)
+        if size is not None:
+            pipe.decrby(self.total, int(size))
+        pipe.execute()
+
+    def get_images(self, site: str, post_id: int) -> Optional[List[ArtworkImage]]:
+        member = self._member(site, post_id)
+        pages = self.rdb.hgetall(self._key(member))
+        if not pages:
+            if self.rdb.zscore(self.lru, member) is not None:
+                # 图片已经过期，清理剩下的记录
+                self._forget(member)
+            return None
+        pipe = self.rdb.pipeline(transaction=False)
+        pipe.zadd(self.lru, {member: time.time()})
+        pipe.expire(self._key(member), self.ttl)
+        pipe.execute()
+        try:
+            images = [self._image(post_id, int(page), value) for page, value in pages.items()]
+        except KeyError:
+            # 图片存储中的内容已经被淘汰
+            self._forget(member)
+            return None
+        images.sort(key=lambda image: image.page)
+        return images
+
+    def _image(self, post_id: int, page: int, value: bytes) -> ArtworkImage:
+        """
+        :raise KeyError: 图片存储中的内容已经被淘汰或没有设置图片存储
+        """
+        if not value.startswith(self.DIGEST_PREFIX):
+            return ArtworkImage(post_id, page, data=value)
+        store = get_default_store()
+        if store is None:
+            raise KeyError(value)
+        return ArtworkImage.from_store(post_id, page, store, value[len(self.DIGEST_PREFIX):].decode())
+
+    def _value(self, image: ArtworkImage) -> bytes:
+        if image.store is not None and image.store is get_default_store():
+            return self.DIGEST_PREFIX + image.digest.encode()
+        return image.data
+
+    def put_images(self, site: str, post_id: int, images: List[ArtworkImage]):
+        if len(images) == 0 or any(image.is_error for image in images):
+            return
+        member = self._member(site, post_id)
+        values = [self._value(image) for image in images]
+        size = sum(len(value) for value in values)
+        if size > self.max_bytes:
+            return
+        if self.rdb.zscore(self.lru, member) is not None:
+            self._forget(member)
+        pipe = self.rdb.pipeline()
+        # 按顺序保存，部分站点所有图片的页码都是0
+        pipe.hset(self._key(member), mapping={str(page): value for page, value in enumerate(values)})
+        pipe.expire(self._key(member), self.ttl)
+        pipe.zadd(self.lru, {member: time.time()})
+        pipe.hset(self.sizes, member, size)
+        pipe.incrby(self.total, size)
+        total = pipe.execute()[-1]
+        while total > self.max_bytes:
+            oldest = self.rdb.zpopmin(self.lru, 1)
+            if len(oldest) == 0:
+                break
+            evicted = oldest[0][0].decode()
+            size = self.rdb.hget(self.sizes, evicted)
+            self._forget(evicted)
+            total -= int(size) if size is not None else 0
+
+    def get_or_fetch(self, site: str, post_id: int,
+                     fetch: Callable[[], Optional[List[ArtworkImage]]]) -> Optional[List[ArtworkImage]]:
+        try:
+            images = self.get_images(site, post_id)
+        except redis.RedisError as exc:
+            Log.warning("读取图片缓存失败 %s" % exc)
+            return fetch()
+        if images is not None:
+            return images
+        images = fetch()
+        if images:
+            try:
+                self.put_images(site, post_id, images)
+            except redis.RedisError as exc:
+                Log.warning("写入图片缓存失败 %s" % exc)
+        return images
+
+
+def cached_images(cache: Optional[ImageCache], site: str, post_id: int,
+                  fetch: Callable[[], Optional[List[ArtworkImage]]]) -> Optional[List[ArtworkImage]]:
+    """
+    站点使用的入口，没有缓存时直接下载
+    """
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(site, post_id, fetch)
@@ -0,0 +1,130 @@
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import httpx
+import redis
+import ujson
+
+from logger import Log
+
+
+class MetadataCache:
+    """
+    作品信息接口的缓存，按 网站+作品ID 保存解析后的响应
+    在 ttl 内直接返回缓存，超过 ttl 后带上 If-None-Match/If-Modified-Since 重新验证
+    Redis-backed cache for artwork metadata endpoints, keyed by site and artwork id
+    """
+
+    def __init__(self, rdb: redis.Redis, ttl: int = 300, stale_ttl: int = 86400, max_entries: int = 5000,
+                 key_prefix: str = "picbed:meta"):
+        """
+        :param ttl: 缓存在该秒数内不请求上游
+        :param stale_ttl: 缓存保存的秒数，过了 ttl 但还在保存期内的缓存用于条件请求
+        :param max_entries: 最多保存的缓存数量，超出时删除最早写入的缓存
+        """
+        self.rdb = rdb
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl)
+        self.max_entries = max_entries
+        self.key_prefix = key_prefix
+        self.index = f"{key_prefix}:index"
+
+    @classmethod
+    def from_config(cls, rdb: redis.Redis, http_config: dict = None):
+        if not http_config:
+            http_config = {}
+        return cls(
+            rdb,
+            ttl=int(http_config.get("meta_cache_ttl", 300)),
+            stale_ttl=int(http_config.get("meta_cache_stale_ttl", 86400)),
+            max_entries=int(http_config.get("meta_cache_max_entries", 5000)),
+        )
+
+    def _key(self, site: str, key) -> str:
+        return f"{self.key_prefix}:{site}:{key}"
+
+    def get(self, site: str, key) -> Optional[dict]:
+        """
+        :return: {"data", "etag", "last_modified", "fetched_at"}，没有缓存时返回None
+        """
+        value = self.rdb.get(self._key(site, key))
+        if value is None:
+            return None
+        return ujson.loads(value)
+
+    def put(self, site: str, key, data: Any, etag: str = None, last_modified: str = None):
+        cache_key = self._key(site, key)
+        entry = {
+            "data": data,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        pipe = self.rdb.pipeline(transaction=False)
+        pipe.set(cache_key, ujson.dumps(entry), ex=self.stale_ttl)
+        pipe.zadd(self.index, {cache_key: entry["fetched_at"]})
+        pipe.zcard(self.index)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            evicted = [k for k, _ in self.rdb.zpopmin(self.index, size - self.max_entries)]
+            if len(evicted) > 0:
+                self.rdb.delete(*evicted)
+
+    def invalidate(self, site: str, key):
+        cache_key = self._key(site, key)
+        self.rdb.delete(cache_key)
+        self.rdb.zrem(self.index, cache_key)
+
+    def fetch_json(self, client: httpx.Client, site: str, key, url: str,
+                   is_valid: Callable[[Any], bool] = None, **kwargs) -> Tuple[int, Optional[Any]]:
+        """
+        获取接口的JSON响应，优先使用缓存
+        :param is_valid: 检查响应内容是否有效，状态码为200但内容表示错误的响应不写入缓存
+        :return: (HTTP状态码, 解析后的JSON)，请求错误时JSON为None，命中缓存时状态码为200
+        """
+        try:
+            entry = self.get(site, key)
+        except redis.RedisError as exc:
+            Log.warning("读取作品信息缓存失败 %s" % exc)
+            return fetch_json(client, None, site, key, url, **kwargs)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if time.time() - entry["fetched_at"] < self.ttl:
+                return 200, entry["data"]
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = client.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            data = entry["data"]
+            etag = response.headers.get("ETag", entry["etag"])
+            last_modified = response.headers.get("Last-Modified", entry["last_modified"])
+        elif response.is_error:
+            return response.status_code, None
+        else:
+            data = response.json()
+            if is_valid is not None and not is_valid(data):
+                return response.status_code, data
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        try:
+            self.put(site, key, data, etag, last_modified)
+        except redis.RedisError as exc:
+            Log.warning("写入作品信息缓存失败 %s" % exc)
+        return 200, data
+
+
+def fetch_json(client: httpx.Client, cache: Optional[MetadataCache], site: str, key, url: str,
+               is_valid: Callable[[Any], bool] = None, **kwargs) -> Tuple[int, Optional[Any]]:
+    """
+    站点接口使用的入口，没有缓存时直接请求
+    :param is_valid: 检查响应内容是否有效，无效的响应不写入缓存
+    :return: (HTTP状态码, 解析后的JSON)，请求错误时JSON为None
+    """
+    if cache is not None:
+        return cache.fetch_json(client, site, key, url, is_valid=is_valid, **kwargs)
+    response = client.get(url, **kwargs)
+    if response.is_error:
+        return response.status_code, None
+    return response.status_code, response.json()
@@ -57,6 +57,12 @@ class NameMap:
             return tuple(info["name"])
         return tuple()
 
+    def get_all_character_names(self) -> Iterable[str]:
+        """
+        Returns the names of every character that can be used as search keywords, single letter names are skipped
+        """
+        return tuple(n for value in self.name_map.values() for n in value["name"] if len(n) >= 2)
+
     def get_multi_character_names(self, characters) -> Iterable[Iterable[str]]:
         """
         Returns character names in the following format: {("Kazuha", "枫原万叶"), ("Klee", "可莉")}
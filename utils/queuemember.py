@@ -0,0 +1,51 @@
+from typing import Union
+
+import ujson
+
+# 网站名称 -> 队列成员中使用的网站代码，已经使用的代码不能修改
+SITE_CODES = {
+    "pixiv": "p",
+    "twitter": "t",
+    "mihoyobbs": "m",
+    "bilibili": "b",
+}
+SITE_NAMES = {code: site for site, code in SITE_CODES.items()}
+
+
+def encode_member(site: str, post_id: int) -> str:
+    """
+    审核和推送队列成员的唯一格式 网站代码:作品ID，例如 p:12345
+    Canonical compact member of the audit and push queues
+    """
+    code = SITE_CODES.get(site)
+    if code is None:
+        raise ValueError(f"unknown site {site}")
+    return f"{code}:{int(post_id)}"
+
+
+def decode_member(member: Union[bytes, str]) -> dict:
+    """
+    :return: {"post_id", "site"}
+    """
+    if isinstance(member, bytes):
+        member = member.decode()
+    code, _, post_id = member.partition(":")
+    site = SITE_NAMES.get(code)
+    if site is None or not post_id:
+        raise ValueError(f"invalid queue member {member}")
+    return {"post_id": int(post_id), "site": site}
+
+
+def is_legacy_member(member: Union[bytes, str]) -> bool:
+    """
+    旧版本使用 JSON 保存的成员 {"post_id":..,"site":..}
+    """
+    return member[:1] in (b"{", "{")
+
+
+def migrate_member(member: Union[bytes, str]) -> str:
+    """
+    把旧版本的 JSON 成员转换为紧凑格式
+    """
+    data = ujson.loads(member)
+    return encode_member(data["site"], data["post_id"])
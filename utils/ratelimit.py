@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶限流器，可以在多个线程间共享
+    Thread-safe token bucket rate limiter
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 1, min_rate: float = 0.05):
+        """
+        :param rate: 每秒请求数
+        :param burst: 令牌桶容量，允许的突发请求数
+        :param min_rate: 撞墙后最低降到的速率
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        尝试取出令牌
+        :param tokens: 一次取出的令牌数，超过容量时先透支，之后的请求等待补齐
+        :return: 需要等待的秒数，为0时已经取出
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            need = min(tokens, self.burst)
+            if self._tokens >= need:
+                self._tokens -= tokens
+                return 0
+            return (need - self._tokens) / self.rate
+
+    def acquire(self, tokens: int = 1):
+        """
+        等待直到可以发出下一个请求
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def throttle(self, delay: float):
+        """
+        撞墙时调用：暂停所有共享该限流器的线程，并将速率减半
+        :param delay: 暂停的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + delay)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._updated_at = now
+
+    def recover(self):
+        """
+        请求成功时调用：逐步恢复到设定的速率
+        """
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    令牌桶限流器，由同一个站点的所有爬虫线程共享
+    Token bucket rate limiter shared by all crawler workers of one site
+    """
+
+    async def acquire(self, tokens: int = 1):
+        """
+        等待直到可以发出下一个请求
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
@@ -7,6 +7,7 @@ class RedisActionType(Enum):
     ADD_AUDIT = "add_audit"
     ADD_PUSH = "add_push"
     GET_AUDIT_ONE = "get_audit_one"
+    GET_AUDIT_MANY = "get_audit_many"
     GET_PUSH_ONE = "get_push_one"
     REM_PENDING = "remove_pending"
     PUTBACK_AUDIT = "putback_audit"
@@ -31,6 +32,10 @@ class RedisUpdate:
     def get_audit_one(cls, audit_type: AuditType):
         return cls(action=RedisActionType.GET_AUDIT_ONE, audit_type=audit_type)
 
+    @classmethod
+    def get_audit_many(cls, audit_type: AuditType, count: int):
+        return cls(action=RedisActionType.GET_AUDIT_MANY, audit_type=audit_type, data=count)
+
     @classmethod
     def get_push_one(cls, audit_type: AuditType):
         return cls(action=RedisActionType.GET_PUSH_ONE, audit_type=audit_type)